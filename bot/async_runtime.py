@@ -0,0 +1,116 @@
+import asyncio
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import telebot
+from telebot import types, util
+from telebot.async_telebot import AsyncTeleBot
+
+from metrics import QUEUE_DEPTH, SEND_ERRORS, SEND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ChatOrderedSender:
+    """Асинхронная отправка сообщений с сохранением порядка внутри одного чата"""
+
+    def __init__(self, abot: AsyncTeleBot, loop: asyncio.AbstractEventLoop):
+        self._abot = abot
+        self._loop = loop
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._pending: Dict[int, int] = {}
+
+    def send(self, chat_id: int, text: str, reply_markup=None, document=None) -> None:
+        """Постановка сообщения (или документа с подписью text) в цикл событий
+
+        Вызывается из любого потока и не ждет отправки.
+        """
+        asyncio.run_coroutine_threadsafe(self._send(chat_id, text, reply_markup, document), self._loop)
+
+    async def _send(self, chat_id: int, text: str, reply_markup, document) -> None:
+        lock = self._locks.get(chat_id)
+        if lock is None:
+            lock = self._locks[chat_id] = asyncio.Lock()
+        self._pending[chat_id] = self._pending.get(chat_id, 0) + 1
+        try:
+            # asyncio.Lock выдается в порядке очереди, поэтому сообщения чата не перемешиваются
+            async with lock:
+                started = time.perf_counter()
+                try:
+                    if document is None:
+                        await self._abot.send_message(chat_id, text, reply_markup=reply_markup)
+                    else:
+                        await self._abot.send_document(
+                            chat_id, types.InputFile(io.BytesIO(document.data), file_name=document.file_name),
+                            caption=text, reply_markup=reply_markup,
+                        )
+                finally:
+                    SEND_SECONDS.observe(time.perf_counter() - started, 'async')
+        except Exception as exc:
+            SEND_ERRORS.inc('async')
+            logger.error('Ошибка отправки сообщения в чат %s: %s', chat_id, exc)
+        finally:
+            self._pending[chat_id] -= 1
+            if not self._pending[chat_id]:
+                del self._pending[chat_id]
+                del self._locks[chat_id]
+
+    def in_flight(self) -> int:
+        """Число сообщений, ожидающих отправки"""
+        return sum(self._pending.values())
+
+
+class AsyncRuntime:
+    """Запуск бота на asyncio: получение обновлений и отправка через AsyncTeleBot
+
+    Обработчики остаются прежними (зарегистрированы в синхронном TeleBot):
+    каждое сообщение передается в bot.process_new_messages в ограниченном
+    пуле потоков, а ответы уходят в цикл событий без ожидания сети.
+    """
+
+    def __init__(self, bot: telebot.TeleBot, set_transport: Callable, workers: int = 16):
+        self.bot = bot
+        self._set_transport = set_transport
+        self.workers = workers
+        self._abot: Optional[AsyncTeleBot] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.sender: Optional[ChatOrderedSender] = None
+
+    def run(self, skip_pending: bool = True, timeout: int = 10) -> None:
+        """Блокирующий запуск до остановки"""
+        asyncio.run(self._serve(skip_pending, timeout))
+
+    def stop(self) -> None:
+        """Остановка получения обновлений (из любого потока)"""
+        if self._loop is not None and self._abot is not None:
+            self._loop.call_soon_threadsafe(setattr, self._abot, '_polling', False)
+
+    async def _serve(self, skip_pending: bool, timeout: int) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._abot = AsyncTeleBot(self.bot.token, parse_mode=self.bot.parse_mode)
+        self.sender = ChatOrderedSender(self._abot, self._loop)
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='handler')
+
+        # Синхронный бот только выбирает обработчик; собственный пул потоков ему не нужен
+        self.bot.threaded = False
+        self._set_transport(self.sender.send)
+        QUEUE_DEPTH.set_function(self.sender.in_flight, 'send')
+
+        async def dispatch(message):
+            await self._loop.run_in_executor(executor, self.bot.process_new_messages, [message])
+
+        self._abot.register_message_handler(dispatch, content_types=util.content_type_media)
+
+        try:
+            await self._abot.infinity_polling(skip_pending=skip_pending, timeout=timeout)
+        finally:
+            executor.shutdown(wait=True)
+            # Даем отправиться ответам, поставленным последними обработчиками
+            while self.sender.in_flight():
+                await asyncio.sleep(0.05)
+            self._set_transport(None)
+            QUEUE_DEPTH.set_function(None, 'send')
+            await self._abot.close_session()
@@ -0,0 +1,269 @@
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Attempt(NamedTuple):
+    """Попытка ответа, ожидающая записи в БД"""
+    user_id: int
+    word_en: str
+    was_correct: bool
+    attempted_at: datetime
+    answer_en: Optional[str] = None  # выбранный неправильный вариант (в нижнем регистре)
+
+
+class StatisticsDelta(NamedTuple):
+    """Сводное изменение user_statistics по пачке попыток одного пользователя"""
+    total: int
+    correct: int
+    lead_run: int   # правильные ответы подряд до первой ошибки в пачке
+    max_run: int    # самая длинная серия правильных ответов внутри пачки
+    tail_run: int   # правильные ответы подряд после последней ошибки
+    had_wrong: bool
+    last_at: datetime
+
+
+def aggregate_statistics(batch: List[Attempt]) -> Dict[int, StatisticsDelta]:
+    """Свертка попыток в изменения статистики с той же логикой серий, что и в SQL"""
+    result: Dict[int, StatisticsDelta] = {}
+    for a in batch:
+        d = result.get(a.user_id)
+        if d is None:
+            d = StatisticsDelta(0, 0, 0, 0, 0, False, a.attempted_at)
+        if a.was_correct:
+            tail = d.tail_run + 1
+            d = d._replace(
+                total=d.total + 1,
+                correct=d.correct + 1,
+                lead_run=d.lead_run if d.had_wrong else d.lead_run + 1,
+                max_run=max(d.max_run, tail),
+                tail_run=tail,
+                last_at=a.attempted_at,
+            )
+        else:
+            d = d._replace(total=d.total + 1, tail_run=0, had_wrong=True, last_at=a.attempted_at)
+        result[a.user_id] = d
+    return result
+
+
+class UserStatistics:
+    """Строка user_statistics в памяти, изменяемая так же, как UPDATE в SQL"""
+    __slots__ = ('total', 'correct', 'incorrect', 'current_streak', 'best_streak', 'last_activity')
+
+    def __init__(self, total: int, correct: int, incorrect: int, current_streak: int, best_streak: int,
+                 last_activity: datetime):
+        self.total = total
+        self.correct = correct
+        self.incorrect = incorrect
+        self.current_streak = current_streak
+        self.best_streak = best_streak
+        self.last_activity = last_activity
+
+    @classmethod
+    def from_row(cls, row: Dict) -> 'UserStatistics':
+        return cls(row['total_attempts'], row['correct_attempts'], row['incorrect_attempts'],
+                   row['current_streak'], row['best_streak'], row['last_activity'])
+
+    def apply(self, was_correct: bool, attempted_at: datetime) -> None:
+        """Учет одной попытки: серия растет на верных ответах и обнуляется на ошибке"""
+        self.total += 1
+        if was_correct:
+            self.correct += 1
+            self.current_streak += 1
+            self.best_streak = max(self.best_streak, self.current_streak)
+        else:
+            self.incorrect += 1
+            self.current_streak = 0
+        # Время показывается в часовом поясе, в котором его вернула БД
+        tz = self.last_activity.tzinfo
+        self.last_activity = attempted_at.astimezone(tz) if tz is not None else attempted_at
+
+    def as_dict(self) -> Dict:
+        return {
+            'total_attempts': self.total,
+            'correct_attempts': self.correct,
+            'incorrect_attempts': self.incorrect,
+            'current_streak': self.current_streak,
+            'best_streak': self.best_streak,
+            'last_activity': self.last_activity,
+            'success_rate': round((self.correct / self.total * 100) if self.total > 0 else 0, 1),
+        }
+
+
+class AttemptRecorder:
+    """Буфер попыток с фоновой пакетной записью (write-behind)
+
+    Попытки копятся в памяти и записываются функцией flush_fn пачками:
+    когда набирается batch_size попыток или проходит flush_interval секунд.
+    При переполнении очереди запись выполняется в вызывающем потоке.
+    Пачки пишутся строго в порядке очереди, поэтому все попытки до
+    n-й записаны, когда счетчик записанных (progress) дошел до n.
+    """
+
+    def __init__(self, flush_fn: Callable[[List[Attempt]], None], batch_size: int = 500,
+                 flush_interval: float = 1.0, max_queue: int = 100000):
+        self._flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue: Deque[Attempt] = deque()
+        self._cond = threading.Condition()
+        # Запись пачек строго по очереди, чтобы серии считались в порядке ответов
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._stats = {
+            'enqueued': 0,
+            'batches': 0,
+            'flushed': 0,
+            'failures': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+        }
+
+    def start(self) -> None:
+        """Запуск фонового потока записи"""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='attempt-recorder', daemon=True)
+            self._thread.start()
+
+    def add(self, attempt: Attempt) -> bool:
+        """Постановка попытки в очередь
+
+        Возвращает True, если очередь переполнена: тогда вызывающий
+        записывает ее сам (flush), уже не удерживая своих блокировок.
+        """
+        with self._cond:
+            self._queue.append(attempt)
+            self._stats['enqueued'] += 1
+            depth = len(self._queue)
+            if depth >= self.batch_size:
+                self._cond.notify()
+        if depth >= self.max_queue:
+            logger.warning('Очередь попыток переполнена (%s), запись в текущем потоке', depth)
+            return True
+        return False
+
+    def flush(self) -> int:
+        """Немедленная запись всех накопленных попыток; возвращает их число"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take(self.batch_size)
+                if not batch:
+                    return written
+                if not self._write(batch):
+                    return written
+                written += len(batch)
+
+    def progress(self) -> Tuple[int, int]:
+        """Число поставленных в очередь и записанных попыток за все время"""
+        with self._cond:
+            return self._stats['enqueued'], self._stats['flushed']
+
+    def close(self) -> None:
+        """Остановка фонового потока и запись остатка очереди"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def _take(self, limit: int) -> List[Attempt]:
+        """Извлечение пачки из начала очереди"""
+        with self._cond:
+            count = min(limit, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _write(self, batch: List[Attempt]) -> bool:
+        """Запись пачки; при ошибке пачка возвращается в начало очереди"""
+        started = time.perf_counter()
+        try:
+            self._flush_fn(batch)
+        except Exception:
+            logger.exception('Ошибка записи пачки попыток (%s шт.), повторим позже', len(batch))
+            with self._cond:
+                self._queue.extendleft(reversed(batch))
+                self._stats['failures'] += 1
+            return False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._cond:
+            self._stats['batches'] += 1
+            self._stats['flushed'] += len(batch)
+            self._stats['last_batch_size'] = len(batch)
+            self._stats['max_batch_size'] = max(self._stats['max_batch_size'], len(batch))
+            self._stats['last_flush_ms'] = elapsed_ms
+            self._stats['max_flush_ms'] = max(self._stats['max_flush_ms'], elapsed_ms)
+            self._stats['total_flush_ms'] += elapsed_ms
+        return True
+
+    def _run(self) -> None:
+        """Фоновый цикл: запись по размеру пачки или по таймеру"""
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._queue) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if self._stopping:
+                    return
+            self.flush()
+
+    def stats(self) -> Dict:
+        """Глубина очереди, размер пачек и время записи"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = len(self._queue)
+        batches = stats['batches']
+        stats['avg_batch_size'] = round(stats['flushed'] / batches, 1) if batches else 0.0
+        stats['avg_flush_ms'] = round(stats.pop('total_flush_ms') / batches, 3) if batches else 0.0
+        stats['last_flush_ms'] = round(stats['last_flush_ms'], 3)
+        stats['max_flush_ms'] = round(stats['max_flush_ms'], 3)
+        return stats
+
+
+def statistics_rows(deltas: Dict[int, StatisticsDelta]) -> List[Tuple]:
+    """Строки для UPDATE ... FROM (VALUES ...) по сводным изменениям"""
+    return [
+        (user_id, d.total, d.correct, d.total - d.correct, d.lead_run, d.max_run, d.tail_run, d.had_wrong, d.last_at)
+        for user_id, d in deltas.items()
+    ]
+
+
+def word_statistics_rows(batch: List[Attempt]) -> Tuple[List[Tuple], List[Tuple], List[Tuple]]:
+    """Строки для word_stats, user_word_stats и word_confusions по пачке попыток
+
+    Строки отсортированы по ключу, чтобы параллельные записи блокировали
+    строки в одном порядке.
+    """
+    words: Dict[str, List[int]] = {}
+    user_words: Dict[Tuple[int, str], List] = {}
+    confusions: Dict[Tuple[str, str], int] = {}
+    for a in batch:
+        key = a.word_en.lower()
+        error = 0 if a.was_correct else 1
+        counts = words.setdefault(key, [0, 0])
+        counts[0] += 1
+        counts[1] += error
+        user_counts = user_words.setdefault((a.user_id, key), [0, 0, a.attempted_at])
+        user_counts[0] += 1
+        user_counts[1] += error
+        user_counts[2] = max(user_counts[2], a.attempted_at)
+        if a.answer_en is not None:
+            confusions[(key, a.answer_en)] = confusions.get((key, a.answer_en), 0) + 1
+    return (
+        [(key, c[0], c[1]) for key, c in sorted(words.items())],
+        [(user_id, key, c[0], c[1], c[2]) for (user_id, key), c in sorted(user_words.items())],
+        [(key, answer, picks) for (key, answer), picks in sorted(confusions.items())],
+    )
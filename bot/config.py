@@ -31,6 +31,33 @@ try:
     config = load_config()
     TELEGRAM_BOT_TOKEN = config.get('BOT_TOKEN', '').strip()
     
+    # Режим работы: threaded (TeleBot + потоки) или async (AsyncTeleBot + asyncio)
+    BOT_RUNTIME = config.get('BOT_RUNTIME', 'threaded').strip().lower()
+    # Потоков для обработчиков в режиме async
+    ASYNC_WORKERS = int(config.get('ASYNC_WORKERS', '16'))
+    
+    # Очередь исходящих сообщений в режиме threaded: обработчики не ждут отправки,
+    # скорость ограничена лимитами Telegram (всего и на чат), 429 повторяются
+    OUTBOX = config.get('OUTBOX', '1') == '1'
+    OUTBOX_WORKERS = int(config.get('OUTBOX_WORKERS', '8'))
+    OUTBOX_GLOBAL_RATE = float(config.get('OUTBOX_GLOBAL_RATE', '30'))
+    OUTBOX_CHAT_RATE = float(config.get('OUTBOX_CHAT_RATE', '1'))
+    OUTBOX_CHAT_BURST = float(config.get('OUTBOX_CHAT_BURST', '3'))
+    OUTBOX_LINGER = float(config.get('OUTBOX_LINGER', '0.02'))
+    OUTBOX_MAX_QUEUE = int(config.get('OUTBOX_MAX_QUEUE', '10000'))
+    
+    # Получение обновлений: polling (long polling) или webhook (встроенный HTTP-сервер)
+    BOT_MODE = config.get('BOT_MODE', 'polling').strip().lower()
+    # Публичный адрес, который регистрируется в Telegram (пусто - не вызывать setWebhook)
+    WEBHOOK_URL = config.get('WEBHOOK_URL', '').strip()
+    WEBHOOK_LISTEN = config.get('WEBHOOK_LISTEN', '0.0.0.0')
+    WEBHOOK_PORT = int(config.get('WEBHOOK_PORT', '8443'))
+    WEBHOOK_PATH = config.get('WEBHOOK_PATH', '/webhook')
+    WEBHOOK_SECRET = config.get('WEBHOOK_SECRET', '').strip()
+    WEBHOOK_WORKERS = int(config.get('WEBHOOK_WORKERS', '8'))
+    WEBHOOK_QUEUE_SIZE = int(config.get('WEBHOOK_QUEUE_SIZE', '1000'))
+    WEBHOOK_MAX_CONNECTIONS = int(config.get('WEBHOOK_MAX_CONNECTIONS', '40'))
+    
     # Формируем строку подключения к БД
     DB_HOST = config.get('DB_HOST', 'localhost')
     DB_PORT = config.get('DB_PORT', '5432')
@@ -40,6 +67,82 @@ try:
     
     DB_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     
+    # Настройки пула соединений с БД
+    DB_POOL_MIN = int(config.get('DB_POOL_MIN', '1'))
+    DB_POOL_MAX = int(config.get('DB_POOL_MAX', '10'))
+    DB_POOL_TIMEOUT = float(config.get('DB_POOL_TIMEOUT', '10'))
+    DB_POOL_CHECK_IDLE = float(config.get('DB_POOL_CHECK_IDLE', '30'))
+    # Сколько секунд ждать установки нового соединения с БД
+    DB_CONNECT_TIMEOUT = int(config.get('DB_CONNECT_TIMEOUT', '10'))
+    
+    # Время жизни кэша общего словаря в секундах (0 - без кэша)
+    DICT_CACHE_TTL = float(config.get('DICT_CACHE_TTL', '300'))
+    
+    # Кэш пулов слов пользователей: число пользователей и время жизни в секундах
+    TRAINING_POOL_CACHE_SIZE = int(config.get('TRAINING_POOL_CACHE_SIZE', '10000'))
+    TRAINING_POOL_TTL = float(config.get('TRAINING_POOL_TTL', '600'))
+    
+    # Кэш соответствия telegram_id -> id пользователя в БД
+    USER_CACHE_SIZE = int(config.get('USER_CACHE_SIZE', '100000'))
+    
+    # Кэш статистики пользователей (экраны статистики без запроса к БД): размер и
+    # через сколько секунд перечитывать строку из БД (при нескольких экземплярах бота)
+    STATISTICS_CACHE_SIZE = int(config.get('STATISTICS_CACHE_SIZE', '100000'))
+    STATISTICS_CACHE_TTL = float(config.get('STATISTICS_CACHE_TTL', '600'))
+    
+    # Рейтинг (/top, /friends): сколько лучших показывать и как часто перестраивать из БД, секунды
+    LEADERBOARD_SIZE = int(config.get('LEADERBOARD_SIZE', '10'))
+    LEADERBOARD_REFRESH = float(config.get('LEADERBOARD_REFRESH', '600'))
+    
+    # Отложенная пакетная запись попыток ответа
+    ATTEMPTS_WRITE_BEHIND = config.get('ATTEMPTS_WRITE_BEHIND', '1') == '1'
+    ATTEMPTS_BATCH_SIZE = int(config.get('ATTEMPTS_BATCH_SIZE', '500'))
+    ATTEMPTS_FLUSH_INTERVAL = float(config.get('ATTEMPTS_FLUSH_INTERVAL', '1'))
+    ATTEMPTS_MAX_QUEUE = int(config.get('ATTEMPTS_MAX_QUEUE', '100000'))
+    
+    # Выбор вопросов по статистике слов: сложные новые слова и частые путаницы в вариантах
+    QUIZ_HARD_WORDS = config.get('QUIZ_HARD_WORDS', '1') == '1'
+    QUIZ_CONFUSABLE_DISTRACTORS = config.get('QUIZ_CONFUSABLE_DISTRACTORS', '1') == '1'
+    # Как часто перечитывать статистику слов из БД, секунды
+    WORD_STATS_TTL = float(config.get('WORD_STATS_TTL', '300'))
+    
+    # Импорт слов из файла: максимальный размер файла в байтах и число слов
+    IMPORT_MAX_BYTES = int(config.get('IMPORT_MAX_BYTES', '2000000'))
+    IMPORT_MAX_WORDS = int(config.get('IMPORT_MAX_WORDS', '20000'))
+    
+    # Запуск: fast (pid-файл, проверки параллельно, прогрев пула и словаря) или legacy (прежние проверки)
+    STARTUP_MODE = config.get('STARTUP_MODE', 'fast').strip().lower()
+    # pid-файл запущенного бота (пусто - во временном каталоге, имя по хэшу токена)
+    BOT_PIDFILE = config.get('BOT_PIDFILE', '').strip()
+    # Сколько секунд ждать завершения предыдущего экземпляра и проверок при запуске
+    STARTUP_TIMEOUT = float(config.get('STARTUP_TIMEOUT', '10'))
+    
+    # Выбор лидера через advisory-блокировку в PostgreSQL (только polling):
+    # обновления получает один экземпляр, остальные ждут в резерве
+    LEADER_ELECTION = config.get('LEADER_ELECTION', '0') == '1'
+    LEADER_RETRY_INTERVAL = float(config.get('LEADER_RETRY_INTERVAL', '2'))
+    
+    # Метрики в формате Prometheus (GET /metrics); порт 0 - не запускать
+    METRICS_LISTEN = config.get('METRICS_LISTEN', '127.0.0.1')
+    METRICS_PORT = int(config.get('METRICS_PORT', '0'))
+    
+    # Хранилище состояний диалога: memory (в процессе) или postgres (общее для экземпляров)
+    SESSION_STORE = config.get('SESSION_STORE', 'memory').strip().lower()
+    SESSION_CACHE_SIZE = int(config.get('SESSION_CACHE_SIZE', '100000'))
+    SESSION_TTL = float(config.get('SESSION_TTL', '86400'))
+    
+    if BOT_RUNTIME not in ('threaded', 'async'):
+        raise RuntimeError(f'BOT_RUNTIME должен быть threaded или async, указано: {BOT_RUNTIME}')
+    
+    if STARTUP_MODE not in ('fast', 'legacy'):
+        raise RuntimeError(f'STARTUP_MODE должен быть fast или legacy, указано: {STARTUP_MODE}')
+    
+    if BOT_MODE not in ('polling', 'webhook'):
+        raise RuntimeError(f'BOT_MODE должен быть polling или webhook, указано: {BOT_MODE}')
+    
+    if BOT_MODE == 'webhook' and BOT_RUNTIME != 'threaded':
+        raise RuntimeError('Режим webhook работает только с BOT_RUNTIME=threaded')
+    
     if not TELEGRAM_BOT_TOKEN or TELEGRAM_BOT_TOKEN == 'ВАШ_ТОКЕН_БОТА_ЗДЕСЬ':
         raise RuntimeError(
             'TELEGRAM_BOT_TOKEN не настроен в config.txt\n'
@@ -1,83 +1,286 @@
-import random
-from typing import List, Optional, Tuple, Dict
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from urllib.parse import urlparse
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 
-from config import DB_URL
+from attempts import (
+    Attempt, AttemptRecorder, UserStatistics, aggregate_statistics, statistics_rows, word_statistics_rows,
+)
+from cache import LRUCache
+from difficulty import CONFUSIONS_PER_WORD, WordDifficulty
+from leaderboard import Leaderboard, SnapshotGate
+from metrics import (
+    ATTEMPT_BATCHES, ATTEMPT_WRITE_FAILURES, ATTEMPTS_WRITTEN, CACHE_ENTRIES, CACHE_LOOKUPS, DB_ERRORS,
+    DB_POOL_CHECKOUTS, DB_POOL_CONNECTIONS, DB_POOL_WAIT_MAX, DB_POOL_WAIT_SECONDS, DB_POOL_WAITS, DB_SECONDS,
+    QUEUE_DEPTH, USER_PROFILE_UPDATES, timed,
+)
+from config import (
+    DB_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_CHECK_IDLE, DB_CONNECT_TIMEOUT, DICT_CACHE_TTL,
+    TRAINING_POOL_CACHE_SIZE, TRAINING_POOL_TTL, USER_CACHE_SIZE,
+    ATTEMPTS_WRITE_BEHIND, ATTEMPTS_BATCH_SIZE, ATTEMPTS_FLUSH_INTERVAL, ATTEMPTS_MAX_QUEUE,
+    QUIZ_HARD_WORDS, QUIZ_CONFUSABLE_DISTRACTORS, WORD_STATS_TTL, STATISTICS_CACHE_SIZE, STATISTICS_CACHE_TTL,
+    LEADERBOARD_REFRESH,
+)
+from pool import ConnectionPool
+from sampling import DictionarySnapshot, TrainingPool
+from srs import ReviewQueue, ReviewState, pick_question as pick_review_question
+from wordfile import CopySource, ImportResult
 
+logger = logging.getLogger(__name__)
 
-def _connect():
-    """Создание подключения к базе данных"""
+# Время и ошибки функций модуля (гистограмма englishcard_db_seconds, см. bot/metrics.py)
+_timed = timed(DB_SECONDS, DB_ERRORS)
+
+# Канал NOTIFY, в который пишет триггер на таблице dictionary (см. db/schema.sql)
+DICTIONARY_CHANNEL = 'dictionary_changed'
+
+
+def _connect_kwargs() -> Dict:
+    """Параметры подключения к базе данных из DB_URL"""
     parsed = urlparse(DB_URL)
-    return psycopg2.connect(
+    return dict(
         dbname=parsed.path.lstrip('/'),
         user=parsed.username,
         password=parsed.password,
         host=parsed.hostname,
         port=parsed.port or 5432,
+        connect_timeout=DB_CONNECT_TIMEOUT,
         cursor_factory=RealDictCursor,
     )
 
 
+# Общий для процесса пул соединений (создается при первом обращении)
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Получение общего пула соединений"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    min_size=DB_POOL_MIN,
+                    max_size=DB_POOL_MAX,
+                    connect_kwargs=_connect_kwargs(),
+                    checkout_timeout=DB_POOL_TIMEOUT,
+                    check_idle_after=DB_POOL_CHECK_IDLE,
+                )
+    return _pool
+
+
+def get_pool_stats() -> Dict:
+    """Статистика пула соединений (занятые, свободные, время ожидания)"""
+    if _pool is None:
+        return {}
+    return _pool.stats()
+
+
+def close_pool() -> None:
+    """Закрытие пула соединений при остановке бота"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+@contextmanager
+def _connect():
+    """Соединение из пула: фиксирует транзакцию при успехе и возвращает соединение в пул"""
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+        conn.commit()
+    except Exception as exc:
+        broken = isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        raise
+    finally:
+        pool.putconn(conn, discard=broken)
+
+
 # Функции для работы с пользователями
 
+# Кэш telegram_id -> (users.id, username, first_name)
+_identities = LRUCache(USER_CACHE_SIZE)
+_identity_profile_updates = 0
+
+
+_ENSURE_USER_SQL = """
+    INSERT INTO users (telegram_id, username, first_name)
+    VALUES (%(telegram_id)s, %(username)s, %(first_name)s)
+    ON CONFLICT (telegram_id)
+    DO UPDATE SET username = EXCLUDED.username, first_name = EXCLUDED.first_name
+    RETURNING id
+"""
+_ENSURE_STATISTICS_SQL = """
+    INSERT INTO user_statistics (user_id)
+    VALUES (%(user_id)s)
+    ON CONFLICT (user_id) DO NOTHING
+"""
+
+
+@_timed
 def ensure_user(telegram_id: int, username: Optional[str], first_name: Optional[str]) -> int:
     """Создание или обновление пользователя в базе данных"""
+    global _identity_profile_updates
+    cached = _identities.get(telegram_id)
+    if cached is not None:
+        user_id, cached_username, cached_first_name = cached
+        if cached_username == username and cached_first_name == first_name:
+            return user_id
+        _identity_profile_updates += 1
     with _connect() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO users (telegram_id, username, first_name)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (telegram_id)
-            DO UPDATE SET username = EXCLUDED.username, first_name = EXCLUDED.first_name
-            RETURNING id
-            """,
-            (telegram_id, username, first_name),
-        )
+        cur.execute(_ENSURE_USER_SQL, {'telegram_id': telegram_id, 'username': username, 'first_name': first_name})
         row = cur.fetchone()
         user_id = int(row['id'])
         
         # Создаем запись статистики если её нет
-        cur.execute(
-            """
-            INSERT INTO user_statistics (user_id)
-            VALUES (%s)
-            ON CONFLICT (user_id) DO NOTHING
-            """,
-            (user_id,),
-        )
-        
-        return user_id
+        cur.execute(_ENSURE_STATISTICS_SQL, {'user_id': user_id})
+    
+    _identities.put(telegram_id, (user_id, username, first_name))
+    return user_id
+
+
+def get_identity_cache_stats() -> Dict:
+    """Статистика кэша пользователей: попадания, промахи и обновления профиля"""
+    stats = _identities.stats()
+    stats['profile_updates'] = _identity_profile_updates
+    return stats
 
 
 # Функции для работы со словарем и пользовательскими словами
 
-def get_all_dictionary_words() -> List[Tuple[str, str]]:
-    """Получение всех слов из общего словаря"""
+_dictionary: Optional[DictionarySnapshot] = None
+_dictionary_lock = threading.Lock()
+_dictionary_listener = None
+
+
+def _listen_dictionary_changes():
+    """Отдельное соединение, получающее NOTIFY об изменениях словаря"""
+    conn = psycopg2.connect(**_connect_kwargs())
+    conn.set_session(autocommit=True)
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {DICTIONARY_CHANNEL}")
+    return conn
+
+
+def leader_connection():
+    """Отдельное соединение для блокировки лидера (bot/leader.py), вне пула
+
+    Keepalive с обеих сторон: если хост лидера пропадет, сервер закроет
+    его сессию и освободит блокировку примерно за 10 секунд.
+    """
+    return psycopg2.connect(
+        **_connect_kwargs(),
+        keepalives=1, keepalives_idle=5, keepalives_interval=2, keepalives_count=2,
+        options='-c tcp_keepalives_idle=5 -c tcp_keepalives_interval=2 -c tcp_keepalives_count=2',
+        application_name='englishcard-leader',
+    )
+
+
+def _dictionary_changed() -> bool:
+    """Проверка уведомлений без обращения к серверу (только чтение сокета)"""
+    global _dictionary_listener
+    if _dictionary_listener is None:
+        return False
+    try:
+        _dictionary_listener.poll()
+    except psycopg2.Error:
+        logger.warning('Соединение LISTEN для словаря потеряно, используется только TTL')
+        try:
+            _dictionary_listener.close()
+        except psycopg2.Error:
+            pass
+        _dictionary_listener = None
+        return True
+    if _dictionary_listener.notifies:
+        _dictionary_listener.notifies.clear()
+        return True
+    return False
+
+
+def _load_dictionary() -> DictionarySnapshot:
+    """Загрузка общего словаря из базы данных"""
+    global _dictionary_listener
+    # Подписываемся до чтения таблицы, чтобы не пропустить изменения между ними
+    if _dictionary_listener is None and DICT_CACHE_TTL > 0:
+        try:
+            _dictionary_listener = _listen_dictionary_changes()
+        except psycopg2.Error as exc:
+            logger.warning('Не удалось подписаться на изменения словаря: %s', exc)
     with _connect() as conn, conn.cursor() as cur:
         cur.execute("SELECT word_en, word_ru FROM dictionary ORDER BY id")
         rows = cur.fetchall()
-        return [(r['word_en'], r['word_ru']) for r in rows]
+    words = {}
+    for r in rows:
+        # Удаляем дубликаты по английскому слову, как в пуле тренировки
+        words[r['word_en'].lower()] = (r['word_en'], r['word_ru'])
+    return DictionarySnapshot(tuple(words.values()))
+
+
+@_timed
+def get_dictionary() -> DictionarySnapshot:
+    """Общий словарь из кэша; перечитывается по NOTIFY или по истечении TTL"""
+    global _dictionary
+    snapshot = _dictionary
+    if (snapshot is not None and DICT_CACHE_TTL > 0
+            and time.monotonic() - snapshot.loaded_at < DICT_CACHE_TTL
+            and not _dictionary_changed()):
+        return snapshot
+    with _dictionary_lock:
+        # Другой поток мог уже обновить снимок, пока мы ждали блокировку
+        if _dictionary is not snapshot and _dictionary is not None:
+            return _dictionary
+        _dictionary = _load_dictionary()
+        return _dictionary
+
 
+def invalidate_dictionary_cache() -> None:
+    """Принудительный сброс кэша словаря"""
+    global _dictionary
+    with _dictionary_lock:
+        _dictionary = None
 
+
+@_timed
+def get_all_dictionary_words() -> List[Tuple[str, str]]:
+    """Получение всех слов из общего словаря"""
+    return list(get_dictionary().words)
+
+
+_CUSTOM_WORDS_SQL = """
+    SELECT word_en, word_ru
+    FROM user_words
+    WHERE user_id = %(user_id)s AND source = 'custom' AND is_active = TRUE
+    ORDER BY id
+"""
+
+
+@_timed
 def get_user_custom_words(user_id: int) -> List[Tuple[str, str]]:
     """Получение пользовательских слов"""
     with _connect() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT word_en, word_ru
-            FROM user_words
-            WHERE user_id = %s AND source = 'custom' AND is_active = TRUE
-            ORDER BY id
-            """,
-            (user_id,),
-        )
+        cur.execute(_CUSTOM_WORDS_SQL, {'user_id': user_id})
         rows = cur.fetchall()
         return [(r['word_en'], r['word_ru']) for r in rows]
 
 
+@_timed
 def add_user_word(user_id: int, word_en: str, word_ru: str) -> None:
     """Добавление нового слова пользователя"""
     word_en = word_en.strip().lower()
@@ -90,133 +293,1007 @@ def add_user_word(user_id: int, word_en: str, word_ru: str) -> None:
             """,
             (user_id, word_en, word_ru),
         )
+    pool = _training_pools.get(user_id)
+    if pool is not None:
+        pool.add(word_en, word_ru)
+
 
+_DELETE_USER_WORD_SQL = """
+    UPDATE user_words
+    SET is_active = FALSE
+    WHERE user_id = %(user_id)s AND source = 'custom' AND LOWER(word_en) = %(word_en)s AND is_active = TRUE
+    RETURNING id
+"""
 
+
+@_timed
 def delete_user_word(user_id: int, word_en: str) -> bool:
     """Удаление слова пользователя (деактивация)"""
     word_en = word_en.strip().lower()
     with _connect() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            UPDATE user_words
-            SET is_active = FALSE
-            WHERE user_id = %s AND source = 'custom' AND LOWER(word_en) = %s AND is_active = TRUE
-            RETURNING id
-            """,
-            (user_id, word_en),
+        cur.execute(_DELETE_USER_WORD_SQL, {'user_id': user_id, 'word_en': word_en})
+        deleted = cur.fetchone() is not None
+    if deleted:
+        pool = _training_pools.get(user_id)
+        if pool is not None:
+            pool.remove(word_en)
+    return deleted
+
+
+@_timed
+def import_user_words(user_id: int, rows: Iterable[Tuple[str, str]], max_words: int) -> ImportResult:
+    """Массовое добавление слов пользователя через COPY
+
+    rows читается потоково (например, WordFileParser); слова, которые уже
+    есть в пуле пользователя или повторяются, пропускаются. В итоге - число
+    добавленных слов, число дубликатов и признак, что лимит max_words
+    превышен (остаток не загружается).
+    """
+    pool = _get_training_pool(user_id)
+    seen: Set[str] = set()
+    added: List[Tuple[str, str]] = []
+    counts = {'duplicates': 0, 'truncated': False}
+
+    def fresh_rows() -> Iterator[Tuple[int, str, str, str]]:
+        for en, ru in rows:
+            if en in seen or en in pool:
+                counts['duplicates'] += 1
+                continue
+            if len(added) >= max_words:
+                counts['truncated'] = True
+                return
+            seen.add(en)
+            added.append((en, ru))
+            yield user_id, 'custom', en, ru
+
+    source = CopySource(fresh_rows())
+    try:
+        with _connect() as conn, conn.cursor() as cur:
+            cur.copy_expert(
+                "COPY user_words (user_id, source, word_en, word_ru) FROM STDIN WITH (FORMAT csv)",
+                source,
+            )
+    except psycopg2.Error:
+        # Ошибка разбора файла (например, кодировки) важнее ошибки COPY, которую она вызвала
+        if source.error is not None:
+            raise source.error from None
+        raise
+    for en, ru in added:
+        pool.add(en, ru)
+    return ImportResult(len(added), counts['duplicates'], counts['truncated'])
+
+
+@_timed
+def export_user_words(user_id: int, out: BinaryIO) -> int:
+    """Выгрузка своих слов пользователя в TSV с заголовком (формат импорта) через COPY
+
+    Возвращает число выгруженных слов.
+    """
+    with _connect() as conn, conn.cursor() as cur:
+        cur.copy_expert(
+            cur.mogrify(
+                """
+                COPY (
+                    SELECT word_en, word_ru
+                    FROM user_words
+                    WHERE user_id = %s AND source = 'custom' AND is_active = TRUE
+                    ORDER BY id
+                ) TO STDOUT WITH (FORMAT csv, DELIMITER E'\\t', HEADER)
+                """,
+                (user_id,),
+            ).decode(),
+            out,
         )
-        return cur.fetchone() is not None
+        return cur.rowcount
 
 
 # Функции для работы с тренировками
 
+# Пулы слов пользователей, обновляемые при добавлении и удалении слов
+_training_pools = LRUCache(TRAINING_POOL_CACHE_SIZE, ttl=TRAINING_POOL_TTL)
+
+
+def _get_training_pool(user_id: int) -> TrainingPool:
+    """Пул слов пользователя из кэша (загружается один раз)"""
+    snapshot = get_dictionary()
+    pool = _training_pools.get(user_id)
+    if pool is None:
+        pool = TrainingPool(snapshot, get_user_custom_words(user_id))
+        _training_pools.put(user_id, pool)
+    elif pool.shared is not snapshot:
+        pool.rebase(snapshot)
+    return pool
+
+
+@_timed
 def get_training_pool(user_id: int) -> List[Tuple[str, str]]:
     """Получение пула слов для тренировки (общие + пользовательские)"""
-    pool = get_all_dictionary_words() + get_user_custom_words(user_id)
-    # Удаляем дубликаты по английскому слову
-    dedup = {}
-    for en, ru in pool:
-        dedup[en.lower()] = (en, ru)
-    return list(dedup.values())
+    return _get_training_pool(user_id).items()
+
+
+_COUNT_USER_WORDS_SQL = """
+    SELECT COUNT(DISTINCT LOWER(w.word_en)) AS extra
+    FROM user_words AS w
+    WHERE w.user_id = %(user_id)s AND w.source = 'custom' AND w.is_active = TRUE
+      AND NOT EXISTS (SELECT 1 FROM dictionary AS d WHERE LOWER(d.word_en) = LOWER(w.word_en))
+"""
+
+
+@_timed
+def count_user_words(user_id: int) -> int:
+    """Число слов для тренировки (общие + свои) без выгрузки самих слов
+
+    Если пул пользователя в кэше, это его длина; иначе БД возвращает одно
+    число - свои слова, которых нет в общем словаре.
+    """
+    snapshot = get_dictionary()
+    pool = _training_pools.get(user_id)
+    if pool is not None:
+        if pool.shared is not snapshot:
+            pool.rebase(snapshot)
+        return len(pool)
+    with _connect() as conn, conn.cursor() as cur:
+        cur.execute(_COUNT_USER_WORDS_SQL, {'user_id': user_id})
+        extra = cur.fetchone()['extra']
+    return len(snapshot.words) + extra
+
+
+def _pick_question(pool: TrainingPool, queue: ReviewQueue) -> Optional[Tuple[str, str, List[str]]]:
+    """Выбор вопроса по очереди повторения с учетом статистики слов (см. QUIZ_* в config.txt)"""
+    use_stats = QUIZ_HARD_WORDS or QUIZ_CONFUSABLE_DISTRACTORS
+    return pick_review_question(
+        pool, queue,
+        difficulty=get_word_difficulty() if use_stats else None,
+        prefer_hard=QUIZ_HARD_WORDS,
+        confusable=QUIZ_CONFUSABLE_DISTRACTORS,
+    )
 
 
+@_timed
 def pick_question_with_options(user_id: int) -> Optional[Tuple[str, str, List[str]]]:
-    """Выбор вопроса с вариантами ответов для тренировки"""
-    pool = get_training_pool(user_id)
-    if len(pool) < 4:
-        return None
-    
-    # Выбираем случайное слово для вопроса
-    question_en, question_ru = random.choice(pool)
-    
-    # Выбираем 3 неправильных варианта
-    wrong = [en for en, _ in pool if en != question_en]
-    wrong_options = random.sample(wrong, 3)
-    
-    # Создаем список всех вариантов и перемешиваем
-    options = wrong_options + [question_en]
-    random.shuffle(options)
-    
-    return question_ru, question_en, options
+    """Выбор вопроса с вариантами ответов: слово, которое пора повторить, или новое"""
+    return _pick_question(_get_training_pool(user_id), _get_review_queue(user_id))
+
 
+def get_training_pool_stats() -> Dict:
+    """Статистика кэша пулов слов пользователей"""
+    return _training_pools.stats()
 
-def record_attempt(user_id: int, word_en: str, was_correct: bool) -> None:
-    """Запись попытки ответа в базу данных"""
+
+# Статистика слов (bot/difficulty.py): снимок по словам общего словаря
+_difficulty: Optional[WordDifficulty] = None
+_difficulty_lock = threading.Lock()
+
+
+_WORD_CONFUSIONS_SQL = """
+    SELECT LOWER(d.word_en) AS word_en, c.answer_en
+    FROM dictionary AS d
+    CROSS JOIN LATERAL (
+        SELECT answer_en
+        FROM word_confusions
+        WHERE word_en = LOWER(d.word_en)
+        ORDER BY picks DESC
+        LIMIT %(limit)s
+    ) AS c
+"""
+
+
+def _load_word_difficulty() -> WordDifficulty:
+    """Загрузка доли ошибок и частых путаниц по словам общего словаря"""
     with _connect() as conn, conn.cursor() as cur:
-        # Записываем попытку
         cur.execute(
-            "INSERT INTO quiz_attempts (user_id, word_en, was_correct) VALUES (%s, %s, %s)",
-            (user_id, word_en, was_correct),
+            """
+            SELECT s.word_en, s.attempts, s.errors
+            FROM dictionary AS d
+            JOIN word_stats AS s ON s.word_en = LOWER(d.word_en)
+            """
         )
-        
-        # Обновляем статистику
-        if was_correct:
+        stats = [(r['word_en'], r['attempts'], r['errors']) for r in cur.fetchall()]
+        cur.execute(_WORD_CONFUSIONS_SQL, {'limit': CONFUSIONS_PER_WORD})
+        confusions = [(r['word_en'], r['answer_en']) for r in cur.fetchall()]
+    return WordDifficulty(stats, confusions)
+
+
+@_timed
+def get_word_difficulty() -> WordDifficulty:
+    """Статистика слов из кэша; перечитывается по истечении WORD_STATS_TTL"""
+    global _difficulty
+    snapshot = _difficulty
+    if snapshot is not None and time.monotonic() - snapshot.loaded_at < WORD_STATS_TTL:
+        return snapshot
+    with _difficulty_lock:
+        if _difficulty is not snapshot and _difficulty is not None:
+            return _difficulty
+        _difficulty = _load_word_difficulty()
+        return _difficulty
+
+
+_HARD_WORDS_SQL = """
+    SELECT word_en, attempts, errors
+    FROM user_word_stats
+    WHERE user_id = %(user_id)s AND errors > 0
+    ORDER BY errors::float / attempts DESC, errors DESC
+    LIMIT %(limit)s
+"""
+
+
+@_timed
+def get_user_hard_words(user_id: int, limit: int = 3) -> List[Dict]:
+    """Слова, в которых пользователь ошибается чаще всего"""
+    flush_attempts()
+    with _connect() as conn, conn.cursor() as cur:
+        cur.execute(_HARD_WORDS_SQL, {'user_id': user_id, 'limit': limit})
+        return [dict(r) for r in cur.fetchall()]
+
+
+# Интервальное повторение (bot/srs.py): очереди пользователей в памяти,
+# состояние слов - в таблице word_reviews
+_review_queues = LRUCache(TRAINING_POOL_CACHE_SIZE, ttl=TRAINING_POOL_TTL)
+
+# Новые состояния слов, ожидающие записи вместе с пачкой попыток
+_pending_reviews: Dict[Tuple[int, str], ReviewState] = {}
+_pending_reviews_lock = threading.Lock()
+
+
+_REVIEW_QUEUE_SQL = """
+    SELECT word_en, repetitions, ease, interval_seconds, lapses,
+           EXTRACT(EPOCH FROM next_due) AS next_due
+    FROM word_reviews
+    WHERE user_id = %(user_id)s
+    ORDER BY next_due
+"""
+
+
+def _get_review_queue(user_id: int) -> ReviewQueue:
+    """Очередь повторения пользователя из кэша (загружается один раз)"""
+    queue = _review_queues.get(user_id)
+    if queue is None:
+        with _connect() as conn, conn.cursor() as cur:
+            cur.execute(_REVIEW_QUEUE_SQL, {'user_id': user_id})
+            rows = cur.fetchall()
+        queue = ReviewQueue(
+            (r['word_en'], ReviewState(r['repetitions'], r['ease'], float(r['interval_seconds']),
+                                       r['lapses'], float(r['next_due'])))
+            for r in rows
+        )
+        _review_queues.put(user_id, queue)
+    return queue
+
+
+def _review_row(user_id: int, key: str, state: ReviewState) -> Tuple:
+    """Строка word_reviews для записи"""
+    return (user_id, key, state.repetitions, state.ease, int(state.interval), state.lapses,
+            datetime.fromtimestamp(state.next_due, timezone.utc))
+
+
+_REVIEWS_UPSERT_SQL = """
+    INSERT INTO word_reviews (user_id, word_en, repetitions, ease, interval_seconds, lapses, next_due)
+    VALUES %s
+    ON CONFLICT (user_id, word_en) DO UPDATE
+    SET repetitions = EXCLUDED.repetitions,
+        ease = EXCLUDED.ease,
+        interval_seconds = EXCLUDED.interval_seconds,
+        lapses = EXCLUDED.lapses,
+        next_due = EXCLUDED.next_due
+"""
+
+
+_WORD_STATS_UPSERT_SQL = """
+    INSERT INTO word_stats (word_en, attempts, errors)
+    VALUES %s
+    ON CONFLICT (word_en) DO UPDATE
+    SET attempts = word_stats.attempts + EXCLUDED.attempts,
+        errors = word_stats.errors + EXCLUDED.errors,
+        updated_at = NOW()
+"""
+_USER_WORD_STATS_UPSERT_SQL = """
+    INSERT INTO user_word_stats (user_id, word_en, attempts, errors, last_attempt_at)
+    VALUES %s
+    ON CONFLICT (user_id, word_en) DO UPDATE
+    SET attempts = user_word_stats.attempts + EXCLUDED.attempts,
+        errors = user_word_stats.errors + EXCLUDED.errors,
+        last_attempt_at = GREATEST(user_word_stats.last_attempt_at, EXCLUDED.last_attempt_at)
+"""
+_WORD_CONFUSIONS_UPSERT_SQL = """
+    INSERT INTO word_confusions (word_en, answer_en, picks)
+    VALUES %s
+    ON CONFLICT (word_en, answer_en) DO UPDATE
+    SET picks = word_confusions.picks + EXCLUDED.picks
+"""
+
+
+_ATTEMPTS_INSERT_SQL = """
+    INSERT INTO quiz_attempts (user_id, word_en, was_correct, attempted_at, answer_en) VALUES %s
+"""
+# Итоги пачки по пользователям (см. aggregate_statistics) применяются одним UPDATE
+_STATISTICS_BATCH_SQL = """
+    UPDATE user_statistics AS s
+    SET total_attempts = s.total_attempts + v.total,
+        correct_attempts = s.correct_attempts + v.correct,
+        incorrect_attempts = s.incorrect_attempts + v.incorrect,
+        current_streak = CASE WHEN v.had_wrong THEN v.tail_run ELSE s.current_streak + v.total END,
+        best_streak = GREATEST(s.best_streak, s.current_streak + v.lead_run, v.max_run),
+        last_activity = v.last_at
+    FROM (VALUES %s) AS v(user_id, total, correct, incorrect, lead_run, max_run, tail_run, had_wrong, last_at)
+    WHERE s.user_id = v.user_id
+"""
+
+
+@_timed
+def _write_attempts(batch: List[Attempt]) -> None:
+    """Пакетная запись попыток: один INSERT на все строки, один UPDATE статистики
+    и один upsert состояний повторения"""
+    with _pending_reviews_lock:
+        reviews = dict(_pending_reviews)
+        _pending_reviews.clear()
+    try:
+        _write_attempts_batch(batch, reviews)
+    except Exception:
+        # Более новые состояния, появившиеся за время записи, не перезаписываются
+        with _pending_reviews_lock:
+            for key, state in reviews.items():
+                _pending_reviews.setdefault(key, state)
+        raise
+
+
+def _write_attempts_batch(batch: List[Attempt], reviews: Dict[Tuple[int, str], ReviewState]) -> None:
+    with _connect() as conn, conn.cursor() as cur:
+        if reviews:
+            rows = [_review_row(user_id, key, state) for (user_id, key), state in reviews.items()]
+            execute_values(cur, _REVIEWS_UPSERT_SQL, rows, page_size=len(rows))
+        execute_values(cur, _ATTEMPTS_INSERT_SQL, batch, page_size=len(batch))
+        words, user_words, confusions = word_statistics_rows(batch)
+        execute_values(cur, _WORD_STATS_UPSERT_SQL, words, page_size=len(words))
+        execute_values(cur, _USER_WORD_STATS_UPSERT_SQL, user_words, page_size=len(user_words))
+        if confusions:
+            execute_values(cur, _WORD_CONFUSIONS_UPSERT_SQL, confusions, page_size=len(confusions))
+        rows = statistics_rows(aggregate_statistics(batch))
+        execute_values(cur, _STATISTICS_BATCH_SQL, rows, page_size=len(rows))
+
+
+# Отложенная запись попыток (создается при первой попытке)
+_recorder: Optional[AttemptRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def _get_recorder() -> AttemptRecorder:
+    """Общий для процесса буфер попыток"""
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                recorder = AttemptRecorder(
+                    _write_attempts,
+                    batch_size=ATTEMPTS_BATCH_SIZE,
+                    flush_interval=ATTEMPTS_FLUSH_INTERVAL,
+                    max_queue=ATTEMPTS_MAX_QUEUE,
+                )
+                recorder.start()
+                _recorder = recorder
+    return _recorder
+
+
+@_timed
+def flush_attempts() -> int:
+    """Немедленная запись накопленных попыток"""
+    if _recorder is None:
+        return 0
+    return _recorder.flush()
+
+
+def get_attempt_recorder_stats() -> Dict:
+    """Глубина очереди попыток, размер пачек и время записи"""
+    if _recorder is None:
+        return {}
+    return _recorder.stats()
+
+
+
+
+def warm_up() -> Dict:
+    """Прогрев при запуске: открытие пула соединений и загрузка общего словаря
+
+    Заодно проверяет доступность PostgreSQL (ошибка подключения
+    пробрасывается вызывающему).
+    """
+    get_pool()
+    snapshot = get_dictionary()
+    if QUIZ_HARD_WORDS or QUIZ_CONFUSABLE_DISTRACTORS:
+        get_word_difficulty()
+    _get_leaderboard()
+    stats = get_pool_stats()
+    logger.info('Пул соединений: %s, слов в словаре: %s', stats, len(snapshot.words))
+    return {'dictionary_words': len(snapshot.words), **stats}
+
+
+def shutdown() -> None:
+    """Запись оставшихся попыток и закрытие соединений при остановке бота"""
+    global _recorder
+    with _recorder_lock:
+        recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.close()
+    close_pool()
+
+
+# Запись попытки, состояния повторения, статистики слов и пользователя одним запросом:
+# INSERT-ы в CTE, UPDATE статистики пользователя - основной оператор
+_ATTEMPT_CTE = """
+    attempt AS (
+        INSERT INTO quiz_attempts (user_id, word_en, was_correct, answer_en)
+        VALUES (%(user_id)s, %(word_en)s, %(correct)s, %(answer_en)s)
+    ),
+    word_stat AS (
+        INSERT INTO word_stats (word_en, attempts, errors)
+        VALUES (%(key)s, 1, (NOT %(correct)s)::int)
+        ON CONFLICT (word_en) DO UPDATE
+        SET attempts = word_stats.attempts + 1,
+            errors = word_stats.errors + EXCLUDED.errors,
+            updated_at = NOW()
+    ),
+    user_word_stat AS (
+        INSERT INTO user_word_stats (user_id, word_en, attempts, errors, last_attempt_at)
+        VALUES (%(user_id)s, %(key)s, 1, (NOT %(correct)s)::int, NOW())
+        ON CONFLICT (user_id, word_en) DO UPDATE
+        SET attempts = user_word_stats.attempts + 1,
+            errors = user_word_stats.errors + EXCLUDED.errors,
+            last_attempt_at = EXCLUDED.last_attempt_at
+    ),
+    confusion AS (
+        INSERT INTO word_confusions (word_en, answer_en, picks)
+        SELECT %(key)s, %(answer_en)s, 1
+        WHERE %(answer_en)s IS NOT NULL
+        ON CONFLICT (word_en, answer_en) DO UPDATE
+        SET picks = word_confusions.picks + 1
+    ),
+    review AS (
+        INSERT INTO word_reviews (user_id, word_en, repetitions, ease, interval_seconds, lapses, next_due)
+        VALUES %(review)s
+        ON CONFLICT (user_id, word_en) DO UPDATE
+        SET repetitions = EXCLUDED.repetitions,
+            ease = EXCLUDED.ease,
+            interval_seconds = EXCLUDED.interval_seconds,
+            lapses = EXCLUDED.lapses,
+            next_due = EXCLUDED.next_due
+    )
+"""
+_STATISTICS_UPDATE_SQL = """
+    UPDATE user_statistics
+    SET total_attempts = total_attempts + 1,
+        correct_attempts = correct_attempts + %(correct)s::int,
+        incorrect_attempts = incorrect_attempts + (NOT %(correct)s)::int,
+        current_streak = CASE WHEN %(correct)s THEN current_streak + 1 ELSE 0 END,
+        best_streak = CASE WHEN %(correct)s THEN GREATEST(best_streak, current_streak + 1) ELSE best_streak END,
+        last_activity = NOW()
+    WHERE user_id = %(user_id)s
+"""
+_ATTEMPT_SQL = f"WITH {_ATTEMPT_CTE} {_STATISTICS_UPDATE_SQL}"
+# То же и чтение своих слов пользователя, если его пул еще не загружен
+_ATTEMPT_WITH_WORDS_SQL = f"WITH {_ATTEMPT_CTE}, stats AS ({_STATISTICS_UPDATE_SQL}) {_CUSTOM_WORDS_SQL}"
+
+
+def _wrong_answer_key(user_id: int, answer_en: Optional[str]) -> Optional[str]:
+    """Неправильный ответ как ключ слова, если это слово из пула пользователя"""
+    if not answer_en:
+        return None
+    key = answer_en.strip().lower()
+    pool = _training_pools.get(user_id)
+    return key if pool is not None and key in pool else None
+
+
+def _review_attempt(user_id: int, word_en: str, was_correct: bool,
+                    answer_en: Optional[str] = None) -> Optional[Dict]:
+    """Учет ответа в очереди повторения
+
+    При отложенной записи попытка и новое состояние слова ставятся в очередь
+    и возвращается None, иначе - параметры для запроса с _ATTEMPT_CTE.
+    """
+    key, state = _get_review_queue(user_id).review(word_en, was_correct)
+    answer_key = None if was_correct else _wrong_answer_key(user_id, answer_en)
+    if ATTEMPTS_WRITE_BEHIND:
+        with _pending_reviews_lock:
+            _pending_reviews[(user_id, key)] = state
+        attempt = Attempt(user_id, word_en, was_correct, datetime.now(timezone.utc), answer_key)
+        # Попытка в очереди и в кэше статистики появляется одновременно (см. get_user_statistics)
+        with _statistics_lock:
+            full = _get_recorder().add(attempt)
+            cached = _statistics.get(user_id)
+            if cached is not None:
+                cached.apply(was_correct, attempt.attempted_at)
+            _statistics_changed(user_id)
+            _leaderboard_event(user_id, was_correct)
+        if full:
+            flush_attempts()
+        return None
+    return {
+        'user_id': user_id,
+        'word_en': word_en,
+        'key': key,
+        'correct': was_correct,
+        'answer_en': answer_key,
+        'review': _review_row(user_id, key, state),
+    }
+
+
+@_timed
+def record_attempt(user_id: int, word_en: str, was_correct: bool, answer_en: Optional[str] = None) -> None:
+    """Запись попытки ответа в базу данных (answer_en - что ответил пользователь)"""
+    params = _review_attempt(user_id, word_en, was_correct, answer_en)
+    if params is None:
+        return
+    with _leaderboard_gate.shared():
+        with _connect() as conn, conn.cursor() as cur:
+            cur.execute(_ATTEMPT_SQL, params)
+        _after_sync_attempt(user_id, was_correct)
+
+
+@_timed
+def answer_and_next(user_id: int, word_en: str, was_correct: bool) -> Optional[Tuple[str, str, List[str]]]:
+    """Запись ответа и выбор следующего вопроса не более чем за одно обращение к БД
+
+    Следующий вопрос берется из пула слов и очереди повторения в памяти. Если
+    пул пользователя еще не загружен, его слова читаются тем же запросом, что
+    записывает попытку. При отложенной записи попыток обращения к БД нет совсем
+    (если пул и очередь в кэше).
+    """
+    snapshot = get_dictionary()
+    pool = _training_pools.get(user_id)
+    params = _review_attempt(user_id, word_en, was_correct)
+    if params is None:
+        pool = pool or _get_training_pool(user_id)
+    else:
+        with _leaderboard_gate.shared():
+            if pool is None:
+                with _connect() as conn, conn.cursor() as cur:
+                    cur.execute(_ATTEMPT_WITH_WORDS_SQL, params)
+                    rows = cur.fetchall()
+                pool = TrainingPool(snapshot, [(r['word_en'], r['word_ru']) for r in rows])
+                _training_pools.put(user_id, pool)
+            else:
+                with _connect() as conn, conn.cursor() as cur:
+                    cur.execute(_ATTEMPT_SQL, params)
+            _after_sync_attempt(user_id, was_correct)
+    if pool.shared is not snapshot:
+        pool.rebase(snapshot)
+    return _pick_question(pool, _get_review_queue(user_id))
+
+
+# Функции для работы со статистикой
+
+# Статистика пользователей в памяти (UserStatistics). Изменение кэша вместе с
+# постановкой попытки в очередь и установка прочитанной из БД строки - под
+# _statistics_lock; сами запросы к БД выполняются без нее. Попытки меняют запись
+# на месте, поэтому TTL отсчитывается от чтения из БД: попытки других экземпляров
+# бота попадают в кэш не позже чем через STATISTICS_CACHE_TTL секунд
+_statistics = LRUCache(STATISTICS_CACHE_SIZE, ttl=STATISTICS_CACHE_TTL)
+_statistics_lock = threading.Lock()
+# Пользователи, чья строка статистики сейчас читается из БД: id -> [число читающих,
+# число попыток и сбросов за время чтения]
+_statistics_loading: Dict[int, List[int]] = {}
+
+
+def _statistics_changed(user_id: int) -> None:
+    """Учет попытки или сброса для идущих чтений статистики (под _statistics_lock)"""
+    loading = _statistics_loading.get(user_id)
+    if loading is not None:
+        loading[1] += 1
+
+
+def _begin_statistics_load(user_id: int) -> Tuple[List[int], int, int]:
+    """Регистрация чтения статистики из БД (под _statistics_lock)
+
+    Возвращает счетчики чтения, число изменений на момент начала и число
+    попыток, поставленных в очередь до начала.
+    """
+    loading = _statistics_loading.setdefault(user_id, [0, 0])
+    loading[0] += 1
+    queued = _recorder.progress()[0] if _recorder is not None else 0
+    return loading, loading[1], queued
+
+
+def _end_statistics_load(user_id: int, loading: List[int], changes: int) -> bool:
+    """Конец чтения (под _statistics_lock); True, если статистика за это время не менялась"""
+    loading[0] -= 1
+    if not loading[0]:
+        del _statistics_loading[user_id]
+    return loading[1] == changes
+
+
+def _flush_through(queued: int) -> bool:
+    """Запись отложенных попыток; True, если записаны все попытки до queued-й включительно"""
+    flush_attempts()
+    return _recorder is None or _recorder.progress()[1] >= queued
+
+
+def _after_sync_attempt(user_id: int, was_correct: bool) -> None:
+    """Сброс записи кэша и учет в рейтинге после синхронной записи попытки (без ATTEMPTS_WRITE_BEHIND)"""
+    with _statistics_lock:
+        _statistics.pop(user_id)
+        _statistics_changed(user_id)
+        _leaderboard_event(user_id, was_correct)
+
+
+_USER_STATISTICS_SQL = """
+    SELECT total_attempts, correct_attempts, incorrect_attempts,
+           current_streak, best_streak, last_activity
+    FROM user_statistics
+    WHERE user_id = %(user_id)s
+"""
+
+
+@_timed
+def get_user_statistics(user_id: int) -> Optional[Dict]:
+    """Получение статистики пользователя
+
+    Из кэша - без обращения к БД. При промахе строка читается из БД после
+    записи отложенных попыток; ответы в это время ставятся в очередь как
+    обычно, а строка попадает в кэш, только если у пользователя не было
+    новых попыток и все прежние записаны.
+    """
+    with _statistics_lock:
+        cached = _statistics.get(user_id)
+        if cached is not None:
+            return cached.as_dict()
+        loading, changes, queued = _begin_statistics_load(user_id)
+    stats = None
+    complete = False
+    try:
+        # Статистика должна учитывать попытки, еще не записанные в БД
+        complete = _flush_through(queued)
+        with _connect() as conn, conn.cursor() as cur:
+            cur.execute(_USER_STATISTICS_SQL, {'user_id': user_id})
+            row = cur.fetchone()
+        if row:
+            stats = UserStatistics.from_row(row)
+    finally:
+        with _statistics_lock:
+            unchanged = _end_statistics_load(user_id, loading, changes)
+            # Если запись попыток не удалась, строка в БД отстает: ее не кэшируем
+            if stats is not None and complete and unchanged:
+                _statistics.put(user_id, stats)
+    return stats.as_dict() if stats is not None else None
+
+
+@_timed
+def reset_user_statistics(user_id: int) -> None:
+    """Сброс статистики пользователя
+
+    Попытки, поставленные в очередь во время сброса, могут быть записаны и до
+    UPDATE, и после: тогда запись кэша удаляется, а рейтинг выравнивается
+    при следующем перестроении.
+    """
+    with _statistics_lock:
+        loading, changes, queued = _begin_statistics_load(user_id)
+    reset_at = None
+    complete = False
+    try:
+        # Иначе отложенные попытки попадут в статистику уже после сброса
+        complete = _flush_through(queued)
+        with _connect() as conn, conn.cursor() as cur:
             cur.execute(
                 """
-                UPDATE user_statistics 
-                SET total_attempts = total_attempts + 1,
-                    correct_attempts = correct_attempts + 1,
-                    current_streak = current_streak + 1,
-                    best_streak = CASE 
-                        WHEN current_streak + 1 > best_streak THEN current_streak + 1 
-                        ELSE best_streak 
-                    END,
-                    last_activity = NOW()
+                UPDATE user_statistics
+                SET total_attempts = 0, correct_attempts = 0, incorrect_attempts = 0,
+                    current_streak = 0, best_streak = 0, last_activity = NOW()
                 WHERE user_id = %s
+                RETURNING last_activity
                 """,
                 (user_id,),
             )
-        else:
-            cur.execute(
-                """
-                UPDATE user_statistics 
-                SET total_attempts = total_attempts + 1,
-                    incorrect_attempts = incorrect_attempts + 1,
-                    current_streak = 0,
-                    last_activity = NOW()
-                WHERE user_id = %s
-                """,
-                (user_id,),
+            row = cur.fetchone()
+        reset_at = row['last_activity'] if row else None
+    finally:
+        with _statistics_lock:
+            unchanged = _end_statistics_load(user_id, loading, changes)
+            if reset_at is not None and complete and unchanged:
+                _statistics.put(user_id, UserStatistics(0, 0, 0, 0, 0, reset_at))
+            else:
+                _statistics.pop(user_id)
+            if reset_at is not None:
+                _statistics_changed(user_id)
+                _leaderboard_event(user_id, None)
+
+
+def get_statistics_cache_stats() -> Dict:
+    """Статистика кэша статистики пользователей"""
+    return _statistics.stats()
+
+
+# Значения для метрик читаются при выгрузке /metrics
+DB_POOL_CONNECTIONS.set_function(lambda: get_pool_stats().get('in_use', 0), 'in_use')
+DB_POOL_CONNECTIONS.set_function(lambda: get_pool_stats().get('idle', 0), 'idle')
+DB_POOL_CHECKOUTS.set_function(lambda: get_pool_stats().get('checkouts', 0))
+DB_POOL_WAITS.set_function(lambda: get_pool_stats().get('waits', 0))
+DB_POOL_WAIT_SECONDS.set_function(lambda: get_pool_stats().get('wait_time_total', 0.0))
+DB_POOL_WAIT_MAX.set_function(lambda: get_pool_stats().get('wait_time_max', 0.0))
+USER_PROFILE_UPDATES.set_function(lambda: _identity_profile_updates)
+QUEUE_DEPTH.set_function(lambda: get_attempt_recorder_stats().get('queue_depth', 0), 'attempts')
+ATTEMPT_BATCHES.set_function(lambda: get_attempt_recorder_stats().get('batches', 0))
+ATTEMPTS_WRITTEN.set_function(lambda: get_attempt_recorder_stats().get('flushed', 0))
+ATTEMPT_WRITE_FAILURES.set_function(lambda: get_attempt_recorder_stats().get('failures', 0))
+
+
+def _export_cache_metrics(name: str, cache: LRUCache) -> None:
+    CACHE_LOOKUPS.set_function(lambda: cache.stats()['hits'], name, 'hit')
+    CACHE_LOOKUPS.set_function(lambda: cache.stats()['misses'], name, 'miss')
+    CACHE_ENTRIES.set_function(lambda: cache.stats()['size'], name)
+
+
+_export_cache_metrics('users', _identities)
+
+
+# Рейтинг (bot/leaderboard.py): загружается из user_statistics и дальше
+# обновляется каждой попыткой под _statistics_lock, как и кэш статистики
+_leaderboard: Optional[Leaderboard] = None
+_leaderboard_loaded_at = 0.0
+_leaderboard_rebuild_lock = threading.Lock()
+# Синхронная запись попытки и ее событие против снимка рейтинга; порядок
+# блокировок: _leaderboard_gate, соединение из пула, _statistics_lock
+_leaderboard_gate = SnapshotGate()
+# Попытки (True/False) и сбросы (None) за время перестроения рейтинга
+_leaderboard_log: Optional[List[Tuple[int, Optional[bool]]]] = None
+# Сколько раз записать очередь попыток и попробовать взять снимок, и через
+# сколько секунд повторить перестроение, если очередь так и не опустела
+LEADERBOARD_SNAPSHOT_TRIES = 3
+LEADERBOARD_RETRY_DELAY = 30.0
+
+_LEADERBOARD_SQL = """
+    SELECT user_id, correct_attempts, best_streak, current_streak
+    FROM user_statistics
+    WHERE total_attempts > 0
+"""
+
+
+def _apply_leaderboard_event(board: Leaderboard, user_id: int, was_correct: Optional[bool]) -> None:
+    if was_correct is None:
+        board.reset(user_id)
+    else:
+        board.record(user_id, was_correct)
+
+
+def _leaderboard_event(user_id: int, was_correct: Optional[bool]) -> None:
+    """Учет попытки или сброса статистики в рейтинге (под _statistics_lock)"""
+    if _leaderboard_log is not None:
+        _leaderboard_log.append((user_id, was_correct))
+    if _leaderboard is not None:
+        _apply_leaderboard_event(_leaderboard, user_id, was_correct)
+
+
+def _attempts_unwritten() -> int:
+    """Попытки в очереди и в записываемой сейчас пачке"""
+    if _recorder is None:
+        return 0
+    enqueued, written = _recorder.progress()
+    return enqueued - written
+
+
+def _load_leaderboard_snapshot(board: Leaderboard) -> bool:
+    """Загрузка рейтинга из снимка БД; False, если в момент снимка не все попытки записаны
+
+    Очередь записывается до того, как взято соединение для снимка: под
+    _statistics_lock соединения из пула не запрашиваются. Снимок
+    (REPEATABLE READ) берется под _statistics_lock, только если все
+    попытки уже в БД, иначе их события из старого рейтинга потерялись бы,
+    и монопольно по _leaderboard_gate, чтобы синхронная попытка не попала
+    и в снимок, и в журнал. Попытки после снимка копятся в журнале.
+    """
+    global _leaderboard_log
+    flush_attempts()
+    with ExitStack() as gate:
+        gate.enter_context(_leaderboard_gate.exclusive())
+        with _connect() as conn, conn.cursor() as cur:
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            with _statistics_lock:
+                if _attempts_unwritten():
+                    return False
+                cur.execute("SELECT 1")
+                _leaderboard_log = []
+            # Снимок взят: дальше синхронные попытки попадают в журнал
+            gate.close()
+            cur.execute(_LEADERBOARD_SQL)
+            board.load(
+                (row['user_id'], row['correct_attempts'], row['best_streak'], row['current_streak'])
+                for row in cur.fetchall()
             )
+    return True
 
 
-# Функции для работы со статистикой
+def _rebuild_leaderboard() -> bool:
+    """Загрузка рейтинга из БД без остановки записи попыток
 
-def get_user_statistics(user_id: int) -> Optional[Dict]:
-    """Получение статистики пользователя"""
+    После загрузки снимка к новому рейтингу применяются попытки из журнала.
+    Если очередь попыток не опустела за LEADERBOARD_SNAPSHOT_TRIES попыток,
+    перестроение откладывается на LEADERBOARD_RETRY_DELAY секунд (прежний
+    рейтинг продолжает обновляться) и возвращается False.
+    """
+    global _leaderboard, _leaderboard_log, _leaderboard_loaded_at
+    started = time.perf_counter()
+    for _ in range(LEADERBOARD_SNAPSHOT_TRIES):
+        board = Leaderboard()
+        try:
+            loaded = _load_leaderboard_snapshot(board)
+        except Exception:
+            with _statistics_lock:
+                _leaderboard_log = None
+            raise
+        if loaded:
+            break
+    else:
+        logger.warning('Рейтинг не перестроен: очередь попыток не опустела, повтор через %g с',
+                       LEADERBOARD_RETRY_DELAY)
+        _leaderboard_loaded_at = time.monotonic() - LEADERBOARD_REFRESH + LEADERBOARD_RETRY_DELAY
+        return False
+    with _statistics_lock:
+        for user_id, was_correct in _leaderboard_log:
+            _apply_leaderboard_event(board, user_id, was_correct)
+        _leaderboard_log = None
+        _leaderboard = board
+    _leaderboard_loaded_at = time.monotonic()
+    logger.info('Рейтинг загружен: %s пользователей за %.0f мс',
+                len(board), (time.perf_counter() - started) * 1000)
+    return True
+
+
+def _get_leaderboard() -> Leaderboard:
+    """Рейтинг из памяти; перестраивается раз в LEADERBOARD_REFRESH секунд (0 - только при запуске)"""
+    board = _leaderboard
+    if board is not None and (LEADERBOARD_REFRESH <= 0
+                              or time.monotonic() - _leaderboard_loaded_at < LEADERBOARD_REFRESH):
+        return board
+    # Пока один поток перестраивает рейтинг, остальные читают прежний
+    if not _leaderboard_rebuild_lock.acquire(blocking=board is None):
+        return board
+    try:
+        if _leaderboard is board and not _rebuild_leaderboard() and board is None:
+            raise RuntimeError('Рейтинг не загружен: очередь попыток не успевает записываться')
+        return _leaderboard
+    finally:
+        _leaderboard_rebuild_lock.release()
+
+
+_USER_NAMES_SQL = "SELECT id, username, first_name FROM users WHERE id = ANY(%(ids)s)"
+
+
+def _user_names(user_ids: Iterable[int]) -> Dict[int, str]:
+    """Имена для показа в рейтинге: имя, иначе username"""
+    ids = list(user_ids)
+    if not ids:
+        return {}
     with _connect() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT total_attempts, correct_attempts, incorrect_attempts, 
-                   current_streak, best_streak, last_activity
-            FROM user_statistics
-            WHERE user_id = %s
-            """,
-            (user_id,),
-        )
-        row = cur.fetchone()
-        if row:
-            return {
-                'total_attempts': row['total_attempts'],
-                'correct_attempts': row['correct_attempts'],
-                'incorrect_attempts': row['incorrect_attempts'],
-                'current_streak': row['current_streak'],
-                'best_streak': row['best_streak'],
-                'last_activity': row['last_activity'],
-                'success_rate': round((row['correct_attempts'] / row['total_attempts'] * 100) if row['total_attempts'] > 0 else 0, 1)
-            }
+        cur.execute(_USER_NAMES_SQL, {'ids': ids})
+        return {row['id']: row['first_name'] or row['username'] or f"#{row['id']}" for row in cur.fetchall()}
+
+
+@_timed
+def get_leaderboard(metric: str, user_id: int, limit: int) -> Dict:
+    """Лучшие limit пользователей по показателю ('correct' или 'streak') и место user_id
+
+    Места и очки считаются в памяти за O(log n); из БД читаются только
+    имена показанных пользователей.
+    """
+    board = _get_leaderboard()
+    top = board.top(metric, limit)
+    names = _user_names(top_user_id for _, top_user_id, _ in top)
+    rank, score, ranked = board.rank(metric, user_id)
+    return {
+        'top': [
+            {'rank': place, 'user_id': top_user_id, 'name': names.get(top_user_id, f'#{top_user_id}'), 'score': points}
+            for place, top_user_id, points in top
+        ],
+        'rank': rank,
+        'score': score,
+        'ranked': ranked,
+    }
+
+
+_ADD_FRIEND_SQL = """
+    WITH friend AS (
+        SELECT id, username, first_name
+        FROM users
+        WHERE LOWER(username) = LOWER(%(username)s) AND id <> %(user_id)s
+        LIMIT 1
+    ),
+    added AS (
+        INSERT INTO user_friends (user_id, friend_id)
+        SELECT %(user_id)s, id FROM friend
+        ON CONFLICT DO NOTHING
+    )
+    SELECT username, first_name FROM friend
+"""
+
+
+@_timed
+def add_friend(user_id: int, username: str) -> Optional[str]:
+    """Добавление друга по username в Telegram; имя друга или None, если не найден"""
+    username = username.strip().lstrip('@')
+    if not username:
         return None
+    with _connect() as conn, conn.cursor() as cur:
+        cur.execute(_ADD_FRIEND_SQL, {'user_id': user_id, 'username': username})
+        row = cur.fetchone()
+    return (row['first_name'] or row['username']) if row else None
 
 
-def reset_user_statistics(user_id: int) -> None:
-    """Сброс статистики пользователя"""
+# Сам пользователь и его друзья
+_FRIENDS_SQL = """
+    SELECT id, username, first_name FROM users WHERE id = %(user_id)s
+    UNION ALL
+    SELECT u.id, u.username, u.first_name
+    FROM user_friends AS f
+    JOIN users AS u ON u.id = f.friend_id
+    WHERE f.user_id = %(user_id)s
+"""
+
+
+@_timed
+def get_friends_leaderboard(user_id: int, metric: str) -> List[Dict]:
+    """Пользователь и его друзья по убыванию очков с местами среди них и в общем рейтинге"""
+    with _connect() as conn, conn.cursor() as cur:
+        cur.execute(_FRIENDS_SQL, {'user_id': user_id})
+        rows = cur.fetchall()
+    board = _get_leaderboard()
+    entries = []
+    for row in rows:
+        rank, score, _ = board.rank(metric, row['id'])
+        entries.append({
+            'user_id': row['id'],
+            'name': row['first_name'] or row['username'] or f"#{row['id']}",
+            'score': score,
+            'global_rank': rank,
+            'is_self': row['id'] == user_id,
+        })
+    entries.sort(key=lambda e: (-e['score'], e['name']))
+    for i, entry in enumerate(entries):
+        # При равных очках место общее
+        same = i > 0 and entries[i - 1]['score'] == entry['score']
+        entry['rank'] = entries[i - 1]['rank'] if same else i + 1
+    return entries
+
+
+# Функции для работы с сессиями (состояние диалога)
+
+_LOAD_SESSION_SQL = """
+    SELECT mode, pending_en
+    FROM user_sessions
+    WHERE chat_id = %(chat_id)s AND updated_at > NOW() - make_interval(secs => %(ttl)s)
+"""
+_DELETE_SESSION_SQL = "DELETE FROM user_sessions WHERE chat_id = %(chat_id)s"
+_PURGE_SESSIONS_SQL = "DELETE FROM user_sessions WHERE updated_at < NOW() - make_interval(secs => %(ttl)s)"
+
+@_timed
+def load_session(chat_id: int, ttl: float) -> Optional[Tuple[int, Optional[str]]]:
+    """Получение сессии по первичному ключу, если она не устарела"""
+    with _connect() as conn, conn.cursor() as cur:
+        cur.execute(_LOAD_SESSION_SQL, {'chat_id': chat_id, 'ttl': ttl})
+        row = cur.fetchone()
+        return (row['mode'], row['pending_en']) if row else None
+
+
+@_timed
+def save_session(chat_id: int, mode: int, pending_en: Optional[str]) -> None:
+    """Сохранение сессии"""
     with _connect() as conn, conn.cursor() as cur:
         cur.execute(
             """
-            UPDATE user_statistics 
-            SET total_attempts = 0, correct_attempts = 0, incorrect_attempts = 0,
-                current_streak = 0, best_streak = 0, last_activity = NOW()
-            WHERE user_id = %s
+            INSERT INTO user_sessions (chat_id, mode, pending_en, updated_at)
+            VALUES (%s, %s, %s, NOW())
+            ON CONFLICT (chat_id)
+            DO UPDATE SET mode = EXCLUDED.mode, pending_en = EXCLUDED.pending_en, updated_at = EXCLUDED.updated_at
             """,
-            (user_id,),
-        ) 
\ No newline at end of file
+            (chat_id, mode, pending_en),
+        )
+
+
+@_timed
+def delete_session(chat_id: int) -> None:
+    """Удаление сессии (состояние по умолчанию не хранится)"""
+    with _connect() as conn, conn.cursor() as cur:
+        cur.execute(_DELETE_SESSION_SQL, {'chat_id': chat_id})
+
+
+@_timed
+def purge_sessions(ttl: float) -> int:
+    """Удаление устаревших сессий"""
+    with _connect() as conn, conn.cursor() as cur:
+        cur.execute(_PURGE_SESSIONS_SQL, {'ttl': ttl})
+        return cur.rowcount
@@ -0,0 +1,41 @@
+import time
+from typing import Dict, Iterable, List, Tuple
+
+# Сглаживание доли ошибок: к статистике слова добавляются PRIOR_ATTEMPTS
+# попыток с PRIOR_ERRORS ошибками, чтобы редкие слова не выглядели крайними
+PRIOR_ATTEMPTS = 10
+PRIOR_ERRORS = 2
+PRIOR_RATE = PRIOR_ERRORS / PRIOR_ATTEMPTS
+# Сколько частых путаниц хранить на слово: для вопроса берется
+# srs.CONFUSABLE_DISTRACTORS, остальные - запас, если путаницы нет в пуле пользователя
+CONFUSIONS_PER_WORD = 3
+
+
+class WordDifficulty:
+    """Снимок сложности слов общего словаря и частых путаниц
+
+    Загружается из word_stats и word_confusions целиком и заменяется новым
+    снимком по времени, поэтому выбор вопроса не обращается к БД.
+    """
+    __slots__ = ('error_rates', 'confusions', 'loaded_at')
+
+    def __init__(self, stats: Iterable[Tuple[str, int, int]] = (),
+                 confusions: Iterable[Tuple[str, str]] = ()):
+        self.error_rates: Dict[str, float] = {
+            word: (errors + PRIOR_ERRORS) / (attempts + PRIOR_ATTEMPTS)
+            for word, attempts, errors in stats
+        }
+        grouped: Dict[str, List[str]] = {}
+        for word, answer in confusions:
+            grouped.setdefault(word, []).append(answer)
+        # Ответы, которые чаще всего выбирают вместо слова, по убыванию частоты
+        self.confusions: Dict[str, Tuple[str, ...]] = {word: tuple(a) for word, a in grouped.items()}
+        self.loaded_at = time.monotonic()
+
+    def error_rate(self, word_en: str) -> float:
+        """Сглаженная доля ошибок по слову"""
+        return self.error_rates.get(word_en.lower(), PRIOR_RATE)
+
+    def confusable(self, word_en: str) -> Tuple[str, ...]:
+        """Слова, с которыми чаще всего путают word_en"""
+        return self.confusions.get(word_en.lower(), ())
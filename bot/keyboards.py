@@ -1,58 +1,111 @@
-from typing import List
+import json
+from typing import Dict, List, Sequence
 from telebot import types
 
 
-def main_menu() -> types.ReplyKeyboardMarkup:
-    """Создание главного меню бота"""
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    kb.row(types.KeyboardButton('Начать тренировку'))
-    kb.row(types.KeyboardButton('Добавить слово ➕'), types.KeyboardButton('Удалить слово 🔙'))
-    kb.row(types.KeyboardButton('📊 Статистика'), types.KeyboardButton('🏠 Главное меню'))
-    return kb
+class PrebuiltKeyboard(types.JsonSerializable):
+    """Клавиатура с заранее сериализованным JSON
 
+    telebot вызывает to_json() у reply_markup при каждой отправке; здесь
+    он возвращает готовую строку, без сборки словаря и json.dumps.
+    """
 
-def game_menu() -> types.ReplyKeyboardMarkup:
-    """Создание меню во время игры"""
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    kb.row(types.KeyboardButton('⏹ Остановить игру'), types.KeyboardButton('📊 Показать статистику'))
-    kb.row(types.KeyboardButton('🏠 Главное меню'))
-    return kb
+    def __init__(self, markup_json: str):
+        self._json = markup_json
+
+    def to_json(self) -> str:
+        return self._json
 
+    def to_dict(self) -> Dict:
+        return json.loads(self._json)
 
-def options_keyboard(options: List[str]) -> types.ReplyKeyboardMarkup:
-    """Создание клавиатуры с вариантами ответов и кнопками управления игрой"""
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=False)
-    
-    # Располагаем варианты в сетке 2x2 когда возможно
-    rows = [options[i:i+2] for i in range(0, len(options), 2)]
+
+def _build(rows: Sequence[Sequence[str]], **options) -> types.ReplyKeyboardMarkup:
+    kb = types.ReplyKeyboardMarkup(**options)
     for row in rows:
-        kb.row(*[types.KeyboardButton(text=o) for o in row])
-    
-    # Добавляем кнопки управления игрой под вариантами ответов
-    kb.row(types.KeyboardButton('⏹ Остановить игру'), types.KeyboardButton('📊 Статистика'))
-    kb.row(types.KeyboardButton('🏠 Главное меню'))
-    
+        kb.row(*[types.KeyboardButton(text) for text in row])
     return kb
 
 
-def cancel_keyboard() -> types.ReplyKeyboardMarkup:
-    """Создание клавиатуры с кнопкой отмены"""
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-    kb.row(types.KeyboardButton('Отмена'))
-    return kb
+def _prebuilt(rows: Sequence[Sequence[str]], **options) -> PrebuiltKeyboard:
+    return PrebuiltKeyboard(_build(rows, **options).to_json())
 
 
-def statistics_menu() -> types.ReplyKeyboardMarkup:
-    """Создание меню статистики"""
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    kb.row(types.KeyboardButton('🔄 Сбросить статистику'), types.KeyboardButton('📈 Детальная статистика'))
-    kb.row(types.KeyboardButton('🏠 Главное меню'))
-    return kb
+# Кнопки управления игрой под вариантами ответов
+_GAME_CONTROL_ROWS = (('⏹ Остановить игру', '📊 Статистика'), ('🏠 Главное меню',))
+
+_MAIN_MENU = _prebuilt(
+    (('Начать тренировку',), ('Добавить слово ➕', 'Удалить слово 🔙'), ('📊 Статистика', '🏠 Главное меню')),
+    resize_keyboard=True,
+)
+_GAME_MENU = _prebuilt(
+    (('⏹ Остановить игру', '📊 Показать статистику'), ('🏠 Главное меню',)),
+    resize_keyboard=True,
+)
+_CANCEL_KEYBOARD = _prebuilt((('Отмена',),), resize_keyboard=True, one_time_keyboard=True)
+_STATISTICS_MENU = _prebuilt(
+    (('🔄 Сбросить статистику', '📈 Детальная статистика'), ('🏠 Главное меню',)),
+    resize_keyboard=True,
+)
+_STATISTICS_DURING_GAME_MENU = _prebuilt(
+    (('🔄 Сбросить статистику', '📈 Детальная статистика'), ('▶️ Продолжить игру', '🏠 Главное меню')),
+    resize_keyboard=True,
+)
+
+
+class _OptionsTemplate:
+    """JSON клавиатуры с вариантами ответов, разрезанный по местам для подписей"""
+
+    def __init__(self, count: int):
+        placeholders = [f'\x00option{i}\x00' for i in range(count)]
+        rows = [placeholders[i:i + 2] for i in range(0, count, 2)]
+        markup_json = _build(rows + list(_GAME_CONTROL_ROWS), resize_keyboard=True, one_time_keyboard=False).to_json()
+        self._parts: List[str] = []
+        for placeholder in placeholders:
+            head, markup_json = markup_json.split(json.dumps(placeholder), 1)
+            self._parts.append(head)
+        self._parts.append(markup_json)
+
+    def render(self, labels: Sequence[str]) -> str:
+        pieces = [self._parts[0]]
+        for label, part in zip(labels, self._parts[1:]):
+            pieces.append(json.dumps(label))
+            pieces.append(part)
+        return ''.join(pieces)
+
+
+# Шаблоны по числу вариантов (в тренировке их всегда 4)
+_options_templates: Dict[int, _OptionsTemplate] = {4: _OptionsTemplate(4)}
+
+
+def main_menu() -> PrebuiltKeyboard:
+    """Главное меню бота"""
+    return _MAIN_MENU
+
+
+def game_menu() -> PrebuiltKeyboard:
+    """Меню во время игры"""
+    return _GAME_MENU
+
+
+def options_keyboard(options: List[str]) -> PrebuiltKeyboard:
+    """Клавиатура с вариантами ответов (сетка 2x2) и кнопками управления игрой"""
+    template = _options_templates.get(len(options))
+    if template is None:
+        template = _options_templates.setdefault(len(options), _OptionsTemplate(len(options)))
+    return PrebuiltKeyboard(template.render(options))
+
+
+def cancel_keyboard() -> PrebuiltKeyboard:
+    """Клавиатура с кнопкой отмены"""
+    return _CANCEL_KEYBOARD
+
+
+def statistics_menu() -> PrebuiltKeyboard:
+    """Меню статистики"""
+    return _STATISTICS_MENU
 
 
-def statistics_during_game_menu() -> types.ReplyKeyboardMarkup:
-    """Создание меню статистики во время игры с кнопкой продолжить"""
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    kb.row(types.KeyboardButton('🔄 Сбросить статистику'), types.KeyboardButton('📈 Детальная статистика'))
-    kb.row(types.KeyboardButton('▶️ Продолжить игру'), types.KeyboardButton('🏠 Главное меню'))
-    return kb 
\ No newline at end of file
+def statistics_during_game_menu() -> PrebuiltKeyboard:
+    """Меню статистики во время игры с кнопкой продолжить"""
+    return _STATISTICS_DURING_GAME_MENU
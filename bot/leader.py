@@ -0,0 +1,157 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+
+def election_key(token: str) -> int:
+    """Ключ advisory-блокировки (bigint) по токену: у разных ботов в одной БД разные ключи"""
+    return int.from_bytes(hashlib.sha256(token.encode('utf-8')).digest()[:8], 'big', signed=True)
+
+
+class LeaderElection:
+    """Выбор лидера через pg_try_advisory_lock на отдельном соединении
+
+    Блокировка уровня сессии держится, пока живо соединение: при остановке
+    или падении лидера PostgreSQL освобождает ее сам, и резервный экземпляр
+    захватывает ее при следующей попытке (раз в retry_interval секунд).
+    Лидер проверяет соединение раз в heartbeat_interval секунд; если оно
+    потеряно, вызывается on_lost и экземпляр становится резервным.
+    """
+
+    def __init__(self, connect: Callable[[], 'psycopg2.extensions.connection'], key: int,
+                 retry_interval: float = 2.0, heartbeat_interval: float = 2.0):
+        self._connect = connect
+        self.key = key
+        self.retry_interval = retry_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._conn = None
+        self._leader = threading.Event()
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+        self.on_lost: Optional[Callable[[], None]] = None
+        self.terms = 0  # сколько раз экземпляр становился лидером
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader.is_set()
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except psycopg2.Error:
+                pass
+            self._conn = None
+
+    def try_acquire(self) -> bool:
+        """Одна попытка стать лидером"""
+        try:
+            if self._conn is None or self._conn.closed:
+                self._conn = self._connect()
+                self._conn.set_session(autocommit=True)
+            with self._conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(%s) AS locked", (self.key,))
+                locked = cur.fetchone()['locked']
+        except psycopg2.Error as exc:
+            logger.warning('Выбор лидера: ошибка БД: %s', exc)
+            self._close()
+            return False
+        if locked:
+            self.terms += 1
+            self._leader.set()
+            self._heartbeat = threading.Thread(target=self._watch, name='leader-heartbeat', daemon=True)
+            self._heartbeat.start()
+        return locked
+
+    def acquire(self) -> bool:
+        """Ожидание лидерства; False, если вызван stop()"""
+        waiting_logged = False
+        while not self._stop.is_set():
+            if self.try_acquire():
+                logger.info('👑 Экземпляр стал лидером (ключ %s)', self.key)
+                return True
+            if not waiting_logged:
+                logger.info('⏸ Лидер уже есть, экземпляр в резерве (попытка раз в %g с)', self.retry_interval)
+                waiting_logged = True
+            self._stop.wait(self.retry_interval)
+        return False
+
+    def _watch(self) -> None:
+        """Проверка соединения лидера; потеря соединения - потеря блокировки"""
+        while self._leader.is_set() and not self._stop.wait(self.heartbeat_interval):
+            try:
+                with self._conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+            except (psycopg2.Error, AttributeError) as exc:
+                if not self._leader.is_set():
+                    return
+                logger.error('Лидерство потеряно: соединение с БД разорвано (%s)', exc)
+                self._leader.clear()
+                self._close()
+                if self.on_lost is not None:
+                    self.on_lost()
+                return
+
+    def release(self) -> None:
+        """Отказ от лидерства и закрытие соединения"""
+        was_leader = self._leader.is_set()
+        self._leader.clear()
+        if was_leader and self._conn is not None and not self._conn.closed:
+            try:
+                with self._conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (self.key,))
+            except psycopg2.Error:
+                pass
+        self._close()
+
+    def stop(self) -> None:
+        """Прекращение ожидания и проверок (из любого потока)"""
+        self._stop.set()
+
+
+def _stop_until(done: threading.Event, stop: Callable[[], None], interval: float) -> None:
+    """stop, пока serve не завершится
+
+    Остановку, пришедшую до начала получения обновлений, polling сбрасывает
+    при запуске, поэтому одного вызова stop недостаточно.
+    """
+    while not done.is_set():
+        stop()
+        done.wait(interval)
+
+
+def run_as_leader(election: LeaderElection, serve: Callable[[], None], stop: Callable[[], None],
+                  takeover_delay: float = 0.0, stop_interval: float = 0.5) -> None:
+    """Запуск serve только на лидере; при потере лидерства - stop и снова ожидание
+
+    serve блокирует до остановки (получение обновлений), stop прерывает его
+    из другого потока. После захвата блокировки serve запускается через
+    takeover_delay секунд: прежний лидер, потерявший блокировку, еще может
+    ждать ответа на getUpdates, и запрос нового лидера получил бы 409.
+    """
+    try:
+        while election.acquire():
+            served = threading.Event()
+            election.on_lost = lambda done=served: _stop_until(done, stop, stop_interval)
+            try:
+                if takeover_delay:
+                    logger.info('Получение обновлений начнется через %g с (ожидание запроса прежнего лидера)',
+                                takeover_delay)
+                    time.sleep(takeover_delay)
+                if election.is_leader:
+                    serve()
+            finally:
+                served.set()
+            if election.is_leader:
+                # serve завершился сам (остановка бота), а не из-за потери лидерства
+                break
+            logger.warning('Получение обновлений остановлено, экземпляр возвращается в резерв')
+    finally:
+        election.stop()
+        election.release()
@@ -0,0 +1,219 @@
+import heapq
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Показатели рейтинга: название -> колонка user_statistics
+METRICS = {
+    'correct': 'correct_attempts',
+    'streak': 'best_streak',
+}
+
+
+class FenwickTree:
+    """Дерево Фенвика по значениям 1..size: число пользователей с каждым значением
+
+    Добавление, префиксная сумма и поиск k-го значения - за O(log size).
+    При значении больше size дерево увеличивается вдвое.
+    """
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self._tree = [0] * (size + 1)
+        self.total = 0
+
+    def _grow(self, value: int) -> None:
+        counts = [self.prefix(i) - self.prefix(i - 1) for i in range(1, self.size + 1)]
+        size = self.size
+        while size < value:
+            size *= 2
+        self.size = size
+        self._tree = [0] * (size + 1)
+        self.total = 0
+        for i, count in enumerate(counts, 1):
+            if count:
+                self.add(i, count)
+
+    def add(self, value: int, delta: int) -> None:
+        if value > self.size:
+            self._grow(value)
+        self.total += delta
+        while value <= self.size:
+            self._tree[value] += delta
+            value += value & -value
+
+    def prefix(self, value: int) -> int:
+        """Число пользователей со значением <= value"""
+        value = min(value, self.size)
+        result = 0
+        while value > 0:
+            result += self._tree[value]
+            value -= value & -value
+        return result
+
+    def find(self, k: int) -> int:
+        """Наименьшее значение, для которого prefix(value) >= k (1 <= k <= total)"""
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            following = position + step
+            if following <= self.size and self._tree[following] < k:
+                position = following
+                k -= self._tree[following]
+            step >>= 1
+        return position + 1
+
+
+class ScoreIndex:
+    """Очки пользователей по одному показателю: место за O(log n), лучшие K за O(K log n)
+
+    В рейтинге только пользователи с положительными очками; при равных
+    очках место общее.
+    """
+
+    def __init__(self):
+        self._scores: Dict[int, int] = {}
+        self._by_score: Dict[int, Set[int]] = {}
+        self._tree = FenwickTree()
+
+    def __len__(self) -> int:
+        return self._tree.total
+
+    def score(self, user_id: int) -> int:
+        return self._scores.get(user_id, 0)
+
+    def set(self, user_id: int, score: int) -> None:
+        old = self._scores.get(user_id, 0)
+        if old == score:
+            return
+        if old > 0:
+            self._tree.add(old, -1)
+            users = self._by_score[old]
+            users.discard(user_id)
+            if not users:
+                del self._by_score[old]
+        if score > 0:
+            self._scores[user_id] = score
+            self._tree.add(score, 1)
+            self._by_score.setdefault(score, set()).add(user_id)
+        else:
+            self._scores.pop(user_id, None)
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """Место пользователя: 1 + число пользователей с большими очками"""
+        score = self._scores.get(user_id, 0)
+        if score <= 0:
+            return None
+        return 1 + self._tree.total - self._tree.prefix(score)
+
+    def top(self, limit: int) -> List[Tuple[int, int, int]]:
+        """Лучшие пользователи: (место, id, очки), при равных очках - по id"""
+        result: List[Tuple[int, int, int]] = []
+        below = self._tree.total  # пользователей с очками не больше текущих
+        while below > 0 and len(result) < limit:
+            score = self._tree.find(below)
+            rank = 1 + self._tree.total - below
+            for user_id in heapq.nsmallest(limit - len(result), self._by_score[score]):
+                result.append((rank, user_id, score))
+            below = self._tree.prefix(score - 1)
+        return result
+
+
+class Leaderboard:
+    """Рейтинг по правильным ответам и лучшей серии, обновляемый при каждой попытке
+
+    Загружается из user_statistics; дальше record повторяет логику
+    UPDATE статистики в SQL (серия растет на верных ответах, обнуляется
+    на ошибке), поэтому запрос к БД для рейтинга не нужен.
+    """
+
+    def __init__(self):
+        self._indexes = {metric: ScoreIndex() for metric in METRICS}
+        self._streaks: Dict[int, int] = {}  # текущая серия пользователей с попытками
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Число пользователей с попытками"""
+        return len(self._streaks)
+
+    def load(self, rows: Iterable[Tuple[int, int, int, int]]) -> None:
+        """Строки (user_id, correct_attempts, best_streak, current_streak)"""
+        with self._lock:
+            for user_id, correct, best, current in rows:
+                self._indexes['correct'].set(user_id, correct)
+                self._indexes['streak'].set(user_id, best)
+                self._streaks[user_id] = current
+
+    def record(self, user_id: int, was_correct: bool) -> None:
+        with self._lock:
+            if was_correct:
+                correct = self._indexes['correct']
+                correct.set(user_id, correct.score(user_id) + 1)
+                current = self._streaks.get(user_id, 0) + 1
+                best = self._indexes['streak']
+                if current > best.score(user_id):
+                    best.set(user_id, current)
+            else:
+                current = 0
+            self._streaks[user_id] = current
+
+    def reset(self, user_id: int) -> None:
+        with self._lock:
+            for index in self._indexes.values():
+                index.set(user_id, 0)
+            self._streaks.pop(user_id, None)
+
+    def top(self, metric: str, limit: int) -> List[Tuple[int, int, int]]:
+        with self._lock:
+            return self._indexes[metric].top(limit)
+
+    def rank(self, metric: str, user_id: int) -> Tuple[Optional[int], int, int]:
+        """Место (None - нет в рейтинге), очки и число пользователей в рейтинге"""
+        with self._lock:
+            index = self._indexes[metric]
+            return index.rank(user_id), index.score(user_id), len(index)
+
+
+class SnapshotGate:
+    """Разделяемая и монопольная блокировка для снимка рейтинга
+
+    Синхронная запись попытки держит ее совместно от фиксации в БД до
+    учета в рейтинге, снимок БД берется монопольно: снимок не попадает
+    между ними, и попытка не учитывается дважды. Пока снимок ждет,
+    новые записи не начинаются, чтобы он не ждал бесконечно.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._waiting = 0
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            while self._exclusive or self._waiting:
+                self._cond.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                if not self._shared:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._waiting += 1
+            while self._exclusive or self._shared:
+                self._cond.wait()
+            self._waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
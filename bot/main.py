@@ -1,13 +1,26 @@
+import io
 import logging
+import signal
 import sys
-from dataclasses import dataclass
-from typing import Dict, Optional
+from html import escape
+from typing import Callable, Dict, List, Optional, Tuple
 
 import telebot
 from telebot import types
 
-from config import TELEGRAM_BOT_TOKEN
+from config import (
+    TELEGRAM_BOT_TOKEN, BOT_RUNTIME, ASYNC_WORKERS, SESSION_STORE, SESSION_CACHE_SIZE, SESSION_TTL,
+    BOT_MODE, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+    WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE, WEBHOOK_MAX_CONNECTIONS, IMPORT_MAX_BYTES, IMPORT_MAX_WORDS,
+    METRICS_LISTEN, METRICS_PORT, OUTBOX, OUTBOX_WORKERS, OUTBOX_GLOBAL_RATE, OUTBOX_CHAT_RATE,
+    OUTBOX_CHAT_BURST, OUTBOX_LINGER, OUTBOX_MAX_QUEUE, LEADERBOARD_SIZE,
+)
 import db
+from sessions import UserState, create_session_store
+from router import Router
+from outbox import Document, Outbox
+from metrics import SEND_ERRORS, SEND_SECONDS, MetricsServer, timed, track_handler
+from wordfile import WordFileParser, read_lines
 from keyboards import main_menu, options_keyboard, cancel_keyboard, statistics_menu, statistics_during_game_menu
 
 # Настройка логирования
@@ -17,22 +30,73 @@ logger = logging.getLogger(__name__)
 bot = telebot.TeleBot(TELEGRAM_BOT_TOKEN, parse_mode='HTML')
 
 
-@dataclass
-class UserState:
-    """Состояние пользователя для управления диалогом"""
-    mode: Optional[str] = None  # 'quiz' | 'add' | 'delete'
-    pending_correct_en: Optional[str] = None
+# Длительность long polling (getUpdates) и запас на сетевую задержку: столько
+# новый лидер ждет, пока не завершится последний запрос прежнего
+LONG_POLLING_TIMEOUT = 5
+LEADER_TAKEOVER_MARGIN = 2.0
 
 
-# Хранилище состояний пользователей
-user_states: Dict[int, UserState] = {}
+# Хранилище состояний пользователей (в памяти или в PostgreSQL, см. SESSION_STORE)
+sessions = create_session_store(SESSION_STORE, SESSION_CACHE_SIZE, SESSION_TTL)
 
 
 def get_state(chat_id: int) -> UserState:
-    """Получение или создание состояния пользователя"""
-    if chat_id not in user_states:
-        user_states[chat_id] = UserState()
-    return user_states[chat_id]
+    """Получение состояния пользователя (новое, если сессии нет)"""
+    return sessions.get(chat_id)
+
+
+def save_state(chat_id: int, state: UserState) -> None:
+    """Сохранение измененного состояния пользователя"""
+    sessions.save(chat_id, state)
+
+
+# Кнопки меню и режимы диалога: один поиск в словаре вместо цепочки фильтров telebot
+router = Router(get_state)
+
+
+@timed(SEND_SECONDS, SEND_ERRORS, name='sync')
+def _send_direct(chat_id: int, text: str, reply_markup=None, document: Optional[Document] = None) -> None:
+    """Синхронная отправка сообщения (или документа с подписью text) через Bot API"""
+    if document is None:
+        bot.send_message(chat_id, text, reply_markup=reply_markup)
+    else:
+        bot.send_document(
+            chat_id, types.InputFile(io.BytesIO(document.data), file_name=document.file_name),
+            caption=text, reply_markup=reply_markup,
+        )
+
+
+# Способ отправки сообщений (подменяется очередью исходящих или асинхронным рантаймом)
+_transport: Callable = _send_direct
+
+
+def set_transport(transport: Optional[Callable]) -> None:
+    """Замена способа отправки сообщений; None - прямая отправка"""
+    global _transport
+    _transport = transport or _send_direct
+
+
+def create_outbox() -> Outbox:
+    """Очередь исходящих сообщений с настройками из config.txt (не запущена)"""
+    return Outbox(
+        _send_direct,
+        workers=OUTBOX_WORKERS,
+        global_rate=OUTBOX_GLOBAL_RATE,
+        chat_rate=OUTBOX_CHAT_RATE,
+        chat_burst=OUTBOX_CHAT_BURST,
+        linger=OUTBOX_LINGER,
+        max_queue=OUTBOX_MAX_QUEUE,
+    )
+
+
+def send_message(chat_id: int, text: str, reply_markup=None) -> None:
+    """Отправка сообщения пользователю"""
+    _transport(chat_id, text, reply_markup)
+
+
+def send_document(chat_id: int, document: Document, caption: str = '', reply_markup=None) -> None:
+    """Отправка файла тем же способом, что и сообщений (в общем порядке сообщений чата)"""
+    _transport(chat_id, caption, reply_markup, document)
 
 
 def format_statistics(stats: Dict) -> str:
@@ -50,6 +114,7 @@ def format_statistics(stats: Dict) -> str:
 
 
 @bot.message_handler(commands=['start'])
+@track_handler
 def handle_start(message: types.Message):
     """Обработчик команды /start"""
     user_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
@@ -63,17 +128,23 @@ def handle_start(message: types.Message):
         "💡 Используй /help для получения справки по командам\n\n"
         "Ну что, начнём ⬇️"
     )
-    bot.send_message(message.chat.id, welcome, reply_markup=main_menu())
+    send_message(message.chat.id, welcome, reply_markup=main_menu())
 
 
 @bot.message_handler(commands=['help'])
+@track_handler
 def handle_help(message: types.Message):
     """Обработчик команды /help - справка по работе с ботом"""
     help_text = (
         f"📖 <b>СПРАВКА ПО БОТУ EnglishCard</b>\n\n"
         f"🎯 <b>Основные команды:</b>\n"
         f"• /start - Запустить бота\n"
-        f"• /help - Показать эту справку\n\n"
+        f"• /help - Показать эту справку\n"
+        f"• /import - Загрузить слова из файла CSV/TSV\n"
+        f"• /export - Выгрузить свои слова в файл\n"
+        f"• /top - Рейтинг по правильным ответам и лучшей серии\n"
+        f"• /friends - Рейтинг среди друзей\n"
+        f"• /addfriend username - Добавить друга по имени пользователя в Telegram\n\n"
         f"🎮 <b>Функции бота:</b>\n\n"
         f"📚 <b>Начать тренировку</b>\n"
         f"   Изучение слов в формате викторины.\n"
@@ -110,18 +181,18 @@ def handle_help(message: types.Message):
         f"Удачного изучения! 🚀"
     )
     
-    bot.send_message(message.chat.id, help_text, reply_markup=main_menu())
+    send_message(message.chat.id, help_text, reply_markup=main_menu())
 
 
-@bot.message_handler(func=lambda m: m.text == 'Начать тренировку')
+@router.text('Начать тренировку')
 def handle_start_training(message: types.Message):
     """Обработчик кнопки 'Начать тренировку'"""
     state = get_state(message.chat.id)
     state.mode = 'quiz'
-    ask_question(message)
+    ask_question(message, state)
 
 
-@bot.message_handler(func=lambda m: m.text == '📊 Статистика')
+@router.text('📊 Статистика')
 def handle_statistics(message: types.Message):
     """Обработчик кнопки 'Статистика' - определяет контекст и показывает соответствующее меню"""
     state = get_state(message.chat.id)
@@ -134,38 +205,38 @@ def handle_statistics(message: types.Message):
     if stats and stats['total_attempts'] > 0:
         if is_during_game:
             # Во время игры - показываем меню с кнопкой "Продолжить"
-            bot.send_message(message.chat.id, format_statistics(stats), reply_markup=statistics_during_game_menu())
+            send_message(message.chat.id, format_statistics(stats), reply_markup=statistics_during_game_menu())
         else:
             # Обычное меню статистики
-            bot.send_message(message.chat.id, format_statistics(stats), reply_markup=statistics_menu())
+            send_message(message.chat.id, format_statistics(stats), reply_markup=statistics_menu())
     else:
         if is_during_game:
-            bot.send_message(
+            send_message(
                 message.chat.id, 
                 "📊 У вас пока нет статистики. Продолжайте тренировку!",
                 reply_markup=statistics_during_game_menu()
             )
         else:
-            bot.send_message(
+            send_message(
                 message.chat.id, 
                 "📊 У вас пока нет статистики. Начните тренировку, чтобы накопить данные!",
                 reply_markup=statistics_menu()
             )
 
 
-@bot.message_handler(func=lambda m: m.text == '🔄 Сбросить статистику')
+@router.text('🔄 Сбросить статистику')
 def handle_reset_statistics(message: types.Message):
     """Обработчик кнопки 'Сбросить статистику'"""
     user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
     db.reset_user_statistics(user_db_id)
-    bot.send_message(
+    send_message(
         message.chat.id, 
         "🔄 Статистика сброшена! Начните заново для накопления новых данных.",
         reply_markup=main_menu()
     )
 
 
-@bot.message_handler(func=lambda m: m.text == '📈 Детальная статистика')
+@router.text('📈 Детальная статистика')
 def handle_detailed_statistics(message: types.Message):
     """Обработчик кнопки 'Детальная статистика'"""
     user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
@@ -186,21 +257,27 @@ def handle_detailed_statistics(message: types.Message):
             f"   • Лучшая серия: {stats['best_streak']}\n\n"
             f"🕐 Последняя активность: {stats['last_activity'].strftime('%d.%m.%Y в %H:%M')}"
         )
-        bot.send_message(message.chat.id, detailed_stats, reply_markup=statistics_menu())
+        hard_words = db.get_user_hard_words(user_db_id)
+        if hard_words:
+            detailed_stats += "\n\n🧩 <b>Трудные слова:</b>\n" + "\n".join(
+                f"   • {w['word_en']} — ошибок {w['errors']} из {w['attempts']}" for w in hard_words
+            )
+        send_message(message.chat.id, detailed_stats, reply_markup=statistics_menu())
     else:
-        bot.send_message(
+        send_message(
             message.chat.id, 
             "📈 У вас пока нет данных для детальной статистики.",
             reply_markup=statistics_menu()
         )
 
 
-@bot.message_handler(func=lambda m: m.text == '⏹ Остановить игру')
+@router.text('⏹ Остановить игру')
 def handle_stop_game(message: types.Message):
     """Обработчик кнопки 'Остановить игру'"""
     state = get_state(message.chat.id)
     state.mode = None
     state.pending_correct_en = None
+    save_state(message.chat.id, state)
     
     user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
     stats = db.get_user_statistics(user_db_id)
@@ -215,40 +292,47 @@ def handle_stop_game(message: types.Message):
             f"   • Лучшая серия: {stats['best_streak']}\n\n"
             f"Отличная работа! 🎉"
         )
-        bot.send_message(message.chat.id, session_stats, reply_markup=main_menu())
+        send_message(message.chat.id, session_stats, reply_markup=main_menu())
     else:
-        bot.send_message(message.chat.id, "⏹ Игра остановлена!", reply_markup=main_menu())
+        send_message(message.chat.id, "⏹ Игра остановлена!", reply_markup=main_menu())
 
 
 
 
 
-@bot.message_handler(func=lambda m: m.text == '▶️ Продолжить игру')
+@router.text('▶️ Продолжить игру')
 def handle_continue_game(message: types.Message):
     """Обработчик кнопки 'Продолжить игру'"""
     state = get_state(message.chat.id)
     if state.mode == 'quiz':
-        ask_question(message)
+        ask_question(message, state)
     else:
-        bot.send_message(message.chat.id, "🏠 Главное меню:", reply_markup=main_menu())
+        send_message(message.chat.id, "🏠 Главное меню:", reply_markup=main_menu())
 
 
-@bot.message_handler(func=lambda m: m.text == '🏠 Главное меню')
+@router.text('🏠 Главное меню')
 def handle_main_menu(message: types.Message):
     """Обработчик кнопки 'Главное меню'"""
     state = get_state(message.chat.id)
     state.mode = None
     state.pending_correct_en = None
-    bot.send_message(message.chat.id, "🏠 Главное меню:", reply_markup=main_menu())
+    save_state(message.chat.id, state)
+    send_message(message.chat.id, "🏠 Главное меню:", reply_markup=main_menu())
 
 
-def ask_question(message: types.Message):
+def ask_question(message: types.Message, state: Optional[UserState] = None):
     """Функция для показа вопроса пользователю"""
+    if state is None:
+        state = get_state(message.chat.id)
     user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
-    picked = db.pick_question_with_options(user_db_id)
-    
+    send_question(message, state, db.pick_question_with_options(user_db_id))
+
+
+def send_question(message: types.Message, state: UserState, picked: Optional[Tuple[str, str, List[str]]]):
+    """Показ выбранного вопроса и сохранение ожидаемого ответа"""
     if not picked:
-        bot.send_message(
+        save_state(message.chat.id, state)
+        send_message(
             message.chat.id,
             'Недостаточно слов для тренировки. Добавьте ещё слова (минимум 4 в сумме).',
             reply_markup=main_menu(),
@@ -256,124 +340,373 @@ def ask_question(message: types.Message):
         return
     
     word_ru, correct_en, options = picked
-    state = get_state(message.chat.id)
     state.pending_correct_en = correct_en
+    save_state(message.chat.id, state)
     
-    bot.send_message(
+    send_message(
         message.chat.id,
         f'Как переводится слово: <b>{word_ru}</b>?',
         reply_markup=options_keyboard(options),
     )
 
 
-@bot.message_handler(func=lambda m: m.text == 'Добавить слово ➕')
+@router.text('Добавить слово ➕')
 def handle_add_word(message: types.Message):
     """Обработчик кнопки 'Добавить слово'"""
     state = get_state(message.chat.id)
     state.mode = 'add'
-    bot.send_message(
+    save_state(message.chat.id, state)
+    send_message(
         message.chat.id,
         'Отправьте слово в формате: <b>английское - русский</b> (например: <i>cat - кот</i>)',
         reply_markup=cancel_keyboard(),
     )
 
 
-@bot.message_handler(func=lambda m: m.text == 'Удалить слово 🔙')
+@router.text('Удалить слово 🔙')
 def handle_delete_word(message: types.Message):
     """Обработчик кнопки 'Удалить слово'"""
     state = get_state(message.chat.id)
     state.mode = 'delete'
-    bot.send_message(
+    save_state(message.chat.id, state)
+    send_message(
         message.chat.id,
         'Отправьте <b>английское</b> слово для удаления из вашей базы',
         reply_markup=cancel_keyboard(),
     )
 
 
-@bot.message_handler(func=lambda m: m.text == 'Отмена')
+@router.text('Отмена')
 def handle_cancel(message: types.Message):
     """Обработчик кнопки 'Отмена'"""
     state = get_state(message.chat.id)
     state.mode = None
     state.pending_correct_en = None
-    bot.send_message(message.chat.id, 'Действие отменено.', reply_markup=main_menu())
+    save_state(message.chat.id, state)
+    send_message(message.chat.id, 'Действие отменено.', reply_markup=main_menu())
 
 
-@bot.message_handler(content_types=['text'])
-def handle_text(message: types.Message):
-    """Основной обработчик текстовых сообщений"""
-    state = get_state(message.chat.id)
+@router.mode('quiz')
+def handle_answer(message: types.Message, state: UserState):
+    """Ответ на вопрос в режиме тренировки"""
+    if not state.pending_correct_en:
+        handle_unknown(message)
+        return
 
-    # Обработка ответов в режиме тренировки
-    if state.mode == 'quiz' and state.pending_correct_en:
-        user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
-        is_correct = message.text.strip().lower() == state.pending_correct_en.lower()
-        db.record_attempt(user_db_id, state.pending_correct_en, is_correct)
-        
-        if is_correct:
-            bot.send_message(message.chat.id, 'Верно ✅')
-            state.pending_correct_en = None
-            ask_question(message)
-        else:
-            bot.send_message(message.chat.id, 'Неверно. Попробуйте ещё раз ❌')
+    user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
+    is_correct = message.text.strip().lower() == state.pending_correct_en.lower()
+    
+    if is_correct:
+        # Запись ответа и следующий вопрос - одно обращение к БД
+        picked = db.answer_and_next(user_db_id, state.pending_correct_en, True)
+        send_message(message.chat.id, 'Верно ✅')
+        state.pending_correct_en = None
+        send_question(message, state, picked)
+    else:
+        db.record_attempt(user_db_id, state.pending_correct_en, False, answer_en=message.text)
+        send_message(message.chat.id, 'Неверно. Попробуйте ещё раз ❌')
+
+
+@router.mode('add')
+def handle_add_input(message: types.Message, state: UserState):
+    """Ввод нового слова в формате 'английское - русский'"""
+    parts = message.text.split('-')
+    if len(parts) != 2:
+        send_message(message.chat.id, 'Неверный формат. Пример: <i>cat - кот</i>')
         return
+    
+    en = parts[0].strip()
+    ru = parts[1].strip()
+    user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
+    db.add_user_word(user_db_id, en, ru)
+    
+    count = db.count_user_words(user_db_id)
+    send_message(
+        message.chat.id,
+        f'Слово добавлено ✅ Сейчас в вашей базе: <b>{count}</b> слов.',
+        reply_markup=main_menu(),
+    )
+    state.mode = None
+    save_state(message.chat.id, state)
 
-    # Обработка добавления слова
-    if state.mode == 'add':
-        parts = message.text.split('-')
-        if len(parts) != 2:
-            bot.send_message(message.chat.id, 'Неверный формат. Пример: <i>cat - кот</i>')
-            return
-        
-        en = parts[0].strip()
-        ru = parts[1].strip()
-        user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
-        db.add_user_word(user_db_id, en, ru)
-        
-        count = len(db.get_training_pool(user_db_id))
-        bot.send_message(
+
+@router.mode('delete')
+def handle_delete_input(message: types.Message, state: UserState):
+    """Ввод английского слова для удаления"""
+    en = message.text.strip()
+    user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
+    deleted = db.delete_user_word(user_db_id, en)
+    
+    if deleted:
+        send_message(message.chat.id, 'Слово удалено ✅', reply_markup=main_menu())
+    else:
+        send_message(message.chat.id, 'Слово не найдено среди ваших добавленных активных слов.', reply_markup=main_menu())
+    state.mode = None
+    save_state(message.chat.id, state)
+
+
+@bot.message_handler(commands=['import'])
+@track_handler
+def handle_import_help(message: types.Message):
+    """Обработчик команды /import - формат файла для загрузки слов"""
+    send_message(
+        message.chat.id,
+        "📥 <b>Импорт слов</b>\n\n"
+        "Отправьте файл CSV или TSV в кодировке UTF-8: в каждой строке английское слово "
+        "и перевод через табуляцию, точку с запятой или запятую. "
+        "Первая строка может быть заголовком (<i>en, ru</i>).\n\n"
+        "Пример:\n<code>cat;кот\nhouse;дом</code>\n\n"
+        f"До {IMPORT_MAX_WORDS} слов, файл до {IMPORT_MAX_BYTES // 1000} КБ. "
+        "Слова, которые уже есть в вашей базе, пропускаются.",
+        reply_markup=main_menu(),
+    )
+
+
+@bot.message_handler(content_types=['document'])
+@track_handler
+def handle_import_file(message: types.Message):
+    """Импорт слов из присланного файла"""
+    document = message.document
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        send_message(message.chat.id, f'Файл слишком большой: не больше {IMPORT_MAX_BYTES // 1000} КБ.')
+        return
+    user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
+    data = bot.download_file(bot.get_file(document.file_id).file_path)
+    parser = WordFileParser(read_lines(data))
+    try:
+        result = db.import_user_words(user_db_id, parser, IMPORT_MAX_WORDS)
+    except UnicodeDecodeError:
+        send_message(message.chat.id, 'Не удалось прочитать файл: нужна кодировка UTF-8.', reply_markup=main_menu())
+        return
+    except Exception:
+        logger.exception('Ошибка импорта слов user_id=%s', user_db_id)
+        send_message(message.chat.id, 'Не удалось загрузить слова, попробуйте позже.', reply_markup=main_menu())
+        return
+
+    report = f'📥 Добавлено слов: <b>{result.added}</b>\nУже были в базе или повторялись: {result.duplicates}'
+    if parser.invalid:
+        report += f'\nПропущено строк с ошибками: {parser.invalid}'
+        report += ''.join(f'\n   • строка {line_no}: {reason}' for line_no, reason in parser.errors)
+    if result.truncated:
+        report += f'\n⚠️ Загружены только первые {IMPORT_MAX_WORDS} слов'
+    send_message(message.chat.id, report, reply_markup=main_menu())
+
+
+@bot.message_handler(commands=['export'])
+@track_handler
+def handle_export(message: types.Message):
+    """Обработчик команды /export - выгрузка своих слов в TSV"""
+    user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
+    out = io.BytesIO()
+    if not db.export_user_words(user_db_id, out):
+        send_message(message.chat.id, 'У вас пока нет своих слов.', reply_markup=main_menu())
+        return
+    send_document(
+        message.chat.id,
+        Document('words.tsv', out.getvalue()),
+        caption='📤 Ваши слова (этот файл можно снова загрузить через /import)',
+    )
+
+
+# Показатели рейтинга: название для заголовка и подпись к очкам
+LEADERBOARD_TITLES = {
+    'correct': ('✅ Правильные ответы', 'отв.'),
+    'streak': ('🔥 Лучшая серия', 'подряд'),
+}
+
+
+def format_leaderboard(metric: str, board: Dict) -> str:
+    """Лучшие пользователи по одному показателю и место пользователя"""
+    title, unit = LEADERBOARD_TITLES[metric]
+    lines = [f'<b>{title}</b>']
+    for entry in board['top']:
+        lines.append(f"{entry['rank']}. {escape(entry['name'])} - <b>{entry['score']}</b> {unit}")
+    if not board['top']:
+        lines.append('Пока никого нет')
+    if board['rank'] is not None:
+        lines.append(f"Ваше место: <b>{board['rank']}</b> из {board['ranked']} ({board['score']} {unit})")
+    else:
+        lines.append('Вас пока нет в рейтинге')
+    return '\n'.join(lines)
+
+
+@bot.message_handler(commands=['top'])
+@track_handler
+def handle_top(message: types.Message):
+    """Обработчик команды /top - общий рейтинг"""
+    user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
+    parts = ['🏆 <b>Рейтинг</b>']
+    for metric in LEADERBOARD_TITLES:
+        parts.append(format_leaderboard(metric, db.get_leaderboard(metric, user_db_id, LEADERBOARD_SIZE)))
+    send_message(message.chat.id, '\n\n'.join(parts), reply_markup=main_menu())
+
+
+@bot.message_handler(commands=['friends'])
+@track_handler
+def handle_friends(message: types.Message):
+    """Обработчик команды /friends - рейтинг среди друзей"""
+    user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
+    entries = db.get_friends_leaderboard(user_db_id, 'correct')
+    if len(entries) < 2:
+        send_message(
             message.chat.id,
-            f'Слово добавлено ✅ Сейчас в вашей базе: <b>{count}</b> слов.',
+            'У вас пока нет друзей в рейтинге. Добавьте друга: /addfriend username',
             reply_markup=main_menu(),
         )
-        state.mode = None
         return
-
-    # Обработка удаления слова
-    if state.mode == 'delete':
-        en = message.text.strip()
-        user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
-        deleted = db.delete_user_word(user_db_id, en)
-        
-        if deleted:
-            bot.send_message(message.chat.id, 'Слово удалено ✅', reply_markup=main_menu())
-        else:
-            bot.send_message(message.chat.id, 'Слово не найдено среди ваших добавленных активных слов.', reply_markup=main_menu())
-        state.mode = None
+    lines = ['👥 <b>Рейтинг среди друзей</b> (правильные ответы)']
+    for entry in entries:
+        name = f"<b>{escape(entry['name'])}</b>" if entry['is_self'] else escape(entry['name'])
+        global_rank = f" (место в общем: {entry['global_rank']})" if entry['global_rank'] else ''
+        lines.append(f"{entry['rank']}. {name} - {entry['score']}{global_rank}")
+    send_message(message.chat.id, '\n'.join(lines), reply_markup=main_menu())
+
+
+@bot.message_handler(commands=['addfriend'])
+@track_handler
+def handle_add_friend(message: types.Message):
+    """Обработчик команды /addfriend username"""
+    parts = (message.text or '').split(maxsplit=1)
+    if len(parts) < 2:
+        send_message(message.chat.id, 'Укажите имя пользователя: /addfriend username', reply_markup=main_menu())
         return
+    user_db_id = db.ensure_user(message.from_user.id, message.from_user.username, message.from_user.first_name)
+    name = db.add_friend(user_db_id, parts[1])
+    if name is None:
+        send_message(
+            message.chat.id,
+            'Пользователь не найден. Друг должен хотя бы раз запустить бота (/start).',
+            reply_markup=main_menu(),
+        )
+        return
+    send_message(message.chat.id, f'Друг добавлен ✅ {escape(name)}. Рейтинг: /friends', reply_markup=main_menu())
+
 
-    # Обработка неизвестных сообщений
-    bot.send_message(message.chat.id, 'Выберите действие из меню ниже ⬇️', reply_markup=main_menu())
+@router.fallback
+def handle_unknown(message: types.Message):
+    """Сообщение вне меню и без активного режима"""
+    send_message(message.chat.id, 'Выберите действие из меню ниже ⬇️', reply_markup=main_menu())
+
+
+@bot.message_handler(content_types=['text'])
+def handle_text(message: types.Message):
+    """Основной обработчик текстовых сообщений: кнопки меню и режимы диалога через router"""
+    router.dispatch(message)
+
+
+def get_route_stats() -> Dict[str, Dict]:
+    """Число вызовов и время обработки по маршрутам"""
+    return router.stats()
+
+
+def stop_on_sigterm() -> None:
+    """SIGTERM (systemd, docker stop, замена экземпляра) останавливает бота как Ctrl+C
+
+    KeyboardInterrupt в главном потоке штатно прерывает polling, цикл asyncio
+    и webhook-сервер, после чего в finally дописываются попытки, повторения
+    и статистика и отправляются сообщения из очереди. Повторный SIGTERM
+    во время этого игнорируется.
+    """
+    def handle(signum, frame):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        logger.info('⏹ Получен SIGTERM, бот останавливается...')
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, handle)
 
 
 if __name__ == '__main__':
+    outbox = None
+    stop_on_sigterm()
     try:
         # Импортируем утилиты для безопасного запуска
-        from startup_utils import safe_startup_check
-        from config import DB_URL
+        from startup_utils import safe_startup_check, fast_startup_check
+        from config import DB_URL, STARTUP_MODE, BOT_PIDFILE, STARTUP_TIMEOUT, LEADER_ELECTION, LEADER_RETRY_INTERVAL
+        
+        # С выбором лидера обновления не удаляются при запуске, а работающий экземпляр
+        # не останавливается: резервный не должен сбрасывать очередь лидера или завершать его
+        leader_election = LEADER_ELECTION and BOT_MODE == 'polling'
+        clear_telegram = BOT_MODE == 'polling' and not leader_election
         
         logger.info('🚀 Инициализация безопасного запуска бота...')
         
         # Проверяем и готовим систему к запуску
-        if not safe_startup_check(TELEGRAM_BOT_TOKEN, DB_URL):
+        # (в режиме webhook не удаляем webhook и не вычитываем обновления)
+        if STARTUP_MODE == 'fast':
+            try:
+                fast_startup_check(
+                    TELEGRAM_BOT_TOKEN, db.warm_up, clear_telegram=clear_telegram,
+                    pidfile=BOT_PIDFILE or None, timeout=STARTUP_TIMEOUT,
+                    stop_running=not leader_election,
+                )
+            except RuntimeError as e:
+                logger.error("❌ %s. Запуск отменен.", e)
+                sys.exit(1)
+        elif not safe_startup_check(TELEGRAM_BOT_TOKEN, DB_URL, clear_telegram=clear_telegram,
+                                    stop_running=not leader_election):
             logger.error("❌ Предварительные проверки не прошли. Запуск отменен.")
             sys.exit(1)
         
+        if METRICS_PORT:
+            MetricsServer(METRICS_LISTEN, METRICS_PORT).start()
+        
+        if OUTBOX and BOT_RUNTIME == 'threaded':
+            outbox = create_outbox().start()
+            set_transport(outbox.send)
+        
         logger.info('✅ Бот готов к запуску!')
         logger.info('🤖 Запуск бота...')
         
         # Запускаем бота с обработкой исключений
-        bot.infinity_polling(skip_pending=True, timeout=10, long_polling_timeout=5)
+        if BOT_MODE == 'webhook':
+            from webhook import WebhookServer
+            if WEBHOOK_URL:
+                bot.set_webhook(
+                    url=WEBHOOK_URL,
+                    secret_token=WEBHOOK_SECRET or None,
+                    max_connections=WEBHOOK_MAX_CONNECTIONS,
+                    drop_pending_updates=True,
+                )
+                logger.info('🌐 Webhook зарегистрирован: %s', WEBHOOK_URL)
+            else:
+                logger.warning('WEBHOOK_URL не задан: webhook должен быть зарегистрирован заранее')
+            WebhookServer(
+                bot,
+                host=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                path=WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                workers=WEBHOOK_WORKERS,
+                queue_size=WEBHOOK_QUEUE_SIZE,
+            ).serve_forever()
+        elif leader_election:
+            from leader import LeaderElection, election_key, run_as_leader
+            election = LeaderElection(db.leader_connection, election_key(TELEGRAM_BOT_TOKEN),
+                                      retry_interval=LEADER_RETRY_INTERVAL)
+            if BOT_RUNTIME == 'async':
+                from async_runtime import AsyncRuntime
+                runtime = AsyncRuntime(bot, set_transport, workers=ASYNC_WORKERS)
+                stop = runtime.stop
+            else:
+                stop = bot.stop_polling
+
+            def serve():
+                # Новый лидер продолжает с необработанных обновлений предыдущего
+                bot.delete_webhook()
+                if BOT_RUNTIME == 'async':
+                    runtime.run(skip_pending=False, timeout=LONG_POLLING_TIMEOUT)
+                else:
+                    bot.polling(non_stop=True, skip_pending=False, timeout=10,
+                                long_polling_timeout=LONG_POLLING_TIMEOUT)
+
+            run_as_leader(election, serve, stop, takeover_delay=LONG_POLLING_TIMEOUT + LEADER_TAKEOVER_MARGIN)
+        elif BOT_RUNTIME == 'async':
+            from async_runtime import AsyncRuntime
+            logger.info('⚡ Асинхронный режим (AsyncTeleBot), потоков для обработчиков: %s', ASYNC_WORKERS)
+            AsyncRuntime(bot, set_transport, workers=ASYNC_WORKERS).run()
+        else:
+            # В режиме fast накопившиеся обновления уже удалены вместе с webhook
+            bot.infinity_polling(skip_pending=STARTUP_MODE != 'fast', timeout=10, long_polling_timeout=LONG_POLLING_TIMEOUT)
         
     except KeyboardInterrupt:
         logger.info("⏹ Бот остановлен пользователем")
@@ -388,6 +721,7 @@ if __name__ == '__main__':
             print("1. Проверьте, не запущен ли бот в другом месте")
             print("2. Создайте новый бот через @BotFather")
             print("3. Обновите токен в config.txt")
+            print("4. Для нескольких экземпляров включите LEADER_ELECTION=1 в config.txt")
             
         elif "psycopg2" in str(e) or "database" in str(e).lower():
             print("\n🔧 ОШИБКА БАЗЫ ДАННЫХ")
@@ -401,4 +735,11 @@ if __name__ == '__main__':
             print("2. Правильность токена бота")
             print("3. Доступность Telegram API")
             
-        sys.exit(1) 
\ No newline at end of file
+        sys.exit(1)
+        
+    finally:
+        # Завершение не прерывается повторным SIGTERM
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        if outbox is not None:
+            outbox.close()
+        db.shutdown()
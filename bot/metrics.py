@@ -0,0 +1,290 @@
+import bisect
+import functools
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    @abstractmethod
+    def render(self) -> List[str]:
+        ...
+
+
+class _Scalar(_Metric):
+    """Одно число на набор меток: задается явно или читается функцией при выгрузке"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set_function(self, fn: Optional[Callable[[], float]], *labels: str) -> None:
+        """Значение вычисляется при каждой выгрузке (None - убрать функцию)"""
+        with self._lock:
+            if fn is None:
+                self._functions.pop(labels, None)
+            else:
+                self._functions[labels] = fn
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for labels, fn in functions.items():
+            try:
+                values[labels] = fn()
+            except Exception:
+                logger.exception('Ошибка чтения метрики %s', self.name)
+        return self._header() + [
+            f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+            for labels, value in sorted(values.items())
+        ]
+
+
+class Counter(_Scalar):
+    """Счетчик, который только растет (по набору меток)
+
+    Функция в set_function должна возвращать счетчик, который тоже только растет
+    (например, попадания в кэш).
+    """
+    kind = 'counter'
+
+
+class Gauge(_Scalar):
+    """Текущее значение: устанавливается явно или читается функцией при выгрузке"""
+    kind = 'gauge'
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Гистограмма (корзины, сумма, число наблюдений) по набору меток"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Метки -> [счетчики корзин (последняя - +Inf), сумма]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """Число наблюдений и их сумма по наборам меток"""
+        with self._lock:
+            return {labels: (sum(counts), total) for labels, (counts, total) in self._series.items()}
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        lines = self._header()
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Набор метрик процесса и их выгрузка в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Метрика {metric.name} уже зарегистрирована')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HANDLER_SECONDS = REGISTRY.register(Histogram(
+    'englishcard_handler_seconds', 'Время обработки сообщения по обработчикам', ('handler',)))
+HANDLER_ERRORS = REGISTRY.register(Counter(
+    'englishcard_handler_errors_total', 'Исключения в обработчиках сообщений', ('handler',)))
+HANDLERS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'englishcard_handlers_in_flight', 'Сообщения, обрабатываемые в данный момент'))
+DB_SECONDS = REGISTRY.register(Histogram(
+    'englishcard_db_seconds', 'Время выполнения функций bot/db.py', ('function',)))
+DB_ERRORS = REGISTRY.register(Counter(
+    'englishcard_db_errors_total', 'Исключения в функциях bot/db.py', ('function',)))
+SEND_SECONDS = REGISTRY.register(Histogram(
+    'englishcard_send_seconds', 'Время отправки сообщения в Telegram', ('transport',)))
+SEND_ERRORS = REGISTRY.register(Counter(
+    'englishcard_send_errors_total', 'Ошибки отправки сообщений', ('transport',)))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'englishcard_queue_depth', 'Глубина внутренних очередей', ('queue',)))
+DB_POOL_CONNECTIONS = REGISTRY.register(Gauge(
+    'englishcard_db_pool_connections', 'Соединения пула с БД по состоянию', ('state',)))
+DB_POOL_CHECKOUTS = REGISTRY.register(Counter(
+    'englishcard_db_pool_checkouts_total', 'Выдачи соединений из пула'))
+DB_POOL_WAITS = REGISTRY.register(Counter(
+    'englishcard_db_pool_waits_total', 'Выдачи соединений, которым пришлось ждать'))
+DB_POOL_WAIT_SECONDS = REGISTRY.register(Counter(
+    'englishcard_db_pool_wait_seconds_total', 'Суммарное время ожидания соединения'))
+DB_POOL_WAIT_MAX = REGISTRY.register(Gauge(
+    'englishcard_db_pool_wait_max_seconds', 'Самое долгое ожидание соединения'))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'englishcard_cache_lookups_total', 'Обращения к кэшам в памяти', ('cache', 'result')))
+CACHE_ENTRIES = REGISTRY.register(Gauge(
+    'englishcard_cache_entries', 'Записей в кэшах в памяти', ('cache',)))
+USER_PROFILE_UPDATES = REGISTRY.register(Counter(
+    'englishcard_user_profile_updates_total', 'Перезаписи профиля пользователя при смене username/first_name'))
+ATTEMPT_BATCHES = REGISTRY.register(Counter(
+    'englishcard_attempt_batches_total', 'Записанные пачки попыток'))
+ATTEMPTS_WRITTEN = REGISTRY.register(Counter(
+    'englishcard_attempts_written_total', 'Попытки, записанные пачками'))
+ATTEMPT_WRITE_FAILURES = REGISTRY.register(Counter(
+    'englishcard_attempt_write_failures_total', 'Неудачные записи пачек попыток'))
+
+
+def timed(histogram: Histogram, errors: Counter, name: Optional[str] = None):
+    """Декоратор: время вызова функции в histogram, исключения в errors (метка - имя функции)"""
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                errors.inc(label)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started, label)
+        return wrapper
+    return decorator
+
+
+def track_handler(fn):
+    """Декоратор обработчика сообщений telebot: время, ошибки и число обрабатываемых"""
+    timed_fn = timed(HANDLER_SECONDS, HANDLER_ERRORS)(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        HANDLERS_IN_FLIGHT.inc()
+        try:
+            return timed_fn(*args, **kwargs)
+        finally:
+            HANDLERS_IN_FLIGHT.dec()
+    return wrapper
+
+
+class MetricsServer:
+    """HTTP-сервер с метриками в формате Prometheus (GET /metrics) в фоновом потоке"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9108, registry: Registry = REGISTRY):
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> 'MetricsServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+        self._thread.start()
+        logger.info('📈 Метрики: http://%s:%s/metrics', *self._server.server_address[:2])
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,307 @@
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import requests
+from telebot.apihelper import ApiTelegramException
+
+from metrics import QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+# Максимальная длина текста сообщения в Telegram
+MAX_MESSAGE_LENGTH = 4096
+# Разделитель текстов объединенных сообщений
+COALESCE_SEPARATOR = '\n\n'
+# Как часто удалять из памяти чаты без сообщений, секунды
+SWEEP_INTERVAL = 10.0
+
+
+class TokenBucket:
+    """Ведро токенов: rate отправок в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate: float, capacity: float, now: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько секунд ждать следующего токена (0 - можно отправлять)"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class Document(NamedTuple):
+    """Файл, который отправляется документом (текст сообщения - подпись)"""
+    file_name: str
+    data: bytes
+
+
+class OutgoingMessage(NamedTuple):
+    """Сообщение в очереди чата"""
+    text: str
+    reply_markup: object
+    enqueued_at: float
+    parts: int = 1      # сколько исходных сообщений объединено
+    attempts: int = 0   # неудачных попыток отправки
+    document: Optional[Document] = None
+
+
+class _Chat:
+    """Очередь и ограничение скорости одного чата"""
+    __slots__ = ('queue', 'bucket', 'sending', 'due', 'not_before')
+
+    def __init__(self, bucket: TokenBucket):
+        self.queue: Deque[OutgoingMessage] = deque()
+        self.bucket = bucket
+        self.sending = False
+        self.due: Optional[float] = None  # время в очереди отправки (None - не запланирован)
+        self.not_before = 0.0             # пауза после 429 или ошибки сети
+
+
+class Outbox:
+    """Очередь исходящих сообщений с учетом ограничений Telegram
+
+    send() только ставит сообщение в очередь чата, поэтому обработчик не ждет
+    HTTP-запроса. Отправляют потоки workers; у каждого свое постоянное
+    соединение с Bot API (сессия requests на поток в telebot). Скорость
+    ограничена общим ведром токенов (global_rate в секунду) и ведром
+    каждого чата (chat_rate в секунду, до chat_burst подряд). Сообщения
+    одного чата уходят по порядку; идущие подряд сообщения без клавиатуры
+    склеиваются со следующими ("Верно ✅" и следующий вопрос - один запрос);
+    документы не склеиваются и уходят в общем порядке сообщений чата.
+    Сообщение без клавиатуры в конце очереди ждет продолжения linger секунд.
+    На 429 чат ставится на паузу retry_after, ошибки сети и 5xx повторяются
+    с экспоненциальной задержкой, остальные ошибки API не повторяются.
+    При переполнении очереди сообщение отправляется в вызывающем потоке.
+    """
+
+    def __init__(self, send_fn: Callable[[int, str, object, Optional[Document]], None], workers: int = 8,
+                 global_rate: float = 30.0, chat_rate: float = 1.0, chat_burst: float = 3.0,
+                 linger: float = 0.02, max_queue: int = 10000, max_retries: int = 5,
+                 retry_backoff: float = 0.5):
+        self._send_fn = send_fn
+        self.workers = workers
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.linger = linger
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[int, _Chat] = {}
+        self._ready: List[Tuple[float, int]] = []
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self._last_sweep = time.monotonic()
+        self._stats = {
+            'enqueued': 0,
+            'sent': 0,
+            'coalesced': 0,
+            'retried': 0,
+            'rate_limited': 0,
+            'dropped': 0,
+            'overflow': 0,
+        }
+
+    def start(self) -> 'Outbox':
+        """Запуск потоков отправки"""
+        with self._cond:
+            if self._threads:
+                return self
+            self._stopping = False
+            self._threads = [
+                threading.Thread(target=self._run, name=f'outbox-{i}', daemon=True) for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+        QUEUE_DEPTH.set_function(self.pending, 'outbox')
+        return self
+
+    def send(self, chat_id: int, text: str, reply_markup=None, document: Optional[Document] = None) -> None:
+        """Постановка сообщения (или документа с подписью text) в очередь
+
+        Вызывается из любого потока и не ждет отправки.
+        """
+        now = time.monotonic()
+        with self._cond:
+            overflow = self._pending >= self.max_queue
+            direct = overflow or self._stopping or not self._threads
+            if overflow:
+                self._stats['overflow'] += 1
+            if not direct:
+                chat = self._chats.get(chat_id)
+                if chat is None:
+                    chat = self._chats[chat_id] = _Chat(TokenBucket(self.chat_rate, self.chat_burst, now))
+                chat.queue.append(OutgoingMessage(text, reply_markup, now, document=document))
+                self._pending += 1
+                self._stats['enqueued'] += 1
+                self._schedule(chat_id, chat, now)
+        if overflow:
+            logger.warning('Очередь исходящих сообщений переполнена, отправка в текущем потоке')
+        if direct:
+            self._send_fn(chat_id, text, reply_markup, document)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Отправка оставшихся сообщений (не дольше timeout) и остановка потоков"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        QUEUE_DEPTH.set_function(None, 'outbox')
+        with self._cond:
+            if self._pending:
+                logger.warning('Не отправлено сообщений при остановке: %s', self._pending)
+
+    def pending(self) -> int:
+        """Число сообщений, ожидающих отправки"""
+        with self._cond:
+            return self._pending
+
+    def stats(self) -> Dict:
+        """Отправленные, склеенные, повторенные и потерянные сообщения, глубина очереди"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = self._pending
+            stats['chats'] = len(self._chats)
+        return stats
+
+    def _schedule(self, chat_id: int, chat: _Chat, now: float) -> None:
+        """Постановка чата в очередь отправки или перенос на более раннее время (под self._cond)"""
+        if chat.sending or not chat.queue:
+            return
+        due = max(now + chat.bucket.delay(now), chat.not_before)
+        tail = chat.queue[-1]
+        if tail.reply_markup is None and tail.document is None and tail.attempts == 0:
+            due = max(due, tail.enqueued_at + self.linger)
+        if chat.due is not None and chat.due <= due:
+            return
+        chat.due = due
+        heapq.heappush(self._ready, (due, chat_id))
+        self._cond.notify()
+
+    def _next(self) -> Optional[Tuple[int, _Chat, OutgoingMessage]]:
+        """Ожидание чата, которому можно отправить сообщение (под self._cond)"""
+        while True:
+            now = time.monotonic()
+            if now - self._last_sweep > SWEEP_INTERVAL:
+                self._sweep(now)
+            while self._ready:
+                due, chat_id = self._ready[0]
+                chat = self._chats.get(chat_id)
+                if chat is not None and chat.due == due:
+                    break
+                heapq.heappop(self._ready)  # устаревшая запись: чат перенесен раньше
+            if not self._ready:
+                if self._stopping and not self._pending:
+                    return None
+                self._cond.wait(SWEEP_INTERVAL)
+                continue
+            wait = max(due - now, self._global.delay(now))
+            if wait > 0:
+                self._cond.wait(wait)
+                continue
+            heapq.heappop(self._ready)
+            self._global.take(now)
+            chat.bucket.take(now)
+            chat.due = None
+            chat.sending = True
+            return chat_id, chat, self._coalesce(chat)
+
+    def _coalesce(self, chat: _Chat) -> OutgoingMessage:
+        """Первое сообщение чата вместе со следующими, если у него нет клавиатуры"""
+        message = chat.queue.popleft()
+        while message.reply_markup is None and message.document is None and chat.queue:
+            following = chat.queue[0]
+            if following.document is not None:
+                break
+            text = message.text + COALESCE_SEPARATOR + following.text
+            if len(text) > MAX_MESSAGE_LENGTH:
+                break
+            chat.queue.popleft()
+            message = message._replace(
+                text=text, reply_markup=following.reply_markup, parts=message.parts + following.parts
+            )
+        return message
+
+    def _sweep(self, now: float) -> None:
+        """Удаление чатов без сообщений, ведро которых уже полное (под self._cond)"""
+        self._last_sweep = now
+        idle = [
+            chat_id for chat_id, chat in self._chats.items()
+            if not chat.queue and not chat.sending and chat.bucket.full(now)
+        ]
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+    def _retry_delay(self, exc: Exception, attempts: int) -> Optional[float]:
+        """Пауза перед повтором или None, если ошибка постоянная"""
+        if isinstance(exc, ApiTelegramException):
+            if exc.error_code == 429:
+                parameters = exc.result_json.get('parameters') or {}
+                return float(parameters.get('retry_after', 1))
+            if exc.error_code < 500:
+                return None
+        elif not isinstance(exc, requests.exceptions.RequestException):
+            return None
+        return min(30.0, self.retry_backoff * 2 ** attempts)
+
+    def _deliver(self, chat_id: int, chat: _Chat, message: OutgoingMessage) -> None:
+        error: Optional[Exception] = None
+        delay = None
+        try:
+            self._send_fn(chat_id, message.text, message.reply_markup, message.document)
+        except Exception as exc:
+            error = exc
+            delay = self._retry_delay(exc, message.attempts)
+            if delay is None or message.attempts >= self.max_retries:
+                logger.error('Сообщение в чат %s не отправлено: %s', chat_id, exc)
+                delay = None
+            else:
+                logger.warning('Ошибка отправки в чат %s, повтор через %.1f с: %s', chat_id, delay, exc)
+        now = time.monotonic()
+        with self._cond:
+            chat.sending = False
+            if delay is not None:
+                chat.queue.appendleft(message._replace(attempts=message.attempts + 1))
+                chat.not_before = now + delay
+                self._stats['retried'] += 1
+                if isinstance(error, ApiTelegramException) and error.error_code == 429:
+                    self._stats['rate_limited'] += 1
+            else:
+                self._pending -= message.parts
+                self._stats['sent' if error is None else 'dropped'] += 1
+                self._stats['coalesced'] += message.parts - 1
+            self._schedule(chat_id, chat, now)
+            if not self._pending:
+                self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                task = self._next()
+            if task is None:
+                return
+            self._deliver(*task)
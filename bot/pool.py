@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Tuple
+
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Не удалось получить соединение из пула за отведённое время"""
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений PostgreSQL с проверкой при выдаче"""
+
+    def __init__(self, min_size: int, max_size: int, connect_kwargs: Dict,
+                 checkout_timeout: float = 10.0, check_idle_after: float = 30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f'Некорректные размеры пула: min={min_size}, max={max_size}')
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.check_idle_after = check_idle_after
+        self._connect_kwargs = connect_kwargs
+        self._cond = threading.Condition()
+        # Свободные соединения: (соединение, время возврата в пул)
+        self._idle: List[Tuple[extensions.connection, float]] = []
+        self._in_use = 0
+        self._closed = False
+        self._stats = {
+            'created': 0,
+            'discarded': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+        for _ in range(min_size):
+            self._idle.append((self._new_connection(), time.monotonic()))
+
+    def _new_connection(self) -> extensions.connection:
+        """Открытие нового соединения"""
+        conn = psycopg2.connect(**self._connect_kwargs)
+        with self._cond:
+            self._stats['created'] += 1
+        return conn
+
+    def _discard(self, conn: extensions.connection) -> None:
+        """Закрытие неисправного или лишнего соединения"""
+        self._stats['discarded'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn: extensions.connection, idle_since: float) -> bool:
+        """Проверка соединения перед выдачей"""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        # Долго простаивающее соединение могло быть разорвано сервером
+        if time.monotonic() - idle_since >= self.check_idle_after:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute('SELECT 1')
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def getconn(self) -> extensions.connection:
+        """Получение соединения из пула (ожидает, если все заняты)"""
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout('Пул соединений закрыт')
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.max_size:
+                    conn, idle_since = None, 0.0
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f'Нет свободных соединений за {self.checkout_timeout} с (max={self.max_size})'
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            wait_time = time.monotonic() - started
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time_total'] += wait_time
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+
+        # Проверка и открытие соединения выполняются вне блокировки
+        try:
+            if conn is not None and not self._is_healthy(conn, idle_since):
+                logger.warning('Соединение из пула неисправно, открываем новое')
+                with self._cond:
+                    self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn: extensions.connection, discard: bool = False) -> None:
+        """Возврат соединения в пул"""
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed or conn.closed:
+                self._discard(conn)
+            elif conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                    self._idle.append((conn, time.monotonic()))
+                except psycopg2.Error:
+                    self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close(self) -> None:
+        """Закрытие всех свободных соединений; занятые закроются при возврате"""
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                self._discard(conn)
+            self._idle.clear()
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        """Статистика пула: занятые, свободные соединения и время ожидания"""
+        with self._cond:
+            checkouts = self._stats['checkouts']
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self._stats['created'],
+                'discarded': self._stats['discarded'],
+                'checkouts': checkouts,
+                'waits': self._stats['waits'],
+                'wait_time_total': round(self._stats['wait_time_total'], 6),
+                'wait_time_max': round(self._stats['wait_time_max'], 6),
+                'wait_time_avg': round(self._stats['wait_time_total'] / checkouts, 6) if checkouts else 0.0,
+            }
@@ -0,0 +1,100 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from telebot import types
+
+from metrics import HANDLER_ERRORS, HANDLER_SECONDS, HANDLERS_IN_FLIGHT
+from sessions import UserState
+
+
+class Router:
+    """Маршрутизация текстовых сообщений без перебора фильтров
+
+    Кнопки меню находятся одним поиском в словаре по тексту сообщения,
+    остальные сообщения (ответы в тренировке, ввод слова) - по режиму
+    диалога из UserState. Время обработки собирается по каждому маршруту
+    (и в гистограмму englishcard_handler_seconds, см. bot/metrics.py).
+    """
+
+    def __init__(self, get_state: Callable[[int], UserState]):
+        self._get_state = get_state
+        self._texts: Dict[str, Callable[[types.Message], None]] = {}
+        self._modes: Dict[Optional[str], Callable[[types.Message, UserState], None]] = {}
+        self._fallback: Optional[Callable[[types.Message], None]] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+
+    def text(self, text: str):
+        """Декоратор: обработчик кнопки меню с точным текстом text"""
+        def decorator(handler):
+            if text in self._texts:
+                raise ValueError(f'Маршрут для текста {text!r} уже зарегистрирован')
+            self._texts[text] = handler
+            return handler
+        return decorator
+
+    def mode(self, mode: str):
+        """Декоратор: обработчик сообщений в режиме диалога mode (получает message и state)"""
+        def decorator(handler):
+            self._modes[mode] = handler
+            return handler
+        return decorator
+
+    def fallback(self, handler):
+        """Декоратор: обработчик сообщений, для которых маршрут не найден"""
+        self._fallback = handler
+        return handler
+
+    def dispatch(self, message: types.Message) -> None:
+        """Вызов обработчика для сообщения"""
+        started = time.perf_counter()
+        handler = self._texts.get(message.text)
+        if handler is not None:
+            self._call(started, handler, message)
+            return
+
+        state = self._get_state(message.chat.id)
+        handler = self._modes.get(state.mode)
+        if handler is not None:
+            self._call(started, handler, message, state)
+            return
+
+        if self._fallback is not None:
+            self._call(started, self._fallback, message)
+
+    def _call(self, started: float, handler: Callable, *args) -> None:
+        name = handler.__name__
+        HANDLERS_IN_FLIGHT.inc()
+        try:
+            handler(*args)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLERS_IN_FLIGHT.dec()
+            self._observe(name, started)
+
+    def _observe(self, name: str, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        HANDLER_SECONDS.observe(elapsed, name)
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {'calls': 0, 'time_total': 0.0, 'time_max': 0.0}
+            stats['calls'] += 1
+            stats['time_total'] += elapsed
+            stats['time_max'] = max(stats['time_max'], elapsed)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Число вызовов, среднее и максимальное время обработки (мс) по маршрутам"""
+        with self._lock:
+            snapshot = {name: dict(stats) for name, stats in self._stats.items()}
+        return {
+            name: {
+                'calls': stats['calls'],
+                'avg_ms': round(stats['time_total'] / stats['calls'] * 1000, 3),
+                'max_ms': round(stats['time_max'] * 1000, 3),
+            }
+            for name, stats in snapshot.items()
+        }
@@ -0,0 +1,159 @@
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class DictionarySnapshot:
+    """Неизменяемый снимок общего словаря в памяти процесса"""
+    __slots__ = ('words', 'index', 'loaded_at')
+
+    def __init__(self, words: Tuple[Tuple[str, str], ...]):
+        self.words = words
+        # Позиция слова по английскому написанию в нижнем регистре
+        self.index: Dict[str, int] = {en.lower(): i for i, (en, _) in enumerate(words)}
+        self.loaded_at = time.monotonic()
+
+
+class TrainingPool:
+    """Пул слов пользователя (общие + свои) с выбором вопроса за O(1)
+
+    Общие слова не копируются: пул ссылается на снимок словаря и хранит
+    только слова пользователя. Свои слова, совпадающие с общими, заменяют
+    их на той же позиции, остальные лежат в отдельном массиве, откуда
+    удаляются перестановкой с последним элементом.
+    """
+
+    def __init__(self, shared: DictionarySnapshot, custom: Iterable[Tuple[str, str]] = ()):
+        self._lock = threading.Lock()
+        # Свои слова пользователя по ключу en.lower() в порядке добавления
+        self._custom: Dict[str, Tuple[str, str]] = {}
+        for en, ru in custom:
+            self._custom[en.lower()] = (en, ru)
+        self._rebuild(shared)
+
+    def _rebuild(self, shared: DictionarySnapshot) -> None:
+        """Раскладка своих слов относительно снимка общего словаря"""
+        self.shared = shared
+        self._overrides: Dict[int, Tuple[str, str]] = {}
+        self._extra: List[Tuple[str, str]] = []
+        self._extra_pos: Dict[str, int] = {}
+        for key, word in self._custom.items():
+            self._place(key, word)
+
+    def _place(self, key: str, word: Tuple[str, str]) -> None:
+        """Размещение своего слова: замена общего или добавление в конец"""
+        shared_pos = self.shared.index.get(key)
+        if shared_pos is not None:
+            self._overrides[shared_pos] = word
+        elif key in self._extra_pos:
+            self._extra[self._extra_pos[key]] = word
+        else:
+            self._extra_pos[key] = len(self._extra)
+            self._extra.append(word)
+
+    def rebase(self, shared: DictionarySnapshot) -> None:
+        """Переход на новый снимок общего словаря без обращения к БД"""
+        with self._lock:
+            self._rebuild(shared)
+
+    def add(self, word_en: str, word_ru: str) -> None:
+        """Добавление своего слова"""
+        key = word_en.lower()
+        with self._lock:
+            self._custom[key] = (word_en, word_ru)
+            self._place(key, (word_en, word_ru))
+
+    def remove(self, word_en: str) -> bool:
+        """Удаление своего слова; общее слово с тем же написанием остаётся"""
+        key = word_en.lower()
+        with self._lock:
+            if self._custom.pop(key, None) is None:
+                return False
+            shared_pos = self.shared.index.get(key)
+            if shared_pos is not None:
+                self._overrides.pop(shared_pos, None)
+                return True
+            pos = self._extra_pos.pop(key)
+            last = self._extra.pop()
+            if pos < len(self._extra):
+                self._extra[pos] = last
+                self._extra_pos[last[0].lower()] = pos
+            return True
+
+    def __len__(self) -> int:
+        return len(self.shared.words) + len(self._extra)
+
+    def __contains__(self, word_en: str) -> bool:
+        key = word_en.lower()
+        return key in self.shared.index or key in self._extra_pos
+
+    def _item(self, i: int) -> Tuple[str, str]:
+        """Слово по сквозному индексу: сначала общие, затем свои"""
+        shared_size = len(self.shared.words)
+        if i < shared_size:
+            return self._overrides.get(i) or self.shared.words[i]
+        return self._extra[i - shared_size]
+
+    def items(self) -> List[Tuple[str, str]]:
+        """Все слова пула (для подсчета и выгрузки)"""
+        with self._lock:
+            return [self._item(i) for i in range(len(self))]
+
+    def sample(self, k: int) -> List[Tuple[str, str]]:
+        """k различных случайных слов (пустой список, если слов меньше k)"""
+        with self._lock:
+            size = len(self)
+            if size < k:
+                return []
+            return [self._item(i) for i in random.sample(range(size), k)]
+
+    def get(self, word_en: str) -> Optional[Tuple[str, str]]:
+        """Слово пула по английскому написанию (без учета регистра)"""
+        key = word_en.lower()
+        with self._lock:
+            shared_pos = self.shared.index.get(key)
+            if shared_pos is not None:
+                return self._item(shared_pos)
+            extra_pos = self._extra_pos.get(key)
+            return self._extra[extra_pos] if extra_pos is not None else None
+
+    def pick_question(self) -> Optional[Tuple[str, str, List[str]]]:
+        """Вопрос и 3 различных неправильных варианта за O(1)"""
+        picked = self.sample(4)
+        if not picked:
+            return None
+        question_en, question_ru = picked[0]
+        options = [en for en, _ in picked]
+        random.shuffle(options)
+        return question_ru, question_en, options
+
+    def question(self, word_en: str, preferred: Iterable[str] = ()) -> Optional[Tuple[str, str, List[str]]]:
+        """Вопрос по заданному слову и 3 неправильных варианта за O(1)
+
+        Варианты из preferred, которые есть в пуле, идут первыми, остальные
+        выбираются случайно.
+        """
+        word = self.get(word_en)
+        if word is None:
+            return None
+        question_en, question_ru = word
+        key = question_en.lower()
+        wrong: List[str] = []
+        used = {key}
+        for candidate in preferred:
+            found = self.get(candidate)
+            if found is not None and found[0].lower() not in used:
+                wrong.append(found[0])
+                used.add(found[0].lower())
+        for en, _ in self.sample(4 + len(wrong)):
+            if len(wrong) >= 3:
+                break
+            if en.lower() not in used:
+                wrong.append(en)
+                used.add(en.lower())
+        if len(wrong) < 3:
+            return None
+        options = wrong + [question_en]
+        random.shuffle(options)
+        return question_ru, question_en, options
@@ -0,0 +1,116 @@
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import db
+from cache import LRUCache
+
+# Режимы диалога; в хранилище записывается номер режима в этом кортеже
+MODES = (None, 'quiz', 'add', 'delete')
+
+
+@dataclass
+class UserState:
+    """Состояние пользователя для управления диалогом"""
+    mode: Optional[str] = None  # 'quiz' | 'add' | 'delete'
+    pending_correct_en: Optional[str] = None
+
+    def pack(self) -> Tuple[int, Optional[str]]:
+        """Компактное представление для хранилища"""
+        return MODES.index(self.mode), self.pending_correct_en
+
+    @classmethod
+    def unpack(cls, packed: Optional[Tuple[int, Optional[str]]]) -> 'UserState':
+        """Восстановление из компактного представления"""
+        if packed is None:
+            return cls()
+        mode, pending = packed
+        return cls(MODES[mode] if 0 <= mode < len(MODES) else None, pending)
+
+    def is_empty(self) -> bool:
+        return self.mode is None and self.pending_correct_en is None
+
+
+class SessionStore(ABC):
+    """Хранилище состояний диалога по chat_id
+
+    get() возвращает копию состояния: после изменения её нужно сохранить
+    через save(), иначе изменения не увидят другие экземпляры бота.
+    """
+
+    @abstractmethod
+    def get(self, chat_id: int) -> UserState:
+        ...
+
+    @abstractmethod
+    def save(self, chat_id: int, state: UserState) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, chat_id: int) -> None:
+        ...
+
+    def stats(self) -> Dict:
+        return {}
+
+
+class MemorySessionStore(SessionStore):
+    """Состояния в памяти процесса: LRU с ограничением размера и TTL"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self._cache = LRUCache(max_size, ttl=ttl)
+
+    def get(self, chat_id: int) -> UserState:
+        return UserState.unpack(self._cache.get(chat_id))
+
+    def save(self, chat_id: int, state: UserState) -> None:
+        if state.is_empty():
+            self._cache.pop(chat_id)
+        else:
+            self._cache.put(chat_id, state.pack())
+
+    def delete(self, chat_id: int) -> None:
+        self._cache.pop(chat_id)
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+
+class PostgresSessionStore(SessionStore):
+    """Состояния в UNLOGGED-таблице user_sessions, общей для всех экземпляров бота"""
+
+    # Как часто (в сохранениях) удалять просроченные сессии
+    PURGE_EVERY = 1000
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._saves = 0
+        self._lock = threading.Lock()
+
+    def get(self, chat_id: int) -> UserState:
+        return UserState.unpack(db.load_session(chat_id, self.ttl))
+
+    def save(self, chat_id: int, state: UserState) -> None:
+        if state.is_empty():
+            db.delete_session(chat_id)
+        else:
+            mode, pending = state.pack()
+            db.save_session(chat_id, mode, pending)
+        with self._lock:
+            self._saves += 1
+            purge = self._saves % self.PURGE_EVERY == 0
+        if purge:
+            db.purge_sessions(self.ttl)
+
+    def delete(self, chat_id: int) -> None:
+        db.delete_session(chat_id)
+
+
+def create_session_store(kind: str, max_size: int, ttl: float) -> SessionStore:
+    """Создание хранилища по значению SESSION_STORE из config.txt"""
+    if kind == 'memory':
+        return MemorySessionStore(max_size, ttl)
+    if kind == 'postgres':
+        return PostgresSessionStore(ttl)
+    raise ValueError(f'SESSION_STORE должен быть memory или postgres, указано: {kind}')
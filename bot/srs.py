@@ -0,0 +1,153 @@
+import heapq
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from difficulty import WordDifficulty
+from sampling import TrainingPool
+
+# Параметры SM-2 для двух оценок: "верно" и "неверно"
+EASE_START = 2.5
+EASE_MIN = 1.3
+EASE_PENALTY = 0.2
+FIRST_INTERVAL = 24 * 3600       # после первого правильного ответа
+SECOND_INTERVAL = 6 * 24 * 3600  # после второго
+LAPSE_DELAY = 10 * 60            # слово с ошибкой повторяется через 10 минут
+MAX_INTERVAL = 365 * 24 * 3600   # не реже раза в год (и interval_seconds помещается в INTEGER)
+
+# Сколько раз пытаться найти новое (еще не изученное) слово случайной выборкой
+NEW_WORD_TRIES = 8
+# Из скольких новых слов выбирать самое сложное (при выборе по сложности)
+HARD_WORD_CANDIDATES = 4
+# Сколько неправильных вариантов брать из частых путаниц
+CONFUSABLE_DISTRACTORS = 2
+
+
+class ReviewState(NamedTuple):
+    """Состояние повторения слова пользователем (строка word_reviews)"""
+    repetitions: int  # правильные ответы подряд
+    ease: float
+    interval: float   # текущий интервал, секунды
+    lapses: int       # сколько раз слово было забыто
+    next_due: float   # время следующего повторения, unix time
+
+
+def review(state: Optional[ReviewState], correct: bool, now: float) -> ReviewState:
+    """Новое состояние слова после ответа (SM-2 с оценками 4 и 1)"""
+    if state is None:
+        state = ReviewState(0, EASE_START, 0.0, 0, now)
+    if not correct:
+        # Повторные ошибки подряд не снижают легкость еще раз
+        ease = max(EASE_MIN, state.ease - EASE_PENALTY) if state.repetitions else state.ease
+        return ReviewState(0, ease, 0.0, state.lapses + 1, now + LAPSE_DELAY)
+    repetitions = state.repetitions + 1
+    if repetitions == 1:
+        interval = FIRST_INTERVAL
+    elif repetitions == 2:
+        interval = SECOND_INTERVAL
+    else:
+        interval = min(state.interval * state.ease, MAX_INTERVAL)
+    return ReviewState(repetitions, state.ease, interval, state.lapses, now + interval)
+
+
+class ReviewQueue:
+    """Очередь повторения слов одного пользователя: куча по времени next_due
+
+    Слово, которое пора повторить, выбирается за O(log n). Устаревшие записи
+    кучи (после нового ответа или удаления слова) отбрасываются при выборе.
+    Если повторять нечего, берется новое слово из пула, а если новых нет -
+    слово с ближайшим временем повторения.
+    """
+
+    def __init__(self, states: Iterable[Tuple[str, ReviewState]] = ()):
+        self._lock = threading.Lock()
+        self._states: Dict[str, ReviewState] = dict(states)
+        self._heap: List[Tuple[float, str]] = [(s.next_due, key) for key, s in self._states.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def get(self, word_en: str) -> Optional[ReviewState]:
+        return self._states.get(word_en.lower())
+
+    def review(self, word_en: str, correct: bool, now: Optional[float] = None) -> Tuple[str, ReviewState]:
+        """Учет ответа; возвращает ключ слова и его новое состояние для записи в БД"""
+        key = word_en.lower()
+        now = time.time() if now is None else now
+        with self._lock:
+            state = review(self._states.get(key), correct, now)
+            self._states[key] = state
+            heapq.heappush(self._heap, (state.next_due, key))
+            if len(self._heap) > 2 * len(self._states) + 16:
+                self._compact()
+        return key, state
+
+    def _compact(self) -> None:
+        """Пересборка кучи без устаревших записей"""
+        self._heap = [(s.next_due, key) for key, s in self._states.items()]
+        heapq.heapify(self._heap)
+
+    def _top(self, pool: TrainingPool) -> Optional[Tuple[float, str]]:
+        """Актуальная запись с наименьшим next_due (слова, которых нет в пуле, забываются)"""
+        while self._heap:
+            due, key = self._heap[0]
+            state = self._states.get(key)
+            if state is not None and state.next_due == due:
+                if key in pool:
+                    return due, key
+                del self._states[key]
+            heapq.heappop(self._heap)
+        return None
+
+    def next_word(self, pool: TrainingPool, now: Optional[float] = None,
+                  difficulty: Optional[WordDifficulty] = None) -> Optional[str]:
+        """Ключ слова для следующего вопроса
+
+        С difficulty из нескольких случайных новых слов выбирается самое сложное.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            top = self._top(pool)
+            if top is not None and top[0] <= now:
+                return top[1]
+            # Когда изучены все слова пула, искать новые бесполезно
+            tries = NEW_WORD_TRIES if len(self._states) < len(pool) else 0
+            wanted = HARD_WORD_CANDIDATES if difficulty is not None else 1
+            candidates: List[str] = []
+            for _ in range(tries):
+                sampled = pool.sample(1)
+                if not sampled:
+                    return None
+                key = sampled[0][0].lower()
+                if key not in self._states and key not in candidates:
+                    candidates.append(key)
+                    if len(candidates) >= wanted:
+                        break
+            if candidates:
+                if difficulty is None:
+                    return candidates[0]
+                return max(candidates, key=difficulty.error_rate)
+            if top is not None:
+                return top[1]
+        sampled = pool.sample(1)
+        return sampled[0][0].lower() if sampled else None
+
+
+def pick_question(pool: TrainingPool, queue: ReviewQueue, now: Optional[float] = None,
+                  difficulty: Optional[WordDifficulty] = None, prefer_hard: bool = False,
+                  confusable: bool = False) -> Optional[Tuple[str, str, List[str]]]:
+    """Вопрос по очереди повторения и 3 неправильных варианта
+
+    prefer_hard - из новых слов предлагать более сложные, confusable - брать
+    часть неправильных вариантов из слов, с которыми вопрос чаще путают.
+    """
+    key = queue.next_word(pool, now, difficulty if prefer_hard else None)
+    if key is None:
+        return None
+    preferred = difficulty.confusable(key)[:CONFUSABLE_DISTRACTORS] if confusable and difficulty else ()
+    picked = pool.question(key, preferred)
+    if picked is None:
+        return pool.pick_question()
+    return picked
+
@@ -7,11 +7,22 @@ import os
 import sys
 import time
 import signal
+import hashlib
+import tempfile
 import subprocess
 import requests
 import psutil
 import logging
-from typing import List, Optional
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Callable, Dict, IO, List, Optional
+
+import telebot
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка pid-файла недоступна
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
@@ -198,21 +209,33 @@ def print_postgresql_help():
     print(help_text)
 
 
-def safe_startup_check(token: str, db_url: str) -> bool:
-    """Комплексная проверка перед запуском бота"""
+def safe_startup_check(token: str, db_url: str, clear_telegram: bool = True, stop_running: bool = True) -> bool:
+    """Комплексная проверка перед запуском бота
+
+    stop_running=False - не останавливать другие экземпляры (при выборе
+    лидера они нужны как резервные).
+    """
     logger.info("🚀 Начинаем безопасный запуск бота...")
     
     # 1. Остановка существующих процессов
-    logger.info("1️⃣ Проверяем и останавливаем существующие процессы...")
-    if not kill_bot_processes(token):
-        logger.error("Не удалось остановить существующие процессы")
-        return False
+    if stop_running:
+        logger.info("1️⃣ Проверяем и останавливаем существующие процессы...")
+        if not kill_bot_processes(token):
+            logger.error("Не удалось остановить существующие процессы")
+            return False
+    else:
+        logger.info("1️⃣ Выбор лидера: другие экземпляры бота не останавливаем")
     
-    # 2. Очистка Telegram соединений
-    logger.info("2️⃣ Очищаем соединения с Telegram API...")
-    if not clear_telegram_connections(token):
-        logger.error("Не удалось очистить соединения с Telegram API")
-        return False
+    # 2. Очистка Telegram соединений (для long polling webhook должен быть удален)
+    if clear_telegram:
+        logger.info("2️⃣ Очищаем соединения с Telegram API...")
+        if not clear_telegram_connections(token):
+            logger.error("Не удалось очистить соединения с Telegram API")
+            return False
+    elif not stop_running:
+        logger.info("2️⃣ Выбор лидера: соединения с Telegram API не очищаем (обновления продолжит получать лидер)")
+    else:
+        logger.info("2️⃣ Режим webhook: соединения с Telegram API не очищаем")
     
     # 3. Проверка PostgreSQL
     logger.info("3️⃣ Проверяем подключение к PostgreSQL...")
@@ -225,6 +248,150 @@ def safe_startup_check(token: str, db_url: str) -> bool:
     return True
 
 
+# Открытый pid-файл держит блокировку, пока жив процесс
+_pidfile: Optional[IO] = None
+
+
+def default_pidfile(token: str) -> str:
+    """pid-файл во временном каталоге: один на токен, общий для всех каталогов установки"""
+    digest = hashlib.sha256(token.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f'englishcard-bot-{digest}.pid')
+
+
+def _read_pid(f: IO) -> Optional[int]:
+    f.seek(0)
+    try:
+        return int(f.read().strip() or 0) or None
+    except ValueError:
+        return None
+
+
+def acquire_pidfile(path: str, timeout: float) -> bool:
+    """Захват pid-файла (flock) вместо поиска процессов бота по таблице процессов
+
+    Если файл заблокирован предыдущим экземпляром, ему отправляется SIGTERM
+    и блокировка ожидается не дольше timeout секунд.
+    """
+    global _pidfile
+    if fcntl is None:
+        logger.warning("Блокировка pid-файла недоступна на этой платформе, проверка пропущена")
+        return True
+    f = open(path, 'a+')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        pid = _read_pid(f)
+        logger.info(f"Бот уже запущен (pid {pid}), отправляем SIGTERM")
+        if pid:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                logger.warning(f"Нет прав для завершения процесса {pid}")
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    logger.error(f"Предыдущий экземпляр (pid {pid}) не завершился за {timeout:.0f} с")
+                    f.close()
+                    return False
+                time.sleep(0.05)
+    f.seek(0)
+    f.truncate()
+    f.write(str(os.getpid()))
+    f.flush()
+    _pidfile = f
+    return True
+
+
+def delete_webhook(token: str) -> bool:
+    """Удаление webhook и накопившихся обновлений одним запросом (вместо серии getUpdates)"""
+    try:
+        telebot.apihelper.delete_webhook(token, drop_pending_updates=True, timeout=5)
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка удаления webhook: {e}")
+        return False
+
+
+def _timed(phase: Callable[[], bool]) -> Callable[[], tuple]:
+    def run():
+        started = time.perf_counter()
+        try:
+            ok = phase()
+        except Exception as e:
+            logger.error(f"❌ {e}")
+            ok = False
+        return ok, time.perf_counter() - started
+    return run
+
+
+def _start_daemon(name: str, func: Callable[[], tuple]) -> Future:
+    """Запуск проверки в потоке-демоне: зависшая проверка не задерживает выход из процесса"""
+    future: Future = Future()
+
+    def run():
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=f'startup-{name}', daemon=True).start()
+    return future
+
+
+def fast_startup_check(token: str, warm_up: Callable[[], None], clear_telegram: bool = True,
+                       pidfile: Optional[str] = None, timeout: float = 10.0,
+                       stop_running: bool = True) -> Dict[str, float]:
+    """Быстрая проверка перед запуском: pid-файл, затем Telegram и БД параллельно
+
+    warm_up открывает пул соединений и загружает кэши (заодно проверяя
+    PostgreSQL). С stop_running=False pid-файл не захватывается и работающий
+    экземпляр не останавливается: при выборе лидера единственность
+    получения обновлений обеспечивает advisory-блокировка, а второй
+    экземпляр на том же хосте должен ждать в резерве. Возвращает время
+    каждой фазы в секундах; при ошибке бросает RuntimeError.
+    """
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+
+    if stop_running:
+        lock_started = time.perf_counter()
+        if not acquire_pidfile(pidfile or default_pidfile(token), timeout):
+            raise RuntimeError("Не удалось захватить pid-файл: предыдущий экземпляр бота не завершился")
+        timings['pidfile'] = time.perf_counter() - lock_started
+
+    def database() -> bool:
+        warm_up()
+        return True
+
+    phases: Dict[str, Callable[[], bool]] = {'database': database}
+    if clear_telegram:
+        phases['telegram'] = lambda: delete_webhook(token)
+    futures = {name: _start_daemon(name, _timed(phase)) for name, phase in phases.items()}
+    deadline = time.monotonic() + timeout
+    failed = []
+    for name, future in futures.items():
+        try:
+            ok, timings[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            logger.error(f"❌ Проверка {name} не завершилась за {timeout:.0f} с")
+            ok, timings[name] = False, timeout
+        if not ok:
+            failed.append(name)
+    timings['total'] = time.perf_counter() - started
+    logger.info("Проверки запуска: %s", ', '.join(f'{name} {sec * 1000:.0f} мс' for name, sec in timings.items()))
+    if 'database' in failed:
+        print_postgresql_help()
+    if failed:
+        raise RuntimeError(f"Не прошли проверки запуска: {', '.join(failed)}")
+    return timings
+
+
 if __name__ == "__main__":
     # Тестирование утилит
     import sys
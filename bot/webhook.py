@@ -0,0 +1,184 @@
+import json
+import logging
+import queue
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import telebot
+from telebot import types
+
+from metrics import QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором Telegram передает secret_token из setWebhook
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def _chat_key(update: dict) -> int:
+    """Ключ распределения по обработчикам: chat_id, а при его отсутствии update_id"""
+    for kind in ('message', 'edited_message', 'callback_query'):
+        body = update.get(kind)
+        if body:
+            chat = body.get('chat') or (body.get('message') or {}).get('chat') or {}
+            if 'id' in chat:
+                return chat['id']
+            if 'from' in body:
+                return body['from']['id']
+    return update.get('update_id', 0)
+
+
+class WebhookServer:
+    """Встроенный HTTP-сервер для webhook: очередь с ограничением и пул обработчиков
+
+    HTTP-потоки только разбирают JSON и кладут обновление в очередь своего
+    обработчика (по chat_id, чтобы сообщения одного чата шли по порядку).
+    Если очередь заполнена, сервер отвечает 429 с Retry-After, и Telegram
+    повторит доставку позже.
+    """
+
+    def __init__(self, bot: telebot.TeleBot, host: str = '0.0.0.0', port: int = 8443,
+                 path: str = '/webhook', secret_token: Optional[str] = None,
+                 workers: int = 8, queue_size: int = 1000):
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token or None
+        self.workers = workers
+        per_worker = max(1, queue_size // workers)
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=per_worker) for _ in range(workers)]
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._stats = {
+            'received': 0,
+            'rejected': 0,
+            'processed': 0,
+            'errors': 0,
+            'processing_time_total': 0.0,
+        }
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    def start(self) -> 'WebhookServer':
+        """Запуск обработчиков и HTTP-сервера в фоновых потоках"""
+        # Обработчики сами выполняют задачи; собственный пул потоков TeleBot не нужен
+        self.bot.threaded = False
+        for i, q in enumerate(self._queues):
+            thread = threading.Thread(target=self._work, args=(q,), name=f'webhook-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._server.serve_forever, name='webhook-http', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        QUEUE_DEPTH.set_function(lambda: sum(q.qsize() for q in self._queues), 'webhook')
+        host, port = self.address
+        logger.info('Webhook-сервер слушает %s:%s%s (обработчиков: %s)', host, port, self.path, self.workers)
+        return self
+
+    def serve_forever(self) -> None:
+        """Блокирующий запуск до Ctrl+C"""
+        self.start()
+        try:
+            while True:
+                time.sleep(3600)
+        finally:
+            self.stop()
+
+    def stop(self, drain: bool = True) -> None:
+        """Остановка приема и (по умолчанию) обработка уже принятых обновлений"""
+        self._server.shutdown()
+        self._server.server_close()
+        QUEUE_DEPTH.set_function(None, 'webhook')
+        for q in self._queues:
+            q.put(None)
+        if drain:
+            for thread in self._threads:
+                thread.join()
+
+    def submit(self, update: dict) -> bool:
+        """Постановка обновления в очередь; False, если очередь заполнена"""
+        q = self._queues[hash(_chat_key(update)) % self.workers]
+        try:
+            q.put_nowait(update)
+        except queue.Full:
+            with self._lock:
+                self._stats['rejected'] += 1
+            return False
+        with self._lock:
+            self._stats['received'] += 1
+        return True
+
+    def _work(self, q: queue.Queue) -> None:
+        while True:
+            update = q.get()
+            if update is None:
+                return
+            started = time.perf_counter()
+            try:
+                self.bot.process_new_updates([types.Update.de_json(update)])
+                ok = True
+            except Exception:
+                logger.exception('Ошибка обработки обновления %s', update.get('update_id'))
+                ok = False
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._stats['processed' if ok else 'errors'] += 1
+                self._stats['processing_time_total'] += elapsed
+
+    def stats(self) -> Dict:
+        """Принятые, отклоненные и обработанные обновления, глубина очередей"""
+        with self._lock:
+            stats = dict(self._stats)
+        done = stats['processed'] + stats['errors']
+        total_time = stats.pop('processing_time_total')
+        stats['avg_processing_ms'] = round(total_time / done * 1000, 3) if done else 0.0
+        stats['queue_depth'] = sum(q.qsize() for q in self._queues)
+        return stats
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                # Без Nagle ответ не ждет delayed ACK клиента на keep-alive соединении
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def _reply(self, status: int, headers: Optional[Dict[str, str]] = None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length)
+                if self.path != server.path:
+                    self._reply(404)
+                    return
+                if server.secret_token and self.headers.get(SECRET_HEADER) != server.secret_token:
+                    self._reply(403)
+                    return
+                try:
+                    update = json.loads(body)
+                except ValueError:
+                    self._reply(400)
+                    return
+                if server.submit(update):
+                    self._reply(200)
+                else:
+                    self._reply(429, {'Retry-After': '1'})
+
+        return Handler
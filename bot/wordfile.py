@@ -0,0 +1,131 @@
+import csv
+import io
+import itertools
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Ограничения на строку импорта
+MAX_WORD_LENGTH = 100
+# Первая строка с такими названиями колонок считается заголовком
+HEADER_NAMES = {'en', 'english', 'word', 'word_en', 'английское', 'слово'}
+# Сколько ошибок разбора запоминать для ответа пользователю
+MAX_REPORTED_ERRORS = 5
+
+
+class ImportResult(NamedTuple):
+    """Итог импорта слов (ошибочные строки считает WordFileParser)"""
+    added: int
+    duplicates: int           # уже были в пуле или повторяются в файле
+    truncated: bool           # файл длиннее лимита слов
+
+
+def _delimiter(line: str) -> str:
+    """Разделитель колонок по первой непустой строке: табуляция, ';' или ','"""
+    for candidate in ('\t', ';', ','):
+        if candidate in line:
+            return candidate
+    return '\t'
+
+
+def _check(en: str, ru: str) -> Optional[str]:
+    """Причина, по которой строка не подходит, или None"""
+    if not en or not ru:
+        return 'пустое слово или перевод'
+    if len(en) > MAX_WORD_LENGTH or len(ru) > MAX_WORD_LENGTH:
+        return f'длиннее {MAX_WORD_LENGTH} символов'
+    if not all(c.isprintable() for c in en + ru):
+        return 'недопустимые символы'
+    return None
+
+
+class WordFileParser:
+    """Потоковый разбор CSV/TSV: строки читаются по одной, файл целиком не хранится
+
+    Каждая строка - английское слово и перевод; лишние пустые колонки
+    допускаются. Слова приводятся к нижнему регистру, как при добавлении
+    по одному. Ошибочные строки пропускаются и учитываются в invalid.
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+        self.invalid = 0
+        self.errors: List[Tuple[int, str]] = []
+
+    def _error(self, line_no: int, reason: str) -> None:
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, reason))
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        skipped = 0
+        first = next(self._lines, None)
+        while first is not None and not first.strip():
+            skipped += 1
+            first = next(self._lines, None)
+        if first is None:
+            return
+        reader = csv.reader(itertools.chain([first], self._lines), delimiter=_delimiter(first))
+        for row in reader:
+            line_no = skipped + reader.line_num
+            cells = [cell.strip() for cell in row]
+            while cells and not cells[-1]:
+                cells.pop()
+            if not cells:
+                continue
+            if reader.line_num == 1 and cells[0].lower() in HEADER_NAMES:
+                continue
+            if len(cells) != 2:
+                self._error(line_no, 'нужно две колонки: слово и перевод')
+                continue
+            en, ru = cells[0].lower(), cells[1].lower()
+            reason = _check(en, ru)
+            if reason:
+                self._error(line_no, reason)
+                continue
+            yield en, ru
+
+
+def read_lines(data: bytes) -> Iterator[str]:
+    """Строки загруженного файла (UTF-8, в том числе с BOM)"""
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8-sig', newline='')
+
+
+class CopySource:
+    """Файлоподобный источник для COPY ... FROM STDIN из итератора строк CSV
+
+    Строки формируются по мере чтения, поэтому COPY идет параллельно
+    с разбором файла. Исключение итератора psycopg2 превращает в ошибку
+    COPY; исходное исключение сохраняется в error.
+    """
+
+    def __init__(self, rows: Iterable[Tuple]):
+        self._rows = iter(rows)
+        self.error: Optional[Exception] = None
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._pending = ''
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._pending) < size:
+            try:
+                chunk = self._fill(max(size, 8192))
+            except Exception as exc:
+                self.error = exc
+                raise
+            if not chunk:
+                break
+            self._pending += chunk
+        if size < 0:
+            data, self._pending = self._pending, ''
+        else:
+            data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def _fill(self, size: int) -> str:
+        """Следующие строки CSV общей длиной не меньше size (пустая строка - конец)"""
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        for row in self._rows:
+            self._writer.writerow(row)
+            if self._buffer.tell() >= size:
+                break
+        return self._buffer.getvalue()
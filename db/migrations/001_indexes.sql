@@ -0,0 +1,25 @@
+-- Secondary indexes for the queries in bot/db.py.
+-- Safe to re-run: every index is created with IF NOT EXISTS.
+
+-- get_user_custom_words: active custom words of one user ordered by id
+CREATE INDEX IF NOT EXISTS user_words_custom_active_idx
+    ON user_words (user_id, id)
+    WHERE source = 'custom' AND is_active = TRUE;
+
+-- delete_user_word: lookup by LOWER(word_en) among active custom words
+CREATE INDEX IF NOT EXISTS user_words_custom_lower_en_idx
+    ON user_words (user_id, LOWER(word_en))
+    WHERE source = 'custom' AND is_active = TRUE;
+
+-- ON DELETE CASCADE from dictionary for references to global words
+CREATE INDEX IF NOT EXISTS user_words_dictionary_id_idx
+    ON user_words (dictionary_id)
+    WHERE dictionary_id IS NOT NULL;
+
+-- Attempt history of a user over time; also serves ON DELETE CASCADE from users
+CREATE INDEX IF NOT EXISTS quiz_attempts_user_time_idx
+    ON quiz_attempts (user_id, attempted_at);
+
+-- purge_sessions: removal of expired sessions
+CREATE INDEX IF NOT EXISTS user_sessions_updated_at_idx
+    ON user_sessions (updated_at);
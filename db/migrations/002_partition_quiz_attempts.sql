@@ -0,0 +1,102 @@
+-- Monthly range partitions for quiz_attempts and daily rollups of old attempts.
+-- Safe to re-run: an existing unpartitioned quiz_attempts is converted once,
+-- everything else is created with IF NOT EXISTS / CREATE OR REPLACE.
+
+-- Catch-all partition: inserts never fail, even if a month was not created in time
+CREATE OR REPLACE FUNCTION quiz_attempts_create_default() RETURNS void AS $$
+BEGIN
+    IF to_regclass('quiz_attempts_default') IS NULL THEN
+        CREATE TABLE quiz_attempts_default PARTITION OF quiz_attempts DEFAULT;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partition quiz_attempts_pYYYYMM for the month containing month_start (UTC).
+-- Rows of that month already stored in the default partition are moved into it.
+CREATE OR REPLACE FUNCTION quiz_attempts_create_partition(month_start DATE) RETURNS TEXT AS $$
+DECLARE
+    first_day   DATE := date_trunc('month', month_start)::date;
+    lower_bound TIMESTAMPTZ := first_day::timestamp AT TIME ZONE 'UTC';
+    upper_bound TIMESTAMPTZ := (first_day + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC';
+    part        TEXT := 'quiz_attempts_p' || to_char(first_day, 'YYYYMM');
+BEGIN
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN part;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE quiz_attempts INCLUDING DEFAULTS)', part);
+    IF to_regclass('quiz_attempts_default') IS NOT NULL THEN
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM quiz_attempts_default
+                            WHERE attempted_at >= %L AND attempted_at < %L RETURNING *)
+             INSERT INTO %I SELECT * FROM moved',
+            lower_bound, upper_bound, part);
+    END IF;
+    EXECUTE format('ALTER TABLE quiz_attempts ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   part, lower_bound, upper_bound);
+    RETURN part;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partitions from the current month up to months_ahead months in the future
+CREATE OR REPLACE FUNCTION quiz_attempts_ensure_partitions(months_ahead INTEGER) RETURNS SETOF TEXT AS $$
+    SELECT quiz_attempts_create_partition((date_trunc('month', NOW() AT TIME ZONE 'UTC') + m * INTERVAL '1 month')::date)
+    FROM generate_series(0, months_ahead) AS m;
+$$ LANGUAGE sql;
+
+-- Conversion of a database created before partitioning: the old table is
+-- renamed, its rows are copied month by month, then it is dropped.
+DO $$
+DECLARE
+    oldest TIMESTAMPTZ;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'quiz_attempts'::regclass) <> 'r' THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE quiz_attempts RENAME TO quiz_attempts_legacy;
+    ALTER INDEX quiz_attempts_pkey RENAME TO quiz_attempts_legacy_pkey;
+    ALTER SEQUENCE quiz_attempts_id_seq RENAME TO quiz_attempts_legacy_id_seq;
+    DROP INDEX IF EXISTS quiz_attempts_user_time_idx;
+
+    CREATE TABLE quiz_attempts (
+        id           BIGSERIAL,
+        user_id      INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        word_en      TEXT NOT NULL,
+        was_correct  BOOLEAN NOT NULL,
+        attempted_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (id, attempted_at)
+    ) PARTITION BY RANGE (attempted_at);
+
+    SELECT MIN(attempted_at) INTO oldest FROM quiz_attempts_legacy;
+    IF oldest IS NOT NULL THEN
+        PERFORM quiz_attempts_create_partition(m::date)
+        FROM generate_series(date_trunc('month', oldest AT TIME ZONE 'UTC'),
+                             date_trunc('month', NOW() AT TIME ZONE 'UTC'),
+                             INTERVAL '1 month') AS m;
+    END IF;
+    PERFORM quiz_attempts_create_default();
+
+    INSERT INTO quiz_attempts (id, user_id, word_en, was_correct, attempted_at)
+    SELECT id, user_id, word_en, was_correct, attempted_at FROM quiz_attempts_legacy;
+    PERFORM setval('quiz_attempts_id_seq', COALESCE((SELECT MAX(id) FROM quiz_attempts_legacy), 0) + 1, false);
+
+    DROP TABLE quiz_attempts_legacy;
+END;
+$$;
+
+SELECT quiz_attempts_create_default();
+SELECT quiz_attempts_ensure_partitions(3);
+
+-- Recreated here for databases converted above (001 created it on the old table)
+CREATE INDEX IF NOT EXISTS quiz_attempts_user_time_idx
+    ON quiz_attempts (user_id, attempted_at);
+
+-- Per-user, per-word daily aggregates of attempts whose raw partitions were dropped
+CREATE TABLE IF NOT EXISTS quiz_attempts_daily (
+    user_id    INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    day        DATE NOT NULL,
+    word_en    TEXT NOT NULL,
+    attempts   INTEGER NOT NULL,
+    correct    INTEGER NOT NULL,
+    PRIMARY KEY (user_id, day, word_en)
+);
@@ -0,0 +1,16 @@
+-- Spaced repetition state (bot/srs.py): one row per user and word.
+-- word_en is stored lower-cased, the same key as in the bot's training pool.
+CREATE TABLE IF NOT EXISTS word_reviews (
+    user_id           INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    word_en           TEXT NOT NULL,
+    repetitions       INTEGER NOT NULL DEFAULT 0,
+    ease              REAL NOT NULL DEFAULT 2.5,
+    interval_seconds  INTEGER NOT NULL DEFAULT 0,
+    lapses            INTEGER NOT NULL DEFAULT 0,
+    next_due          TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (user_id, word_en)
+);
+
+-- Review queue of a user ordered by due time (loading the queue, counting due words)
+CREATE INDEX IF NOT EXISTS word_reviews_user_due_idx
+    ON word_reviews (user_id, next_due);
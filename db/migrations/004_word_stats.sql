@@ -0,0 +1,32 @@
+-- Per-word difficulty and confusion statistics, maintained incrementally by the bot
+-- on every recorded attempt and rebuilt in bulk by scripts/refresh_word_stats.py.
+-- All word keys are lower-cased, the same keys as in the bot's training pool.
+
+-- Wrong answer the user picked (lower-cased; NULL for correct answers and free text)
+ALTER TABLE quiz_attempts ADD COLUMN IF NOT EXISTS answer_en TEXT;
+
+-- Attempts and errors per word over all users
+CREATE TABLE IF NOT EXISTS word_stats (
+    word_en     TEXT PRIMARY KEY,
+    attempts    BIGINT NOT NULL DEFAULT 0,
+    errors      BIGINT NOT NULL DEFAULT 0,
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Attempts and errors per user and word
+CREATE TABLE IF NOT EXISTS user_word_stats (
+    user_id          INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    word_en          TEXT NOT NULL,
+    attempts         INTEGER NOT NULL DEFAULT 0,
+    errors           INTEGER NOT NULL DEFAULT 0,
+    last_attempt_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, word_en)
+);
+
+-- How often answer_en was picked instead of word_en
+CREATE TABLE IF NOT EXISTS word_confusions (
+    word_en    TEXT NOT NULL,
+    answer_en  TEXT NOT NULL,
+    picks      BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (word_en, answer_en)
+);
@@ -0,0 +1,4 @@
+-- Case-insensitive lookup of dictionary words: db.count_user_words checks
+-- each custom word of a user against the dictionary by LOWER(word_en).
+CREATE INDEX IF NOT EXISTS dictionary_lower_en_idx
+    ON dictionary (LOWER(word_en));
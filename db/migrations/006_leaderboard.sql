@@ -0,0 +1,20 @@
+-- Friends for the friends leaderboard (/addfriend): one-directional list
+-- of users whose results a user wants to compare with.
+CREATE TABLE IF NOT EXISTS user_friends (
+    user_id     INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    friend_id   INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, friend_id),
+    CHECK (user_id <> friend_id)
+);
+
+-- /addfriend looks a user up by Telegram username, case-insensitively.
+CREATE INDEX IF NOT EXISTS users_lower_username_idx
+    ON users (LOWER(username));
+
+-- Leaderboard rebuild (db.get_leaderboard) reads the scores of users who
+-- have answered at least once; the covering partial index lets it skip
+-- users without attempts and avoid reading the table itself.
+CREATE INDEX IF NOT EXISTS user_statistics_leaderboard_idx
+    ON user_statistics (user_id) INCLUDE (correct_attempts, best_streak, current_streak)
+    WHERE total_attempts > 0;
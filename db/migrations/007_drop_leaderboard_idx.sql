@@ -0,0 +1,6 @@
+-- The covering index from 006_leaderboard.sql includes correct_attempts,
+-- best_streak and current_streak, which every quiz attempt updates: with it
+-- no user_statistics update could be HOT. The leaderboard rebuild reads the
+-- table only every LEADERBOARD_REFRESH seconds, so a sequential scan there
+-- is cheaper than an extra index write on each attempt.
+DROP INDEX IF EXISTS user_statistics_leaderboard_idx;
@@ -29,14 +29,17 @@ CREATE TABLE IF NOT EXISTS user_words (
                 (source = 'global' AND dictionary_id IS NOT NULL) )
 );
 
--- Quiz attempts for basic analytics
+-- Quiz attempts for basic analytics.
+-- Range-partitioned by month of attempted_at (partitions: db/migrations/002_partition_quiz_attempts.sql,
+-- scripts/manage_partitions.py); old months are rolled up into quiz_attempts_daily and dropped.
 CREATE TABLE IF NOT EXISTS quiz_attempts (
-    id           SERIAL PRIMARY KEY,
+    id           BIGSERIAL,
     user_id      INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     word_en      TEXT NOT NULL,
     was_correct  BOOLEAN NOT NULL,
-    attempted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-);
+    attempted_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, attempted_at)
+) PARTITION BY RANGE (attempted_at);
 
 -- User statistics for tracking progress
 CREATE TABLE IF NOT EXISTS user_statistics (
@@ -49,4 +52,26 @@ CREATE TABLE IF NOT EXISTS user_statistics (
     best_streak           INTEGER NOT NULL DEFAULT 0,
     last_activity         TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     UNIQUE(user_id)
-); 
\ No newline at end of file
+);
+
+-- Dialog state of bot users (quiz / add / delete), shared by all bot instances.
+-- UNLOGGED: cheap writes, contents may be lost after a server crash.
+CREATE UNLOGGED TABLE IF NOT EXISTS user_sessions (
+    chat_id      BIGINT PRIMARY KEY,
+    mode         SMALLINT NOT NULL DEFAULT 0,
+    pending_en   TEXT,
+    updated_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Notify running bots that the global dictionary changed (cache invalidation)
+CREATE OR REPLACE FUNCTION notify_dictionary_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('dictionary_changed', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS dictionary_changed ON dictionary;
+CREATE TRIGGER dictionary_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON dictionary
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_dictionary_changed();
@@ -1,217 +0,0 @@
--- Цвета (Colors)
-INSERT INTO dictionary (word_en, word_ru) VALUES
-    ('red', 'красный'),
-    ('blue', 'синий'),
-    ('green', 'зеленый'),
-    ('yellow', 'желтый'),
-    ('black', 'черный'),
-    ('white', 'белый'),
-    ('orange', 'оранжевый'),
-    ('purple', 'фиолетовый'),
-    ('pink', 'розовый'),
-    ('brown', 'коричневый'),
-    ('gray', 'серый'),
-    ('gold', 'золотой'),
-    ('silver', 'серебряный');
-
--- Местоимения (Pronouns)
-INSERT INTO dictionary (word_en, word_ru) VALUES
-    ('I', 'я'),
-    ('you', 'ты'),
-    ('we', 'мы'),
-    ('they', 'они'),
-    ('he', 'он'),
-    ('she', 'она'),
-    ('it', 'оно'),
-    ('me', 'меня'),
-    ('him', 'его'),
-    ('her', 'ее'),
-    ('us', 'нас'),
-    ('them', 'их');
-
--- Числа (Numbers)
-INSERT INTO dictionary (word_en, word_ru) VALUES
-    ('one', 'один'),
-    ('two', 'два'),
-    ('three', 'три'),
-    ('four', 'четыре'),
-    ('five', 'пять'),
-    ('six', 'шесть'),
-    ('seven', 'семь'),
-    ('eight', 'восемь'),
-    ('nine', 'девять'),
-    ('ten', 'десять'),
-    ('hundred', 'сто'),
-    ('thousand', 'тысяча');
-
--- Животные (Animals)
-INSERT INTO dictionary (word_en, word_ru) VALUES
-    ('cat', 'кот'),
-    ('dog', 'собака'),
-    ('bird', 'птица'),
-    ('horse', 'лошадь'),
-    ('cow', 'корова'),
-    ('pig', 'свинья'),
-    ('sheep', 'овца'),
-    ('chicken', 'курица'),
-    ('duck', 'утка'),
-    ('rabbit', 'кролик'),
-    ('mouse', 'мышь'),
-    ('elephant', 'слон'),
-    ('tiger', 'тигр'),
-    ('lion', 'лев'),
-    ('bear', 'медведь'),
-    ('wolf', 'волк'),
-    ('fox', 'лиса');
-
--- Еда (Food)
-INSERT INTO dictionary (word_en, word_ru) VALUES
-    ('bread', 'хлеб'),
-    ('milk', 'молоко'),
-    ('egg', 'яйцо'),
-    ('meat', 'мясо'),
-    ('apple', 'яблоко'),
-    ('banana', 'банан'),
-    ('tomato', 'помидор'),
-    ('potato', 'картофель'),
-    ('carrot', 'морковь'),
-    ('onion', 'лук'),
-    ('cheese', 'сыр'),
-    ('butter', 'масло'),
-    ('sugar', 'сахар'),
-    ('salt', 'соль'),
-    ('water', 'вода'),
-    ('tea', 'чай'),
-    ('coffee', 'кофе'),
-    ('juice', 'сок');
-
--- Семья (Family)
-INSERT INTO dictionary (word_en, word_ru) VALUES
-    ('mother', 'мама'),
-    ('father', 'папа'),
-    ('sister', 'сестра'),
-    ('brother', 'брат'),
-    ('grandmother', 'бабушка'),
-    ('grandfather', 'дедушка'),
-    ('aunt', 'тетя'),
-    ('uncle', 'дядя'),
-    ('cousin', 'двоюродный брат/сестра'),
-    ('son', 'сын'),
-    ('daughter', 'дочь'),
-    ('wife', 'жена'),
-    ('husband', 'муж'),
-    ('baby', 'ребенок');
-
--- Дом (House)
-INSERT INTO dictionary (word_en, word_ru) VALUES
-    ('house', 'дом'),
-    ('room', 'комната'),
-    ('kitchen', 'кухня'),
-    ('bedroom', 'спальня'),
-    ('bathroom', 'ванная'),
-    ('door', 'дверь'),
-    ('window', 'окно'),
-    ('wall', 'стена'),
-    ('floor', 'пол'),
-    ('ceiling', 'потолок'),
-    ('table', 'стол'),
-    ('chair', 'стул'),
-    ('bed', 'кровать'),
-    ('sofa', 'диван'),
-    ('lamp', 'лампа'),
-    ('mirror', 'зеркало'),
-    ('clock', 'часы'),
-    ('picture', 'картина');
-
--- Одежда (Clothes)
-INSERT INTO dictionary (word_en, word_ru) VALUES
-    ('shirt', 'рубашка'),
-    ('pants', 'брюки'),
-    ('dress', 'платье'),
-    ('skirt', 'юбка'),
-    ('shoes', 'обувь'),
-    ('socks', 'носки'),
-    ('hat', 'шляпа'),
-    ('coat', 'пальто'),
-    ('jacket', 'куртка'),
-    ('scarf', 'шарф'),
-    ('gloves', 'перчатки'),
-    ('bag', 'сумка'),
-    ('watch', 'часы'),
-    ('ring', 'кольцо'),
-    ('necklace', 'ожерелье');
-
--- Транспорт (Transport)
-INSERT INTO dictionary (word_en, word_ru) VALUES
-    ('car', 'машина'),
-    ('bus', 'автобус'),
-    ('train', 'поезд'),
-    ('plane', 'самолет'),
-    ('bike', 'велосипед'),
-    ('boat', 'лодка'),
-    ('ship', 'корабль'),
-    ('taxi', 'такси'),
-    ('truck', 'грузовик'),
-    ('motorcycle', 'мотоцикл');
-
--- Природа (Nature)
-INSERT INTO dictionary (word_en, word_ru) VALUES
-    ('sun', 'солнце'),
-    ('moon', 'луна'),
-    ('star', 'звезда'),
-    ('sky', 'небо'),
-    ('cloud', 'облако'),
-    ('rain', 'дождь'),
-    ('snow', 'снег'),
-    ('wind', 'ветер'),
-    ('tree', 'дерево'),
-    ('flower', 'цветок'),
-    ('grass', 'трава'),
-    ('mountain', 'гора'),
-    ('river', 'река'),
-    ('lake', 'озеро'),
-    ('sea', 'море'),
-    ('forest', 'лес'),
-    ('field', 'поле'),
-    ('garden', 'сад');
-
--- Время (Time)
-INSERT INTO dictionary (word_en, word_ru) VALUES
-    ('morning', 'утро'),
-    ('afternoon', 'день'),
-    ('evening', 'вечер'),
-    ('night', 'ночь'),
-    ('today', 'сегодня'),
-    ('yesterday', 'вчера'),
-    ('tomorrow', 'завтра'),
-    ('week', 'неделя'),
-    ('month', 'месяц'),
-    ('year', 'год'),
-    ('hour', 'час'),
-    ('minute', 'минута'),
-    ('second', 'секунда');
-
--- Дни недели (Days of the week)
-INSERT INTO dictionary (word_en, word_ru) VALUES
-    ('monday', 'понедельник'),
-    ('tuesday', 'вторник'),
-    ('wednesday', 'среда'),
-    ('thursday', 'четверг'),
-    ('friday', 'пятница'),
-    ('saturday', 'суббота'),
-    ('sunday', 'воскресенье');
-
--- Месяцы (Months)
-INSERT INTO dictionary (word_en, word_ru) VALUES
-    ('january', 'январь'),
-    ('february', 'февраль'),
-    ('march', 'март'),
-    ('april', 'апрель'),
-    ('may', 'май'),
-    ('june', 'июнь'),
-    ('july', 'июль'),
-    ('august', 'август'),
-    ('september', 'сентябрь'),
-    ('october', 'октябрь'),
-    ('november', 'ноябрь'),
-    ('december', 'декабрь'); 
\ No newline at end of file
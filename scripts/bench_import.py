@@ -0,0 +1,69 @@
+"""
+Бенчмарк импорта слов: файл CSV разбирается потоково и загружается через
+COPY (db.import_user_words) против добавления по одному слову
+(db.add_user_word, как при вводе "cat - кот"). Слова пишутся синтетическому
+пользователю, который удаляется после замера.
+
+Нужен config.txt и инициализированная база (python scripts/init_db.py).
+
+Запуск:
+    python scripts/bench_import.py --words 10000
+"""
+
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / 'bot'))
+
+import db  # noqa: E402
+from wordfile import WordFileParser, read_lines  # noqa: E402
+
+BENCH_TELEGRAM_ID = -9_000_001
+
+
+def make_file(count: int, prefix: str) -> bytes:
+    """CSV с заголовком и count уникальными словами"""
+    lines = ['en;ru'] + [f'{prefix}{i};перевод {prefix}{i}' for i in range(count)]
+    return '\n'.join(lines).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк импорта слов через COPY')
+    parser.add_argument('--words', type=int, default=10000, help='слов в файле импорта')
+    parser.add_argument('--single', type=int, default=500, help='слов для добавления по одному')
+    args = parser.parse_args()
+
+    user_id = db.ensure_user(BENCH_TELEGRAM_ID, 'bench_import', 'Bench')
+    try:
+        data = make_file(args.words, 'benchimport')
+        started = time.perf_counter()
+        words = WordFileParser(read_lines(data))
+        result = db.import_user_words(user_id, words, args.words)
+        copy_time = time.perf_counter() - started
+        print(f'COPY:      {result.added} слов за {copy_time:.3f} с '
+              f'({copy_time / max(result.added, 1) * 1e6:.0f} мкс/слово, дубликатов: {result.duplicates})')
+
+        started = time.perf_counter()
+        for i in range(args.single):
+            db.add_user_word(user_id, f'benchsingle{i}', f'перевод {i}')
+        single_time = time.perf_counter() - started
+        per_word = single_time / max(args.single, 1)
+        print(f'по одному: {args.single} слов за {single_time:.3f} с ({per_word * 1e6:.0f} мкс/слово, '
+              f'{args.words} слов - около {per_word * args.words:.1f} с)')
+
+        out = io.BytesIO()
+        started = time.perf_counter()
+        exported = db.export_user_words(user_id, out)
+        print(f'экспорт:   {exported} слов за {time.perf_counter() - started:.3f} с, {out.tell() // 1024} КБ')
+    finally:
+        with db._connect() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
+        db.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Бенчмарк клавиатур: сборка ReplyKeyboardMarkup и json.dumps на каждое
+сообщение (прежний bot/keyboards.py) против готовых клавиатур и шаблона
+вариантов ответа. Измеряется то, что происходит при отправке: вызов
+функции клавиатуры и to_json(), как в telebot.apihelper._convert_markup.
+
+Запуск:
+    python scripts/bench_keyboards.py --messages 100000
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List
+
+from telebot import types
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / 'bot'))
+
+import keyboards  # noqa: E402
+
+OPTIONS = ['house', 'дом "большой"', 'cat', 'window']
+
+
+def legacy_main_menu() -> types.ReplyKeyboardMarkup:
+    """Прежний main_menu()"""
+    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    kb.row(types.KeyboardButton('Начать тренировку'))
+    kb.row(types.KeyboardButton('Добавить слово ➕'), types.KeyboardButton('Удалить слово 🔙'))
+    kb.row(types.KeyboardButton('📊 Статистика'), types.KeyboardButton('🏠 Главное меню'))
+    return kb
+
+
+def legacy_options_keyboard(options: List[str]) -> types.ReplyKeyboardMarkup:
+    """Прежний options_keyboard()"""
+    kb = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=False)
+    rows = [options[i:i+2] for i in range(0, len(options), 2)]
+    for row in rows:
+        kb.row(*[types.KeyboardButton(text=o) for o in row])
+    kb.row(types.KeyboardButton('⏹ Остановить игру'), types.KeyboardButton('📊 Статистика'))
+    kb.row(types.KeyboardButton('🏠 Главное меню'))
+    return kb
+
+
+def measure_time(fn: Callable[[], str], iterations: int) -> float:
+    """Среднее время одного сообщения в микросекундах"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def measure_allocations(fn: Callable[[], str], iterations: int) -> float:
+    """Средний пик выделенной памяти за одно сообщение в байтах (по tracemalloc)"""
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(iterations):
+            start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn()
+            total += tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+    return total / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк сборки и сериализации клавиатур')
+    parser.add_argument('--messages', type=int, default=100000, help='сообщений на замер времени')
+    parser.add_argument('--alloc-messages', type=int, default=2000, help='сообщений на замер памяти')
+    args = parser.parse_args()
+
+    cases = [
+        ('main_menu', lambda: legacy_main_menu().to_json(), lambda: keyboards.main_menu().to_json()),
+        ('options_keyboard', lambda: legacy_options_keyboard(OPTIONS).to_json(),
+         lambda: keyboards.options_keyboard(OPTIONS).to_json()),
+    ]
+    print(f"{'клавиатура':>18} | {'было, мкс':>10} | {'стало, мкс':>10} | {'было, байт':>11} | {'стало, байт':>11}")
+    print('-' * 73)
+    for name, legacy, prebuilt in cases:
+        assert legacy() == prebuilt(), name
+        print(f'{name:>18} | {measure_time(legacy, args.messages):>10.2f} | '
+              f'{measure_time(prebuilt, args.messages):>10.2f} | '
+              f'{measure_allocations(legacy, args.alloc_messages):>11.0f} | '
+              f'{measure_allocations(prebuilt, args.alloc_messages):>11.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Бенчмарк маршрутизации: цепочка фильтров telebot (func=lambda m: m.text == ...)
+против Router из bot/router.py. Обработчики пустые, измеряется только выбор
+обработчика для ответа в тренировке - сообщения, которое не совпадает ни с одной
+кнопкой меню. Нужен config.txt (bot/router.py импортирует bot/sessions.py).
+
+Запуск:
+    python scripts/bench_router.py --routes 12,50,200
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / 'bot'))
+
+import telebot  # noqa: E402
+from telebot import types  # noqa: E402
+
+from router import Router  # noqa: E402
+from sessions import UserState  # noqa: E402
+
+
+def make_message(text: str) -> types.Message:
+    return types.Message.de_json({
+        'message_id': 1,
+        'date': 0,
+        'chat': {'id': 1, 'type': 'private'},
+        'from': {'id': 1, 'is_bot': False, 'first_name': 'Learner'},
+        'text': text,
+    })
+
+
+def chain_bot(routes: int) -> telebot.TeleBot:
+    """Бот с routes обработчиками-фильтрами и общим обработчиком текста в конце"""
+    bot = telebot.TeleBot('1:bench', threaded=False)
+    for i in range(routes):
+        bot.message_handler(func=lambda m, text=f'button {i}': m.text == text)(lambda m: None)
+    bot.message_handler(content_types=['text'])(lambda m: None)
+    return bot
+
+
+def router_bot(routes: int) -> telebot.TeleBot:
+    """Бот с одним обработчиком текста, который вызывает Router"""
+    state = UserState(mode='quiz', pending_correct_en='cat')
+    router = Router(lambda chat_id: state)
+    for i in range(routes):
+        router.text(f'button {i}')(lambda m: None)
+    router.mode('quiz')(lambda m, s: None)
+    bot = telebot.TeleBot('1:bench', threaded=False)
+    bot.message_handler(content_types=['text'])(router.dispatch)
+    return bot
+
+
+def measure(bot: telebot.TeleBot, message: types.Message, iterations: int) -> float:
+    """Среднее время обработки одного сообщения в микросекундах"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        bot.process_new_messages([message])
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк маршрутизации сообщений')
+    parser.add_argument('--routes', default='12,50,200,1000', help='число кнопок меню через запятую')
+    parser.add_argument('--messages', type=int, default=20000, help='сообщений на замер')
+    args = parser.parse_args()
+
+    answer = make_message('cat')
+    print(f"{'кнопок':>8} | {'цепочка фильтров, мкс':>22} | {'Router, мкс':>12}")
+    print('-' * 50)
+    for routes in (int(r) for r in args.routes.split(',') if r.strip()):
+        chain = measure(chain_bot(routes), answer, args.messages)
+        routed = measure(router_bot(routes), answer, args.messages)
+        print(f'{routes:>8} | {chain:>22.2f} | {routed:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
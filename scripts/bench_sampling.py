@@ -0,0 +1,109 @@
+"""
+Бенчмарк выбора вопроса: прежний алгоритм (пересборка пула на каждый вопрос)
+против TrainingPool из bot/sampling.py и выбора по очереди повторения
+из bot/srs.py (с ответом на каждый вопрос). База данных не нужна.
+
+Запуск:
+    python scripts/bench_sampling.py
+    python scripts/bench_sampling.py --sizes 200,10000,1000000 --questions 20000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / 'bot'))
+
+from sampling import DictionarySnapshot, TrainingPool  # noqa: E402
+from srs import ReviewQueue, ReviewState, pick_question  # noqa: E402
+
+# Доля своих слов пользователя в пуле
+CUSTOM_SHARE = 0.05
+# Доля слов, которые пользователь уже изучал (есть в очереди повторения)
+REVIEWED_SHARE = 0.1
+
+
+def make_words(count: int, prefix: str) -> List[Tuple[str, str]]:
+    """Синтетические пары слов"""
+    return [(f'{prefix}{i}', f'перевод{prefix}{i}') for i in range(count)]
+
+
+def legacy_pick(dictionary: List[Tuple[str, str]], custom: List[Tuple[str, str]]):
+    """Прежний алгоритм из db.pick_question_with_options"""
+    pool = dictionary + custom
+    dedup = {}
+    for en, ru in pool:
+        dedup[en.lower()] = (en, ru)
+    pool = list(dedup.values())
+    question_en, question_ru = random.choice(pool)
+    wrong = [en for en, _ in pool if en != question_en]
+    options = random.sample(wrong, 3) + [question_en]
+    random.shuffle(options)
+    return question_ru, question_en, options
+
+
+def measure(fn, iterations: int) -> float:
+    """Среднее время одного вызова в микросекундах"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк выбора вопроса для тренировки')
+    parser.add_argument('--sizes', default='200,1000,10000,100000,1000000',
+                        help='размеры пула через запятую')
+    parser.add_argument('--questions', type=int, default=50000,
+                        help='число вопросов на размер для TrainingPool')
+    parser.add_argument('--legacy-budget', type=float, default=2.0,
+                        help='примерный бюджет времени в секундах на прежний алгоритм для каждого размера')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    print(f"{'слов':>10} | {'прежний, мкс':>14} | {'TrainingPool, мкс':>18} | {'add+remove, мкс':>16} | "
+          f"{'SRS, мкс':>9}")
+    print('-' * 80)
+
+    for size in sizes:
+        custom_count = max(1, int(size * CUSTOM_SHARE))
+        dictionary = make_words(size - custom_count, 'w')
+        custom = make_words(custom_count, 'c')
+
+        pool = TrainingPool(DictionarySnapshot(tuple(dictionary)), custom)
+        assert len(pool) == size
+        fast = measure(pool.pick_question, args.questions)
+
+        def add_remove():
+            pool.add('benchword', 'слово')
+            pool.remove('benchword')
+
+        update = measure(add_remove, args.questions)
+
+        # Половина изученных слов уже ждет повторения, остальные - в будущем
+        now = time.time()
+        queue = ReviewQueue(
+            (en.lower(), ReviewState(2, 2.5, 86400.0, 0, now + random.uniform(-86400, 86400)))
+            for en, _ in random.sample(dictionary, int(len(dictionary) * REVIEWED_SHARE))
+        )
+
+        def srs_step():
+            _, question_en, _ = pick_question(pool, queue)
+            queue.review(question_en, random.random() < 0.8)
+
+        srs = measure(srs_step, args.questions)
+
+        # Прежний алгоритм линеен по размеру пула, поэтому число повторов подбираем по бюджету
+        single = measure(lambda: legacy_pick(dictionary, custom), 1)
+        legacy_iterations = max(1, min(1000, int(args.legacy_budget / (single / 1e6))))
+        legacy = measure(lambda: legacy_pick(dictionary, custom), legacy_iterations)
+
+        print(f'{size:>10} | {legacy:>14.1f} | {fast:>18.2f} | {update:>16.2f} | {srs:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
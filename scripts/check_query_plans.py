@@ -0,0 +1,240 @@
+"""
+Проверка планов запросов бота: ни один запрос из bot/db.py не должен
+читать большие таблицы последовательным сканированием (Seq Scan).
+
+Скрипт в одной транзакции заполняет базу синтетическими данными,
+выполняет ANALYZE и EXPLAIN для каждого запроса, после чего откатывает
+транзакцию - данные в базе не меняются. Код выхода 1, если найден Seq Scan.
+SQL берется из констант bot/db.py, поэтому проверяются те же запросы,
+что выполняет бот; параметры подставляются из синтетических данных.
+
+Запуск (после python scripts/init_db.py):
+    python scripts/check_query_plans.py --users 20000
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Set, Tuple
+
+from init_db import get_db_conn
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'bot'))
+
+import db  # noqa: E402
+
+# Таблицы, которые растут вместе с числом пользователей и ответов.
+# dictionary читается целиком намеренно (кэш словаря) и не проверяется.
+LARGE_TABLES = ('users', 'user_words', 'quiz_attempts', 'user_statistics', 'user_sessions', 'word_reviews',
+                'user_word_stats', 'user_friends')
+
+# Запросы, которые читают большую таблицу целиком намеренно: перестроение
+# рейтинга раз в LEADERBOARD_REFRESH секунд. Индекс для него замедлил бы
+# каждую попытку (UPDATE user_statistics перестал бы быть HOT).
+FULL_READS = {'_rebuild_leaderboard'}
+
+NOW = datetime.now(timezone.utc)
+
+
+def values_row(sql: str) -> str:
+    """Шаблон execute_values (VALUES %s) с одной строкой из параметра row"""
+    return sql.replace('%s', '%(row)s')
+
+
+# Имя функции в bot/db.py -> (SQL из bot/db.py, параметры по синтетическим user_id и chat_id)
+QUERIES: Dict[str, Tuple[str, Callable[[Dict], Dict]]] = {
+    'ensure_user (users)': (
+        db._ENSURE_USER_SQL,
+        lambda v: {'telegram_id': -1, 'username': 'user1', 'first_name': 'Learner'},
+    ),
+    'ensure_user (user_statistics)': (db._ENSURE_STATISTICS_SQL, lambda v: v),
+    'get_user_custom_words': (db._CUSTOM_WORDS_SQL, lambda v: v),
+    'count_user_words': (db._COUNT_USER_WORDS_SQL, lambda v: v),
+    'delete_user_word': (db._DELETE_USER_WORD_SQL, lambda v: {**v, 'word_en': 'w5'}),
+    '_write_attempts (user_statistics)': (
+        values_row(db._STATISTICS_BATCH_SQL),
+        lambda v: {'row': (v['user_id'], 3, 2, 1, 1, 2, 2, True, NOW)},
+    ),
+    'answer_and_next (attempt + statistics + words)': (
+        db._ATTEMPT_WITH_WORDS_SQL,
+        lambda v: {
+            **v, 'word_en': 'w1', 'key': 'w1', 'correct': False, 'answer_en': 'w2',
+            'review': (v['user_id'], 'w1', 1, 2.5, 86400, 0, NOW),
+        },
+    ),
+    '_get_review_queue': (db._REVIEW_QUEUE_SQL, lambda v: v),
+    'get_user_hard_words': (db._HARD_WORDS_SQL, lambda v: {**v, 'limit': 3}),
+    '_load_word_difficulty (confusions)': (db._WORD_CONFUSIONS_SQL, lambda v: {'limit': db.CONFUSIONS_PER_WORD}),
+    'get_user_statistics': (db._USER_STATISTICS_SQL, lambda v: v),
+    'load_session': (db._LOAD_SESSION_SQL, lambda v: {**v, 'ttl': 86400}),
+    'delete_session': (db._DELETE_SESSION_SQL, lambda v: v),
+    'purge_sessions': (db._PURGE_SESSIONS_SQL, lambda v: {'ttl': 86400}),
+    '_rebuild_leaderboard': (db._LEADERBOARD_SQL, lambda v: {}),
+    '_user_names': (db._USER_NAMES_SQL, lambda v: {'ids': [v['user_id']]}),
+    'add_friend': (db._ADD_FRIEND_SQL, lambda v: {**v, 'username': 'user2'}),
+    'get_friends_leaderboard': (db._FRIENDS_SQL, lambda v: v),
+    # Не из bot/db.py: история попыток по индексу (user_id, attempted_at) из 001_indexes.sql
+    'attempt history (quiz_attempts)': (
+        """
+        SELECT word_en, was_correct, attempted_at
+        FROM quiz_attempts
+        WHERE user_id = %(user_id)s AND attempted_at > NOW() - INTERVAL '7 days'
+        ORDER BY attempted_at DESC
+        LIMIT 50
+        """,
+        lambda v: v,
+    ),
+}
+
+
+def fill_synthetic_data(cur, users: int, words_per_user: int, attempts_per_user: int) -> Dict[str, int]:
+    """Синтетические данные (telegram_id < 0, чтобы не пересекаться с настоящими)"""
+    cur.execute(
+        """
+        INSERT INTO users (telegram_id, username, first_name)
+        SELECT -g, 'user' || g, 'Learner'
+        FROM generate_series(1, %s) AS g
+        ON CONFLICT (telegram_id) DO NOTHING
+        """,
+        (users,),
+    )
+    cur.execute("CREATE TEMP TABLE synthetic_users ON COMMIT DROP AS SELECT id FROM users WHERE telegram_id < 0")
+    # Попытки есть у каждого десятого пользователя - только они попадают в рейтинг
+    cur.execute(
+        """
+        INSERT INTO user_statistics (user_id, total_attempts, correct_attempts, best_streak)
+        SELECT id, CASE WHEN id % 10 = 0 THEN 20 ELSE 0 END, CASE WHEN id % 10 = 0 THEN id % 17 ELSE 0 END,
+               CASE WHEN id % 10 = 0 THEN id % 7 ELSE 0 END
+        FROM synthetic_users
+        ON CONFLICT (user_id) DO NOTHING
+        """
+    )
+    cur.execute(
+        """
+        INSERT INTO user_friends (user_id, friend_id)
+        SELECT a.id, b.id
+        FROM synthetic_users AS a
+        JOIN synthetic_users AS b ON b.id BETWEEN a.id + 1 AND a.id + 5
+        ON CONFLICT DO NOTHING
+        """
+    )
+    cur.execute(
+        """
+        INSERT INTO user_words (user_id, source, word_en, word_ru, is_active)
+        SELECT u.id, 'custom', 'w' || g, 'слово' || g, g %% 10 <> 0
+        FROM synthetic_users AS u, generate_series(1, %s) AS g
+        """,
+        (words_per_user,),
+    )
+    cur.execute(
+        """
+        INSERT INTO quiz_attempts (user_id, word_en, was_correct, attempted_at)
+        SELECT u.id, 'w' || (g %% 50), g %% 3 <> 0, NOW() - g * INTERVAL '1 hour'
+        FROM synthetic_users AS u, generate_series(1, %s) AS g
+        """,
+        (attempts_per_user,),
+    )
+    cur.execute(
+        """
+        INSERT INTO word_reviews (user_id, word_en, repetitions, ease, interval_seconds, lapses, next_due)
+        SELECT u.id, 'w' || g, 1, 2.5, 86400, 0, NOW() + (g - %s / 2) * INTERVAL '1 hour'
+        FROM synthetic_users AS u, generate_series(1, %s) AS g
+        ON CONFLICT (user_id, word_en) DO NOTHING
+        """,
+        (words_per_user, words_per_user),
+    )
+    cur.execute(
+        """
+        INSERT INTO user_word_stats (user_id, word_en, attempts, errors)
+        SELECT u.id, 'w' || g, 10, g %% 4
+        FROM synthetic_users AS u, generate_series(1, %s) AS g
+        ON CONFLICT (user_id, word_en) DO NOTHING
+        """,
+        (words_per_user,),
+    )
+    cur.execute(
+        """
+        INSERT INTO user_sessions (chat_id, mode, pending_en, updated_at)
+        SELECT -g, 1, 'w1', NOW() - (g %% 1500) * INTERVAL '1 minute'
+        FROM generate_series(1, %s) AS g
+        ON CONFLICT (chat_id) DO NOTHING
+        """,
+        (users,),
+    )
+    for table in LARGE_TABLES:
+        cur.execute(f"ANALYZE {table}")
+    cur.execute("SELECT id FROM users WHERE telegram_id = -1")
+    return {'user_id': cur.fetchone()[0], 'chat_id': -1}
+
+
+def plan_nodes(node: dict) -> Iterator[dict]:
+    """Обход дерева плана"""
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def empty_relations(cur) -> Set[str]:
+    """Пустые после ANALYZE таблицы (например, партиции будущих месяцев): их Seq Scan ничего не стоит"""
+    cur.execute("SELECT relname FROM pg_class WHERE relkind = 'r' AND reltuples = 0")
+    return {name for (name,) in cur.fetchall()}
+
+
+def seq_scans(plan: dict, ignore: Set[str] = frozenset()) -> List[str]:
+    """Большие таблицы (и их партиции), прочитанные последовательным сканированием"""
+    found = []
+    for node in plan_nodes(plan['Plan']):
+        relation = node.get('Relation Name', '')
+        if relation in ignore:
+            continue
+        if node['Node Type'] == 'Seq Scan' and any(
+                relation == t or relation.startswith(t + '_') for t in LARGE_TABLES):
+            found.append(relation)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Проверка отсутствия Seq Scan в запросах бота')
+    parser.add_argument('--users', type=int, default=20000, help='синтетических пользователей')
+    parser.add_argument('--words', type=int, default=10, help='своих слов на пользователя')
+    parser.add_argument('--attempts', type=int, default=25, help='попыток на пользователя')
+    parser.add_argument('--verbose', action='store_true', help='печатать планы целиком')
+    args = parser.parse_args()
+
+    conn = get_db_conn()
+    failures = 0
+    try:
+        with conn.cursor() as cur:
+            print(f'Синтетические данные: {args.users} пользователей...')
+            values = fill_synthetic_data(cur, args.users, args.words, args.attempts)
+            empty = empty_relations(cur)
+            for name, (query, params) in QUERIES.items():
+                cur.execute('EXPLAIN (FORMAT JSON) ' + query, params(values))
+                plan = cur.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                plan = plan[0]
+                scans = seq_scans(plan, empty)
+                if name in FULL_READS:
+                    status = 'OK (полное чтение)' if scans else 'OK'
+                    scans = []
+                else:
+                    status = 'OK' if not scans else 'SEQ SCAN: ' + ', '.join(sorted(set(scans)))
+                print(f'  {name:<40} {status}')
+                if args.verbose:
+                    print(json.dumps(plan['Plan'], indent=2, ensure_ascii=False))
+                failures += bool(scans)
+    finally:
+        conn.rollback()
+        conn.close()
+
+    if failures:
+        print(f'Найдено запросов с Seq Scan: {failures}', file=sys.stderr)
+        sys.exit(1)
+    print('Все запросы используют индексы.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Локальная замена Telegram Bot API для нагрузочных тестов.
+
+Поддерживает методы, которые использует бот: getMe, deleteWebhook,
+getUpdates (long polling), sendMessage. Обновления подкладываются через
+push_message(), отправленные ботом сообщения передаются в on_send.
+С chat_rate_limit сервер, как Telegram, отвечает 429 с retry_after на
+sendMessage, если в чат за последнюю секунду уже отправлено столько сообщений.
+Боту нужно указать адрес сервера:
+    telebot.apihelper.API_URL = server.api_url
+    telebot.asyncio_helper.API_URL = server.api_url
+"""
+
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qsl, urlparse
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'EnglishCard', 'username': 'englishcard_test_bot'}
+
+
+class TooManyRequests(Exception):
+    """Ответ 429 с параметром retry_after"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class FakeTelegram:
+    """HTTP-сервер с минимальной реализацией Bot API"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, send_latency: float = 0.0,
+                 on_send: Optional[Callable[[int, str, Optional[dict]], None]] = None,
+                 chat_rate_limit: int = 0):
+        self.send_latency = send_latency
+        self.on_send = on_send
+        self.chat_rate_limit = chat_rate_limit
+        self._chat_sends: Dict[int, List[float]] = {}
+        self.rate_limited = 0
+        self._updates: List[dict] = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._cond = threading.Condition()
+        self.requests: Dict[str, int] = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def api_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/bot{{0}}/{{1}}'
+
+    def start(self) -> 'FakeTelegram':
+        """Запуск сервера в фоновом потоке"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-telegram', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Остановка сервера"""
+        with self._cond:
+            self._cond.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def push_update(self, update: dict) -> int:
+        """Добавление произвольного обновления; возвращает update_id"""
+        with self._cond:
+            update = dict(update, update_id=self._next_update_id)
+            self._next_update_id += 1
+            self._updates.append(update)
+            self._cond.notify_all()
+            return update['update_id']
+
+    def make_message(self, user_id: int, text: Optional[str] = None, first_name: str = 'Learner', **extra) -> dict:
+        """Сообщение пользователя в личном чате (chat.id == user.id)"""
+        with self._cond:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'first_name': first_name},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': first_name, 'username': f'user{user_id}'},
+        }
+        if text is not None:
+            message['text'] = text
+            if text.startswith('/'):
+                command = text.split()[0]
+                message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        message.update(extra)
+        return message
+
+    def push_message(self, user_id: int, text: str, first_name: str = 'Learner') -> int:
+        """Текстовое сообщение от пользователя"""
+        return self.push_update({'message': self.make_message(user_id, text, first_name)})
+
+    def pending_updates(self) -> int:
+        """Число обновлений, еще не подтвержденных ботом"""
+        with self._cond:
+            return len(self._updates)
+
+    def _get_updates(self, params: dict) -> List[dict]:
+        offset = int(params.get('offset', 0) or 0)
+        limit = int(params.get('limit', 100) or 100)
+        timeout = float(params.get('timeout', 0) or 0)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if offset < 0:
+                    # Отрицательный offset: оставить только последние |offset| обновлений
+                    self._updates = self._updates[offset:]
+                elif offset:
+                    self._updates = [u for u in self._updates if u['update_id'] >= offset]
+                if self._updates or time.monotonic() >= deadline:
+                    return self._updates[:limit]
+                self._cond.wait(deadline - time.monotonic())
+
+    def _send_message(self, params: dict) -> dict:
+        if self.send_latency:
+            time.sleep(self.send_latency)
+        chat_id = int(params['chat_id'])
+        if self.chat_rate_limit:
+            self._check_rate(chat_id)
+        text = params.get('text', '')
+        markup = params.get('reply_markup')
+        markup = json.loads(markup) if isinstance(markup, str) and markup else markup
+        with self._cond:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        if self.on_send:
+            self.on_send(chat_id, text, markup)
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': text,
+        }
+
+    def _check_rate(self, chat_id: int) -> None:
+        now = time.monotonic()
+        with self._cond:
+            recent = [t for t in self._chat_sends.get(chat_id, ()) if now - t < 1.0]
+            if len(recent) >= self.chat_rate_limit:
+                self.rate_limited += 1
+                raise TooManyRequests(1)
+            recent.append(now)
+            self._chat_sends[chat_id] = recent
+
+    def _call(self, method: str, params: dict):
+        with self._cond:
+            self.requests[method] = self.requests.get(method, 0) + 1
+        if method == 'getUpdates':
+            return self._get_updates(params)
+        if method == 'sendMessage':
+            return self._send_message(params)
+        if method == 'getMe':
+            return BOT_USER
+        if method in ('deleteWebhook', 'setWebhook', 'close', 'logOut'):
+            return True
+        raise KeyError(method)
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                # Без Nagle ответ не ждет delayed ACK клиента на keep-alive соединении
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def _params(self) -> dict:
+                parsed = urlparse(self.path)
+                params = dict(parse_qsl(parsed.query))
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    body = self.rfile.read(length).decode('utf-8')
+                    if 'json' in (self.headers.get('Content-Type') or ''):
+                        params.update(json.loads(body))
+                    else:
+                        params.update(parse_qsl(body))
+                return params
+
+            def _handle(self):
+                method = urlparse(self.path).path.rsplit('/', 1)[-1]
+                try:
+                    payload = {'ok': True, 'result': fake._call(method, self._params())}
+                    status = 200
+                except KeyError:
+                    payload = {'ok': False, 'error_code': 404, 'description': f'Not Found: {method}'}
+                    status = 404
+                except TooManyRequests as exc:
+                    payload = {
+                        'ok': False, 'error_code': 429,
+                        'description': f'Too Many Requests: retry after {exc.retry_after}',
+                        'parameters': {'retry_after': exc.retry_after},
+                    }
+                    status = 429
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _handle
+            do_POST = _handle
+
+        return Handler
@@ -1,14 +1,33 @@
-import os
+"""
+Инициализация и обновление базы данных EnglishCard.
+
+Схема (db/schema.sql) и миграции (db/migrations/*.sql) применяются по
+порядку, каждая в своей транзакции, и записываются в schema_migrations
+вместе с контрольной суммой. Уже примененные файлы пропускаются; если
+файл изменился после применения, запуск останавливается с ошибкой.
+Словарь загружается из TSV (db/seed.tsv и --dictionary) через COPY во
+временную таблицу и INSERT ... ON CONFLICT, поэтому повторный запуск
+безопасен: существующие слова обновляются, новые добавляются.
+
+Запуск:
+    python scripts/init_db.py
+    python scripts/init_db.py --skip-seed
+    python scripts/init_db.py --dictionary packs/oxford.tsv --dictionary packs/extra.tsv
+"""
+
+import argparse
+import hashlib
 import sys
+import time
 from pathlib import Path
-from urllib.parse import urlparse
+from typing import Dict, List, Tuple
 
 import psycopg2
-from psycopg2 import sql
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 SCHEMA_PATH = BASE_DIR / 'db' / 'schema.sql'
-SEED_PATH = BASE_DIR / 'db' / 'seed.sql'
+SEED_PATH = BASE_DIR / 'db' / 'seed.tsv'
+MIGRATIONS_DIR = BASE_DIR / 'db' / 'migrations'
 CONFIG_PATH = BASE_DIR / 'config.txt'
 
 
@@ -45,28 +64,148 @@ def get_db_conn():
     )
 
 
-def run_sql_file(cursor, path: Path):
-    """Выполнение SQL файла"""
-    with path.open('r', encoding='utf-8') as f:
-        sql_text = f.read()
-    cursor.execute(sql.SQL(sql_text))
+# Ключ advisory-блокировки: два запуска init_db не применяют миграции одновременно
+MIGRATION_LOCK_KEY = 7_402_019
+
+MIGRATIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version     TEXT PRIMARY KEY,
+        checksum    TEXT NOT NULL,
+        applied_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+"""
+
+
+def migration_files() -> List[Path]:
+    """Схема и файлы миграций в порядке применения (номер в начале имени файла)"""
+    return [SCHEMA_PATH] + sorted(MIGRATIONS_DIR.glob('*.sql'))
+
+
+def migration_version(path: Path) -> str:
+    """Версия в schema_migrations: имя файла без расширения"""
+    return path.stem
+
+
+def checksum(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def applied_migrations(cur) -> Dict[str, str]:
+    cur.execute("SELECT version, checksum FROM schema_migrations")
+    return dict(cur.fetchall())
+
+
+def migrate(conn) -> int:
+    """Применение новых миграций; возвращает их число
+
+    Файлы схемы и миграций идемпотентны, поэтому база, созданная до
+    появления schema_migrations, обновляется тем же запуском: все файлы
+    применяются повторно и записываются.
+    """
+    with conn.cursor() as cur:
+        cur.execute(MIGRATIONS_TABLE_SQL)
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+        conn.commit()
+        try:
+            applied = applied_migrations(cur)
+            count = 0
+            for path in migration_files():
+                version = migration_version(path)
+                text = path.read_text(encoding='utf-8')
+                digest = checksum(text)
+                if version in applied:
+                    if applied[version] != digest:
+                        raise RuntimeError(
+                            f'Миграция {path.name} изменена после применения '
+                            f'(контрольная сумма не совпадает). Создайте новую миграцию.'
+                        )
+                    continue
+                print(f"Применение миграции: {path.name}")
+                cur.execute(text)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, checksum) VALUES (%s, %s)",
+                    (version, digest),
+                )
+                conn.commit()
+                count += 1
+            return count
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+            conn.commit()
+
+
+def load_dictionary(conn, path: Path) -> Tuple[int, int]:
+    """Загрузка словаря из TSV (word_en, word_ru с заголовком) через COPY и upsert
+
+    Возвращает число строк в файле и число добавленных или измененных слов.
+    При повторах слова в файле берется последняя строка. Формат - CSV
+    с табуляцией (как у /export): значения с кавычками берутся в кавычки.
+    """
+    with conn.cursor() as cur, path.open('r', encoding='utf-8-sig') as f:
+        cur.execute(
+            """
+            CREATE TEMP TABLE dictionary_load (
+                line     BIGSERIAL,
+                word_en  TEXT,
+                word_ru  TEXT
+            ) ON COMMIT DROP
+            """
+        )
+        cur.copy_expert(
+            "COPY dictionary_load (word_en, word_ru) FROM STDIN WITH (FORMAT csv, DELIMITER E'\\t', HEADER)",
+            f,
+        )
+        rows = cur.rowcount
+        cur.execute(
+            """
+            INSERT INTO dictionary (word_en, word_ru)
+            SELECT DISTINCT ON (word_en) word_en, word_ru
+            FROM (
+                SELECT BTRIM(word_en) AS word_en, BTRIM(word_ru) AS word_ru, line
+                FROM dictionary_load
+            ) AS src
+            WHERE word_en <> '' AND word_ru <> ''
+            ORDER BY word_en, line DESC
+            ON CONFLICT (word_en) DO UPDATE
+            SET word_ru = EXCLUDED.word_ru
+            WHERE dictionary.word_ru IS DISTINCT FROM EXCLUDED.word_ru
+            """
+        )
+        changed = cur.rowcount
+    conn.commit()
+    return rows, changed
 
 
 def main():
     """Основная функция инициализации базы данных"""
+    parser = argparse.ArgumentParser(description='Инициализация базы данных EnglishCard')
+    parser.add_argument('--skip-seed', action='store_true',
+                        help='только схема и миграции, без начального словаря')
+    parser.add_argument('--dictionary', action='append', type=Path, default=[], metavar='PATH',
+                        help='дополнительный словарь в TSV (word_en, word_ru), можно указать несколько раз')
+    args = parser.parse_args()
+    conn = None
     try:
-        with get_db_conn() as conn:
-            conn.autocommit = True
-            with conn.cursor() as cur:
-                print(f"Применение схемы: {SCHEMA_PATH}")
-                run_sql_file(cur, SCHEMA_PATH)
-                print(f"Заполнение данными: {SEED_PATH}")
-                run_sql_file(cur, SEED_PATH)
+        conn = get_db_conn()
+        applied = migrate(conn)
+        print(f"Новых миграций: {applied}")
+        packs = ([] if args.skip_seed else [SEED_PATH]) + args.dictionary
+        for path in packs:
+            started = time.perf_counter()
+            rows, changed = load_dictionary(conn, path)
+            print(f"Словарь {path.name}: строк {rows}, добавлено или обновлено {changed} "
+                  f"за {time.perf_counter() - started:.2f} с")
         print('База данных успешно инициализирована.')
     except Exception as exc:
         print(f'Ошибка инициализации БД: {exc}', file=sys.stderr)
         sys.exit(1)
+    finally:
+        if conn is not None:
+            conn.close()
 
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,135 @@
+"""
+Сравнение пропускной способности синхронного (threaded) и асинхронного
+(async) режимов бота на локальной замене Telegram API.
+
+Каждый виртуальный пользователь отправляет следующее сообщение только после
+ответа бота на предыдущее. Задержка sendMessage имитирует сеть до Telegram.
+Нужен config.txt (бот импортируется целиком); текст по умолчанию
+обрабатывается без обращения к БД, чтобы сравнивать именно режимы запуска.
+
+Запуск:
+    python scripts/load_runtime.py --mode both --users 1000 --messages 5 --send-latency 0.05
+"""
+
+import argparse
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / 'bot'))
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+
+from fake_telegram import FakeTelegram  # noqa: E402
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Перцентиль по отсортированному списку"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run_mode(mode: str, users: int, messages: int, text: str, send_latency: float,
+             workers: int, time_limit: float) -> None:
+    """Прогон одного режима в текущем процессе"""
+    import logging
+    import telebot
+    from telebot import asyncio_helper
+
+    logging.getLogger().setLevel(logging.WARNING)
+    # Сообщения об остановке polling в конце прогона не нужны
+    logging.getLogger('TeleBot').setLevel(logging.CRITICAL)
+    import main
+
+    lock = threading.Lock()
+    sent_at: Dict[int, float] = {}
+    remaining: Dict[int, int] = {}
+    latencies: List[float] = []
+    done = threading.Event()
+
+    def on_send(chat_id, _text, _markup):
+        now = time.perf_counter()
+        with lock:
+            started = sent_at.pop(chat_id, None)
+            if started is None:
+                return
+            latencies.append(now - started)
+            remaining[chat_id] -= 1
+            if remaining[chat_id] > 0:
+                sent_at[chat_id] = time.perf_counter()
+                fake.push_message(chat_id, text)
+            elif len(latencies) == users * messages:
+                done.set()
+
+    fake = FakeTelegram(send_latency=send_latency, on_send=on_send).start()
+    telebot.apihelper.API_URL = fake.api_url
+    asyncio_helper.API_URL = fake.api_url
+
+    if mode == 'async':
+        from async_runtime import AsyncRuntime
+        runtime = AsyncRuntime(main.bot, main.set_transport, workers=workers)
+        runner = threading.Thread(target=runtime.run, kwargs={'skip_pending': False, 'timeout': 1}, daemon=True)
+        stop = runtime.stop
+    else:
+        runner = threading.Thread(
+            target=main.bot.infinity_polling, kwargs={'timeout': 10, 'long_polling_timeout': 1}, daemon=True
+        )
+        stop = main.bot.stop_polling
+    runner.start()
+
+    started = time.perf_counter()
+    with lock:
+        for i in range(users):
+            chat_id = 100000 + i
+            remaining[chat_id] = messages
+            sent_at[chat_id] = time.perf_counter()
+            fake.push_message(chat_id, text)
+
+    finished = done.wait(time_limit)
+    elapsed = time.perf_counter() - started
+    stop()
+    runner.join(timeout=15)
+    fake.stop()
+
+    values = sorted(latencies)
+    print(f'режим: {mode}')
+    print(f'  пользователей: {users}, сообщений: {len(values)} из {users * messages}'
+          f'{"" if finished else " (превышен лимит времени)"}')
+    print(f'  время: {elapsed:.2f} с, пропускная способность: {len(values) / elapsed:.1f} сообщ./с')
+    print(f'  задержка ответа, мс: p50={percentile(values, 50) * 1000:.1f} '
+          f'p95={percentile(values, 95) * 1000:.1f} p99={percentile(values, 99) * 1000:.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочное сравнение режимов threaded и async')
+    parser.add_argument('--mode', choices=['threaded', 'async', 'both'], default='both')
+    parser.add_argument('--users', type=int, default=1000, help='число одновременных пользователей')
+    parser.add_argument('--messages', type=int, default=5, help='сообщений от каждого пользователя')
+    parser.add_argument('--text', default='🏠 Главное меню', help='текст сообщений пользователей')
+    parser.add_argument('--send-latency', type=float, default=0.05, help='задержка sendMessage в секундах')
+    parser.add_argument('--workers', type=int, default=16, help='потоков для обработчиков в режиме async')
+    parser.add_argument('--time-limit', type=float, default=300, help='максимальная длительность прогона, с')
+    args = parser.parse_args()
+
+    if args.mode != 'both':
+        run_mode(args.mode, args.users, args.messages, args.text, args.send_latency, args.workers, args.time_limit)
+        return
+
+    # Каждый режим в отдельном процессе, чтобы прогоны не влияли друг на друга
+    for mode in ('threaded', 'async'):
+        command = [sys.executable, __file__, '--mode', mode] + [
+            f'--{name}={value}' for name, value in (
+                ('users', args.users), ('messages', args.messages), ('text', args.text),
+                ('send-latency', args.send_latency), ('workers', args.workers), ('time-limit', args.time_limit),
+            )
+        ]
+        subprocess.run(command, check=False)
+
+
+if __name__ == '__main__':
+    main()
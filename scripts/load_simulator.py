@@ -0,0 +1,386 @@
+"""
+Сквозной нагрузочный тест: синтетические ученики проходят настоящие
+сценарии бота через локальную замену Telegram API (fake_telegram.py).
+
+Каждый ученик отправляет /start, затем случайно выбирает действия:
+тренировку (ответы вариантами из клавиатуры options_keyboard и остановка
+игры), добавление и удаление своего слова, просмотр статистики. Следующее
+сообщение отправляется после ответа бота на предыдущее (и паузы
+--think-time). Шаг считается завершенным, когда приходит сообщение
+с клавиатурой или "Неверно...".
+
+Отчет: обновлений в секунду, перцентили задержки по шагам сценариев,
+вызовы функций bot/db.py (метрики bot/metrics.py) и счетчики
+pg_stat_database. Итог можно сохранить (--save) и сравнить с ним
+следующий прогон (--baseline).
+
+С --outbox ответы в режиме threaded идут через очередь исходящих сообщений
+(bot/outbox.py), --chat-limit включает ответы 429 на стороне fake_telegram.
+
+Нужен config.txt и инициализированная база (python scripts/init_db.py).
+Синтетические пользователи удаляются после прогона.
+
+Запуск:
+    python scripts/load_simulator.py --learners 2000 --actions 5 --save baseline.json
+    python scripts/load_simulator.py --learners 2000 --actions 5 --baseline baseline.json
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / 'bot'))
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+
+from fake_telegram import FakeTelegram  # noqa: E402
+from load_runtime import percentile  # noqa: E402
+
+# Действия ученика после /start и их веса по умолчанию
+ACTIONS = ('train', 'add', 'delete', 'stats')
+DEFAULT_WEIGHTS = '6,2,1,1'
+# Кнопки под вариантами ответа (см. keyboards._GAME_CONTROL_ROWS)
+CONTROL_BUTTONS = {'⏹ Остановить игру', '📊 Статистика', '🏠 Главное меню'}
+QUESTION_RE = re.compile(r'Как переводится слово: <b>(.*)</b>\?')
+# Счетчики pg_stat_database для отчета о нагрузке на БД
+PG_COUNTERS = ('xact_commit', 'xact_rollback', 'tup_returned', 'tup_fetched',
+               'tup_inserted', 'tup_updated', 'tup_deleted', 'blks_hit', 'blks_read')
+
+
+class Learner:
+    """Синтетический ученик: сценарий - генератор шагов (название, текст)"""
+
+    def __init__(self, chat_id: int, rng: random.Random, translations: Dict[str, Set[str]],
+                 actions: int, weights: List[float], answers: int, accuracy: float):
+        self.chat_id = chat_id
+        self.rng = rng
+        self.translations = translations
+        self.own: Dict[str, str] = {}   # свои слова: перевод -> английское
+        self.options: List[str] = []
+        self.question: Optional[str] = None
+        self.flow: Optional[str] = None  # шаг, ответа на который ждет ученик
+        self.sent_at = 0.0
+        self.steps = self._script(actions, weights, answers, accuracy)
+
+    def _script(self, actions: int, weights: List[float], answers: int, accuracy: float) -> Iterator[Tuple[str, str]]:
+        yield 'start', '/start'
+        added: List[str] = []
+        for _ in range(actions):
+            action = self.rng.choices(ACTIONS, weights)[0]
+            if action == 'train':
+                yield 'train', 'Начать тренировку'
+                for _ in range(answers):
+                    if not self.options:
+                        break
+                    yield 'answer', self._answer(accuracy)
+                yield 'stop', '⏹ Остановить игру'
+            elif action == 'add':
+                yield 'add_menu', 'Добавить слово ➕'
+                en = f'sim{self.chat_id}w{len(self.own)}'
+                ru = f'симуляция {self.chat_id} {len(self.own)}'
+                self.own[ru] = en
+                added.append(en)
+                yield 'add', f'{en} - {ru}'
+            elif action == 'delete':
+                yield 'delete_menu', 'Удалить слово 🔙'
+                yield 'delete', added.pop() if added else f'sim{self.chat_id}missing'
+            else:
+                yield 'stats', '📊 Статистика'
+                yield 'menu', '🏠 Главное меню'
+
+    def _answer(self, accuracy: float) -> str:
+        """Вариант ответа: верный с вероятностью accuracy (если он известен)"""
+        correct = set(self.translations.get(self.question, ()))
+        if self.question in self.own:
+            correct.add(self.own[self.question])
+        right = [option for option in self.options if option.lower() in correct]
+        wrong = [option for option in self.options if option.lower() not in correct]
+        if right and (self.rng.random() < accuracy or not wrong):
+            return self.rng.choice(right)
+        return self.rng.choice(wrong or self.options)
+
+    def on_reply(self, text: str, markup: Optional[dict]) -> bool:
+        """Сообщение бота; True, если шаг завершен"""
+        match = QUESTION_RE.search(text)
+        if match:
+            self.question = match.group(1)
+            self.options = [
+                button['text'] for row in (markup or {}).get('keyboard', ()) for button in row
+                if button['text'] not in CONTROL_BUTTONS
+            ]
+        elif markup is not None:
+            self.question, self.options = None, []
+        return markup is not None or text.startswith('Неверно')
+
+
+class Simulation:
+    """Ученики, очередь отложенных сообщений и замеры"""
+
+    def __init__(self, fake: FakeTelegram, learners: List[Learner], think_time: float,
+                 step_timeout: float, rng: random.Random):
+        self.fake = fake
+        self.learners = {learner.chat_id: learner for learner in learners}
+        self.think_time = think_time
+        self.step_timeout = step_timeout
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.timeouts: Dict[str, int] = defaultdict(int)
+        self.updates = 0
+        self.replies = 0
+        self.finished = 0
+        self.done = threading.Event()
+        self._delayed: List[Tuple[float, int]] = []
+        self._stop = threading.Event()
+        self._timer = threading.Thread(target=self._tick, name='load-timer', daemon=True)
+
+    def start(self, ramp: float) -> None:
+        now = time.perf_counter()
+        with self.lock:
+            for chat_id in self.learners:
+                heapq.heappush(self._delayed, (now + self.rng.uniform(0, ramp), chat_id))
+        self._timer.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._timer.join()
+
+    def on_send(self, chat_id: int, text: str, markup: Optional[dict]) -> None:
+        now = time.perf_counter()
+        with self.lock:
+            self.replies += 1
+            learner = self.learners.get(chat_id)
+            if learner is None or learner.flow is None or not learner.on_reply(text, markup):
+                return
+            self.latencies[learner.flow].append(now - learner.sent_at)
+            self._next(learner, now)
+
+    def _next(self, learner: Learner, now: float) -> None:
+        """Следующий шаг сразу или после паузы (под self.lock)"""
+        learner.flow = None
+        if self.think_time > 0:
+            heapq.heappush(self._delayed, (now + self.rng.expovariate(1 / self.think_time), learner.chat_id))
+        else:
+            self._advance(learner)
+
+    def _advance(self, learner: Learner) -> None:
+        step = next(learner.steps, None)
+        if step is None:
+            self.finished += 1
+            if self.finished == len(self.learners):
+                self.done.set()
+            return
+        learner.flow, text = step
+        learner.sent_at = time.perf_counter()
+        self.updates += 1
+        self.fake.push_message(learner.chat_id, text, first_name=f'Learner{learner.chat_id}')
+
+    def _tick(self) -> None:
+        """Отложенные сообщения и шаги без ответа дольше step_timeout"""
+        last_scan = 0.0
+        while not self._stop.wait(0.01):
+            now = time.perf_counter()
+            with self.lock:
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, chat_id = heapq.heappop(self._delayed)
+                    self._advance(self.learners[chat_id])
+                if now - last_scan < 0.5:
+                    continue
+                last_scan = now
+                for learner in self.learners.values():
+                    if learner.flow is not None and now - learner.sent_at > self.step_timeout:
+                        self.timeouts[learner.flow] += 1
+                        self._next(learner, now)
+
+
+def pg_counters(db) -> Dict[str, int]:
+    with db._connect() as conn, conn.cursor() as cur:
+        cur.execute("SELECT pg_stat_clear_snapshot()")
+        cur.execute(f"SELECT {', '.join(PG_COUNTERS)} FROM pg_stat_database WHERE datname = current_database()")
+        return {name: int(value) for name, value in cur.fetchone().items()}
+
+
+def db_totals() -> Dict[str, Tuple[int, float]]:
+    from metrics import DB_SECONDS
+    return {labels[0]: value for labels, value in DB_SECONDS.totals().items()}
+
+
+def report(summary: Dict, baseline: Optional[Dict]) -> None:
+    def delta(current: float, previous: Optional[float]) -> str:
+        if not previous:
+            return ''
+        return f' ({(current - previous) / previous * 100:+.1f}%)'
+
+    base_flows = (baseline or {}).get('flows', {})
+    print(f"режим: {summary['mode']}, учеников: {summary['learners']}, "
+          f"завершили сценарий: {summary['finished']}{'' if summary['completed'] else ' (превышен лимит времени)'}")
+    print(f"время: {summary['duration']:.2f} с, обновлений: {summary['updates']}, ответов бота: {summary['replies']}")
+    print(f"пропускная способность: {summary['updates_per_sec']:.1f} обновл./с"
+          f"{delta(summary['updates_per_sec'], (baseline or {}).get('updates_per_sec'))}")
+    print(f"ответов 429 от Telegram: {summary['rate_limited']}")
+    if summary['outbox']:
+        print('очередь исходящих: ' + ', '.join(f'{name}={value}' for name, value in summary['outbox'].items()))
+    print('\nзадержка ответа по шагам, мс:')
+    print(f"  {'шаг':<12} {'число':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'таймауты':>9}")
+    for flow, stats in sorted(summary['flows'].items()):
+        previous = base_flows.get(flow, {}).get('p95_ms')
+        print(f"  {flow:<12} {stats['count']:>7} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+              f"{stats['p99_ms']:>8.1f} {stats['timeouts']:>9}{delta(stats['p95_ms'], previous)}")
+
+    updates = max(summary['updates'], 1)
+    print('\nфункции bot/db.py (по суммарному времени):')
+    print(f"  {'функция':<28} {'вызовов':>8} {'на обновл.':>10} {'сред., мс':>10} {'всего, с':>9}")
+    functions = sorted(summary['db_functions'].items(), key=lambda item: -item[1]['total_s'])
+    for name, stats in functions[:12]:
+        print(f"  {name:<28} {stats['calls']:>8} {stats['calls'] / updates:>10.2f} "
+              f"{stats['avg_ms']:>10.3f} {stats['total_s']:>9.2f}")
+
+    print('\npg_stat_database за прогон:')
+    for name, value in summary['pg_stat_database'].items():
+        print(f'  {name:<14} {value:>12} ({value / updates:.1f} на обновление)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сквозной нагрузочный тест с синтетическими учениками')
+    parser.add_argument('--mode', choices=['threaded', 'async'], default='threaded')
+    parser.add_argument('--learners', type=int, default=1000, help='одновременных учеников')
+    parser.add_argument('--actions', type=int, default=5, help='действий каждого ученика после /start')
+    parser.add_argument('--weights', default=DEFAULT_WEIGHTS,
+                        help='веса действий train,add,delete,stats (по умолчанию %(default)s)')
+    parser.add_argument('--answers', type=int, default=5, help='ответов за одну тренировку')
+    parser.add_argument('--accuracy', type=float, default=0.7, help='доля верных ответов')
+    parser.add_argument('--think-time', type=float, default=0.0, help='средняя пауза между сообщениями, с')
+    parser.add_argument('--ramp', type=float, default=1.0, help='за сколько секунд подключаются все ученики')
+    parser.add_argument('--send-latency', type=float, default=0.0, help='задержка sendMessage в секундах')
+    parser.add_argument('--workers', type=int, default=16, help='потоков для обработчиков в режиме async')
+    parser.add_argument('--outbox', action='store_true', help='очередь исходящих сообщений (режим threaded)')
+    parser.add_argument('--chat-limit', type=int, default=0,
+                        help='сообщений в чат в секунду, после которых отвечать 429 (0 - без ограничения)')
+    parser.add_argument('--step-timeout', type=float, default=30, help='сколько ждать ответа на шаг, с')
+    parser.add_argument('--time-limit', type=float, default=600, help='максимальная длительность прогона, с')
+    parser.add_argument('--id-base', type=int, default=880_000_000, help='telegram_id первого ученика')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='сохранить итоги в JSON')
+    parser.add_argument('--baseline', help='сравнить с итогами из JSON')
+    args = parser.parse_args()
+
+    weights = [float(value) for value in args.weights.split(',')]
+    if len(weights) != len(ACTIONS):
+        parser.error(f'--weights: нужно {len(ACTIONS)} значения')
+    baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8')) if args.baseline else None
+
+    import telebot
+    from telebot import asyncio_helper
+
+    import db
+    import main as bot_main
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('TeleBot').setLevel(logging.CRITICAL)
+
+    translations: Dict[str, Set[str]] = defaultdict(set)
+    for en, ru in db.get_all_dictionary_words():
+        translations[ru].add(en.lower())
+    rng = random.Random(args.seed)
+    learners = [
+        Learner(args.id_base + i, random.Random(rng.random()), translations,
+                args.actions, weights, args.answers, args.accuracy)
+        for i in range(args.learners)
+    ]
+
+    fake = FakeTelegram(send_latency=args.send_latency, chat_rate_limit=args.chat_limit)
+    simulation = Simulation(fake, learners, args.think_time, args.step_timeout, rng)
+    fake.on_send = simulation.on_send
+    fake.start()
+    telebot.apihelper.API_URL = fake.api_url
+    asyncio_helper.API_URL = fake.api_url
+
+    if args.mode == 'async':
+        from async_runtime import AsyncRuntime
+        runtime = AsyncRuntime(bot_main.bot, bot_main.set_transport, workers=args.workers)
+        runner = threading.Thread(target=runtime.run, kwargs={'skip_pending': False, 'timeout': 1}, daemon=True)
+        stop = runtime.stop
+    else:
+        runner = threading.Thread(
+            target=bot_main.bot.infinity_polling, kwargs={'timeout': 10, 'long_polling_timeout': 1}, daemon=True
+        )
+        stop = bot_main.bot.stop_polling
+    outbox = None
+    if args.outbox and args.mode == 'threaded':
+        outbox = bot_main.create_outbox().start()
+        bot_main.set_transport(outbox.send)
+
+    pg_before = pg_counters(db)
+    db_before = db_totals()
+    runner.start()
+    started = time.perf_counter()
+    simulation.start(args.ramp)
+    completed = simulation.done.wait(args.time_limit)
+    duration = time.perf_counter() - started
+    simulation.stop()
+    stop()
+    runner.join(timeout=15)
+    if outbox is not None:
+        outbox.close()
+        bot_main.set_transport(None)
+    fake.stop()
+    db.flush_attempts()
+    db_after = db_totals()
+    # Статистика сессий попадает в pg_stat_database с задержкой до секунды
+    time.sleep(1.0)
+    pg_after = pg_counters(db)
+
+    summary = {
+        'mode': args.mode,
+        'learners': args.learners,
+        'finished': simulation.finished,
+        'completed': completed,
+        'duration': duration,
+        'updates': simulation.updates,
+        'replies': simulation.replies,
+        'updates_per_sec': simulation.updates / duration,
+        'flows': {},
+        'db_functions': {},
+        'pg_stat_database': {name: pg_after[name] - pg_before[name] for name in PG_COUNTERS},
+        'rate_limited': fake.rate_limited,
+        'outbox': outbox.stats() if outbox is not None else None,
+    }
+    for flow in set(simulation.latencies) | set(simulation.timeouts):
+        values = sorted(simulation.latencies[flow])
+        summary['flows'][flow] = {
+            'count': len(values),
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'timeouts': simulation.timeouts[flow],
+        }
+    for name, (calls, total) in db_after.items():
+        calls_before, total_before = db_before.get(name, (0, 0.0))
+        calls, total = calls - calls_before, total - total_before
+        if calls:
+            summary['db_functions'][name] = {'calls': calls, 'avg_ms': total / calls * 1000, 'total_s': total}
+
+    try:
+        with db._connect() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM users WHERE telegram_id BETWEEN %s AND %s",
+                        (args.id_base, args.id_base + args.learners - 1))
+    finally:
+        db.shutdown()
+
+    report(summary, baseline)
+    if args.save:
+        Path(args.save).write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f'\nИтоги сохранены в {args.save}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Нагрузочный тест режима webhook без Telegram.
+
+Поднимает WebhookServer с обработчиками бота и локальную замену Bot API
+(для sendMessage), затем несколько клиентов отправляют синтетические
+обновления POST-запросами. Считаются принятые и отклоненные (429)
+обновления и ответы бота, т.е. пропускная способность от HTTP до sendMessage.
+Нужен config.txt; текст по умолчанию обрабатывается без обращения к БД.
+
+Запуск:
+    python scripts/load_webhook.py --updates 20000 --clients 16 --workers 8
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / 'bot'))
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+
+from fake_telegram import FakeTelegram  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест webhook-сервера')
+    parser.add_argument('--updates', type=int, default=20000, help='сколько обновлений отправить')
+    parser.add_argument('--users', type=int, default=1000, help='число разных чатов')
+    parser.add_argument('--clients', type=int, default=16, help='параллельных HTTP-клиентов')
+    parser.add_argument('--workers', type=int, default=8, help='обработчиков webhook')
+    parser.add_argument('--queue-size', type=int, default=1000, help='общий размер очереди')
+    parser.add_argument('--text', default='🏠 Главное меню', help='текст сообщений')
+    parser.add_argument('--send-latency', type=float, default=0.0, help='задержка sendMessage в секундах')
+    parser.add_argument('--time-limit', type=float, default=300, help='сколько ждать обработки, с')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    import telebot
+    import main as bot_main
+    from webhook import WebhookServer
+
+    replies = 0
+    replies_lock = threading.Lock()
+
+    def on_send(chat_id, text, markup):
+        nonlocal replies
+        with replies_lock:
+            replies += 1
+
+    fake = FakeTelegram(send_latency=args.send_latency, on_send=on_send).start()
+    telebot.apihelper.API_URL = fake.api_url
+    server = WebhookServer(bot_main.bot, host='127.0.0.1', port=0, path='/webhook', secret_token='bench',
+                           workers=args.workers, queue_size=args.queue_size).start()
+    host, port = server.address
+    url = f'http://{host}:{port}/webhook'
+    headers = {'Content-Type': 'application/json', 'X-Telegram-Bot-Api-Secret-Token': 'bench'}
+
+    counter = iter(range(args.updates))
+    counter_lock = threading.Lock()
+    accepted = 0
+    rejected = 0
+    result_lock = threading.Lock()
+
+    def client():
+        nonlocal accepted, rejected
+        session = requests.Session()
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            chat_id = 200000 + i % args.users
+            update = {'update_id': i + 1, 'message': fake.make_message(chat_id, args.text)}
+            while True:
+                response = session.post(url, data=json.dumps(update), headers=headers)
+                if response.status_code == 200:
+                    with result_lock:
+                        accepted += 1
+                    break
+                # Как Telegram: повтор после Retry-After (здесь - короткая пауза)
+                with result_lock:
+                    rejected += 1
+                time.sleep(0.01)
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client, daemon=True) for _ in range(args.clients)]
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+    posted = time.perf_counter() - started
+
+    deadline = time.monotonic() + args.time_limit
+    while time.monotonic() < deadline:
+        with replies_lock:
+            if replies >= args.updates:
+                break
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    server.stop(drain=False)
+    fake.stop()
+    stats = server.stats()
+    print(f'обновлений: {args.updates}, клиентов: {args.clients}, обработчиков: {args.workers}')
+    print(f'  прием: {accepted / posted:.1f} обновл./с, отклонено (429): {rejected}')
+    print(f'  end-to-end: {replies} ответов за {elapsed:.2f} с, {replies / elapsed:.1f} обновл./с')
+    print(f'  обработка: среднее {stats["avg_processing_ms"]} мс, ошибок: {stats["errors"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Обслуживание партиций quiz_attempts (помесячные, см. db/migrations/002_partition_quiz_attempts.sql).
+
+1. Создает партиции на текущий и --months-ahead следующих месяцев.
+2. Партиции старше --retain-months месяцев сворачивает в quiz_attempts_daily
+   (попытки и правильные ответы по пользователю, слову и дню) и удаляет.
+   Свертка и удаление одной партиции выполняются в одной транзакции.
+3. То же для старых строк, попавших в партицию по умолчанию.
+
+Запускать по расписанию, например раз в сутки:
+    python scripts/manage_partitions.py --months-ahead 3 --retain-months 6
+"""
+
+import argparse
+import re
+import sys
+from datetime import date, datetime, timezone
+from typing import List, Tuple
+
+from init_db import get_db_conn
+
+PARTITION_RE = re.compile(r'^quiz_attempts_p(\d{4})(\d{2})$')
+
+ROLLUP_SQL = """
+    INSERT INTO quiz_attempts_daily (user_id, day, word_en, attempts, correct)
+    SELECT user_id, (attempted_at AT TIME ZONE 'UTC')::date, word_en,
+           COUNT(*), COUNT(*) FILTER (WHERE was_correct)
+    FROM {source}
+    GROUP BY 1, 2, 3
+    ON CONFLICT (user_id, day, word_en) DO UPDATE
+    SET attempts = quiz_attempts_daily.attempts + EXCLUDED.attempts,
+        correct = quiz_attempts_daily.correct + EXCLUDED.correct
+"""
+
+
+def add_months(day: date, months: int) -> date:
+    """Первое число месяца, отстоящего от day на months месяцев"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def list_partitions(cur) -> List[Tuple[str, date]]:
+    """Помесячные партиции quiz_attempts: (имя, первое число месяца)"""
+    cur.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits AS i
+        JOIN pg_class AS c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'quiz_attempts'::regclass
+        """
+    )
+    partitions = []
+    for (name,) in cur.fetchall():
+        match = PARTITION_RE.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def roll_up_partition(cur, name: str) -> int:
+    """Свертка партиции в quiz_attempts_daily и ее удаление; возвращает число строк"""
+    cur.execute(f'SELECT COUNT(*) FROM "{name}"')
+    rows = cur.fetchone()[0]
+    cur.execute(ROLLUP_SQL.format(source=f'"{name}"'))
+    cur.execute(f'DROP TABLE "{name}"')
+    return rows
+
+
+def roll_up_default(cur, cutoff: date) -> int:
+    """Свертка и удаление строк партиции по умолчанию старше cutoff; возвращает число групп"""
+    # DELETE ... RETURNING допустим только в WITH верхнего уровня
+    cur.execute(
+        """
+        WITH moved AS (
+            DELETE FROM quiz_attempts_default
+            WHERE attempted_at < %(cutoff)s::timestamp AT TIME ZONE 'UTC'
+            RETURNING user_id, word_en, was_correct, attempted_at
+        )
+        """ + ROLLUP_SQL.format(source='moved'),
+        {'cutoff': cutoff},
+    )
+    return cur.rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Создание, свертка и удаление партиций quiz_attempts')
+    parser.add_argument('--months-ahead', type=int, default=3, help='на сколько месяцев вперед создавать партиции')
+    parser.add_argument('--retain-months', type=int, default=6,
+                        help='сколько полных прошедших месяцев хранить попытки без свертки')
+    parser.add_argument('--dry-run', action='store_true', help='только показать, что будет сделано')
+    args = parser.parse_args()
+    if args.retain_months < 1:
+        parser.error('--retain-months должен быть не меньше 1')
+
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    cutoff = add_months(this_month, -args.retain_months)
+
+    conn = get_db_conn()
+    try:
+        with conn.cursor() as cur:
+            if not args.dry_run:
+                cur.execute('SELECT quiz_attempts_ensure_partitions(%s)', (args.months_ahead,))
+                conn.commit()
+            print(f'Партиции до {add_months(this_month, args.months_ahead):%Y-%m} созданы')
+
+            for name, month in list_partitions(cur):
+                if month >= cutoff:
+                    continue
+                if args.dry_run:
+                    print(f'  будет свернута и удалена: {name}')
+                    continue
+                rows = roll_up_partition(cur, name)
+                conn.commit()
+                print(f'  {name}: свернуто попыток {rows}, партиция удалена')
+
+            if not args.dry_run:
+                groups = roll_up_default(cur, cutoff)
+                conn.commit()
+                if groups:
+                    print(f'  quiz_attempts_default: свернуто групп {groups}')
+    except Exception as exc:
+        conn.rollback()
+        print(f'Ошибка обслуживания партиций: {exc}', file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
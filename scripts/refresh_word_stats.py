@@ -0,0 +1,94 @@
+"""
+Пересчет статистики слов (word_stats, user_word_stats, word_confusions,
+см. db/migrations/004_word_stats.sql) по истории попыток.
+
+Бот обновляет эти таблицы при каждой записанной попытке; скрипт нужен после
+первого применения миграции (история уже накоплена) и для сверки. Источники:
+quiz_attempts (все партиции) и свертки quiz_attempts_daily. Путаницы
+считаются только по quiz_attempts: в свертках выбранный ответ не хранится.
+
+Таблицы пересобираются в одной транзакции; на это время запись статистики
+ботом ждет блокировки, чтение не блокируется.
+
+Запуск:
+    python scripts/refresh_word_stats.py
+"""
+
+import argparse
+import sys
+import time
+
+from init_db import get_db_conn
+
+# Попытки по пользователю и слову из сырых попыток и дневных сверток
+ATTEMPTS_SOURCE = """
+    SELECT user_id, LOWER(word_en) AS word_en, COUNT(*) AS attempts,
+           COUNT(*) FILTER (WHERE NOT was_correct) AS errors, MAX(attempted_at) AS last_at
+    FROM quiz_attempts
+    GROUP BY 1, 2
+    UNION ALL
+    SELECT user_id, LOWER(word_en), SUM(attempts), SUM(attempts - correct),
+           (MAX(day) + 1)::timestamp AT TIME ZONE 'UTC'
+    FROM quiz_attempts_daily
+    GROUP BY 1, 2
+"""
+
+REFRESH_SQL = (
+    """
+    INSERT INTO user_word_stats (user_id, word_en, attempts, errors, last_attempt_at)
+    SELECT src.user_id, src.word_en, SUM(src.attempts), SUM(src.errors), MAX(src.last_at)
+    FROM ({source}) AS src
+    JOIN users AS u ON u.id = src.user_id
+    GROUP BY 1, 2
+    """.format(source=ATTEMPTS_SOURCE),
+    """
+    INSERT INTO word_stats (word_en, attempts, errors)
+    SELECT word_en, SUM(attempts), SUM(errors)
+    FROM ({source}) AS src
+    GROUP BY 1
+    """.format(source=ATTEMPTS_SOURCE),
+    """
+    INSERT INTO word_confusions (word_en, answer_en, picks)
+    SELECT LOWER(word_en), answer_en, COUNT(*)
+    FROM quiz_attempts
+    WHERE answer_en IS NOT NULL
+    GROUP BY 1, 2
+    """,
+)
+
+
+def refresh(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute("LOCK TABLE word_stats, user_word_stats, word_confusions IN SHARE ROW EXCLUSIVE MODE")
+        cur.execute("DELETE FROM word_confusions")
+        cur.execute("DELETE FROM user_word_stats")
+        cur.execute("DELETE FROM word_stats")
+        for sql in REFRESH_SQL:
+            cur.execute(sql)
+        cur.execute("SELECT COUNT(*), COALESCE(SUM(attempts), 0) FROM word_stats")
+        words, attempts = cur.fetchone()
+        cur.execute("SELECT COUNT(*) FROM word_confusions")
+        (confusions,) = cur.fetchone()
+    conn.commit()
+    print(f'Слов: {words}, попыток: {attempts}, путаниц: {confusions}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Пересчет статистики слов по истории попыток')
+    parser.parse_args()
+
+    conn = get_db_conn()
+    started = time.perf_counter()
+    try:
+        refresh(conn)
+    except Exception as e:
+        conn.rollback()
+        print(f'Ошибка пересчета статистики слов: {e}', file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.close()
+    print(f'Готово за {time.perf_counter() - started:.1f} с')
+
+
+if __name__ == '__main__':
+    main()